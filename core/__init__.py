@@ -30,35 +30,42 @@ __version__ = "0.1"
 MODS_PATH = "Mods"
 
 
-def _CreateModFolder():
+def GetModsPath() -> str:
+    """
+    Mods folder, created on first use
+    """
     import os
 
-    global MODS_PATH
     if not os.path.exists(MODS_PATH):
         os.makedirs(MODS_PATH)
 
+    return MODS_PATH
+
 def SetModsPath(path: str):
     global MODS_PATH
     MODS_PATH = path
-    _CreateModFolder()
-
-_CreateModFolder()
+    GetModsPath()
 
 from .libs.sqlite import Sql
 from .libs.config_file import ConfigFile, ConfigElement
 from .utils import *
+from .utils.lazy import LazyAttributes
 from .file import *
 from .modifier import *
 from .mod import *
 from .processor import Processor
+from .batch import BatchBuilder
+
+_GAME_CONSTANTS = ["BRAWLHALLA_PATH", "BRAWLHALLA_SWFS", "BRAWLHALLA_FILES", "BRAWLHALLA_COLLISIONS", "BRAWLHALLA_VERSION"]
+
+#Game constants are searched on first access
+LazyAttributes(__name__, {
+    name: (lambda name=name: getattr(gameconstants, name))
+    for name in _GAME_CONSTANTS
+}, cache=False)
 
 def RefindBrawlhalla():
-    global BRAWLHALLA_PATH
-    global BRAWLHALLA_SWFS
-    global BRAWLHALLA_FILES
-    global BRAWLHALLA_VERSION
+    gameconstants.RefindBrawlhalla()
 
-    BRAWLHALLA_PATH = gameconstants.SearchBrawlhallaHome()
-    BRAWLHALLA_SWFS = gameconstants.SearchBrawlhallaSwfs(BRAWLHALLA_PATH) if isinstance(BRAWLHALLA_PATH, str) else None
-    BRAWLHALLA_FILES = gameconstants.SearchBrawlhallaFiles(BRAWLHALLA_PATH) if isinstance(BRAWLHALLA_PATH, str) else None
-    BRAWLHALLA_VERSION = gameconstants.SearchBrawlhallaVersion(BRAWLHALLA_SWFS["BrawlhallaAir.swf"]) if isinstance(BRAWLHALLA_PATH, str) else None
\ No newline at end of file
+#Lazy game constants are missing in module dict, "from core import *" takes them by __all__ (game is searched then)
+__all__ = [name for name in globals() if not name.startswith("_")] + _GAME_CONSTANTS
@@ -0,0 +1,203 @@
+# *****************************************************************************
+#
+#                           Brawlhalla Modloader Core
+#   Copyright (C) 2020 Farbigoz
+#   
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#   Contacts:
+#       GitHub: https://github.com/Farbigoz
+#       Gmail: ferattori@gmail.com
+#       VK: https://vk.com/fabriziog    (Preferably)
+#
+# *****************************************************************************
+
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List
+
+from . import GetModsPath, SetModsPath
+from .utils.exceptions import ModResourcesNotFound
+from .modifier import MODIFIER_FORMAT
+from .file import FILES_PACK
+from .mod import MOD_DATABASE_FILE, ModBuilder, ModifierFlag, FileFlag
+from .utils.workerpool import TaskDoneFlag, TaskFailedFlag, RunTasks
+
+
+#Processes building mods, each with own JVM
+BATCH_WORKERS = min(4, os.cpu_count() or 1)
+BATCH_SUMMARY_FILE = "buildSummary.json"
+
+
+class ModBuiltFlag:
+    pass
+
+
+class ModBuildErrorFlag:
+    pass
+
+
+def FolderSize(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, file))
+        for root, folders, files in os.walk(path)
+        for file in files
+    )
+
+
+def OutputSize(modPath: str) -> int:
+    """
+    Size of .bmlmodifier's and pack.zip of built mod
+    """
+    return sum(
+        os.path.getsize(os.path.join(modPath, file))
+        for file in os.listdir(modPath)
+        if file.endswith(f".{MODIFIER_FORMAT}") or file == FILES_PACK
+    )
+
+
+def _BuildWorker(modFolder: str, force: bool, threads: int):
+    """
+    Build mod in worker process, yields (flag, arg)
+    """
+    startTime = time.time()
+
+    builder = ModBuilder(modFolder, threads)
+    yield from builder.build(True, force)
+
+    yield ModBuiltFlag, {
+        "time": time.time() - startTime,
+        "size": OutputSize(builder.modPath)
+    }
+
+
+class BatchBuilder:
+    modFolders: List[str]
+    workers: int
+    threads: int
+    summary: Dict[str, dict]    #{modFolder: {"time": float, "size": int} or {"error": str}, ...}
+
+    def __init__(self, modFolders: List[str]=None, workers: int=None, threads: int=1):
+        """
+        modFolders: folders in mods path, all buildable if None
+        workers:    build processes
+        threads:    threads loading elements in each process
+        """
+        self.modFolders = list(modFolders) if modFolders is not None else self.findBuildable()
+        self.workers = workers or BATCH_WORKERS
+        self.threads = threads
+        self.summary = {}
+
+        #Largest mods first, so small ones fill workers at the end
+        self.modFolders.sort(key=lambda modFolder: FolderSize(os.path.join(GetModsPath(), modFolder)), reverse=True)
+
+    @staticmethod
+    def findBuildable() -> List[str]:
+        """
+        Mod folders with index.db (configured by ModBuilder.setConfiguration) and resources
+        """
+        modFolders = []
+
+        for modFolder in os.listdir(GetModsPath()):
+            if not os.path.isfile(os.path.join(GetModsPath(), modFolder, MOD_DATABASE_FILE)):
+                continue
+
+            try:
+                ModBuilder(modFolder)
+            except ModResourcesNotFound:
+                continue
+
+            modFolders.append(modFolder)
+
+        return modFolders
+
+    def _build(self, force=False):
+        startTime = time.time()
+        self.summary = {}
+
+        if not self.modFolders:
+            return
+
+        for modFolder, message in RunTasks(
+                _BuildWorker,
+                [(modFolder, (modFolder, force, self.threads)) for modFolder in self.modFolders],
+                self.workers, SetModsPath, (GetModsPath(),)
+        ):
+            if message[0] is TaskDoneFlag:
+                continue
+
+            #Worker raised or died (JVM crash)
+            elif message[0] is TaskFailedFlag:
+                flag, arg = ModBuildErrorFlag, message[1]
+                self.summary[modFolder] = {"error": arg}
+
+            else:
+                flag, arg = message
+                if flag is ModBuiltFlag:
+                    self.summary[modFolder] = arg
+
+            yield flag, modFolder, arg
+
+        self.saveSummary(time.time() - startTime)
+
+    def build(self, generator=False, force=False):
+        """
+        Yields (flag, modFolder, arg): (ModifierFlag, modFolder, swfName), (FileFlag, modFolder, path),
+        (ModBuiltFlag, modFolder, {"time", "size"}), (ModBuildErrorFlag, modFolder, error)
+        """
+        if generator:
+            return self._build(force)
+        else:
+            return [n for n in self._build(force)]
+
+    def saveSummary(self, totalTime: float):
+        with open(os.path.join(GetModsPath(), BATCH_SUMMARY_FILE), "w") as file:
+            json.dump({"time": totalTime, "mods": self.summary}, file, indent=4)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Build all configured mods in mods folder")
+    parser.add_argument("mods", nargs="*", help="mod folders, all buildable if empty")
+    parser.add_argument("--mods-path", default=None, help="mods folder")
+    parser.add_argument("--workers", type=int, default=None, help="build processes")
+    parser.add_argument("--threads", type=int, default=1, help="threads loading elements in each process")
+    parser.add_argument("--force", action="store_true", help="rebuild unchanged modifiers and files")
+    args = parser.parse_args(args)
+
+    if args.mods_path is not None:
+        SetModsPath(args.mods_path)
+
+    batch = BatchBuilder(args.mods or None, args.workers, args.threads)
+
+    failed = 0
+    for flag, modFolder, arg in batch.build(True, args.force):
+        if flag is ModifierFlag:
+            print(f"[{modFolder}] Modifier: {arg}")
+        elif flag is FileFlag:
+            print(f"[{modFolder}] File: {arg}")
+        elif flag is ModBuiltFlag:
+            print(f"[{modFolder}] Built in {arg['time']:.1f}s, {arg['size']} bytes")
+        elif flag is ModBuildErrorFlag:
+            print(f"[{modFolder}] Error: {arg}")
+            failed += 1
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,68 +24,208 @@
 # *****************************************************************************
 
 import os
+import zlib
 import zipfile
-import shutil 
-import hashlib
-from typing import List
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple
 
-from .utils.gameconstants import BRAWLHALLA_PATH, BRAWLHALLA_FILES
-from .utils.localConfig import LOCAL_DATA_PATH, ModsConfig
+from .utils import gameconstants
+from .utils.localConfig import ModsConfig
+from .utils.hashing import FileHash, CheckFileHash
+from .utils.dumpstore import LEGACY_DUMP_PATH, DumpStore
+from .utils.zippack import ZIP_LOCAL_HEADER
 
 
 
 FILES_PACK = "pack.zip"
-FILES_DUMP_FOLDER = os.path.join(LOCAL_DATA_PATH, "files")
+FILES_DUMP_FOLDER = LEGACY_DUMP_PATH    #Flat dumps of previous versions, new ones are in DumpStore
 
-if not os.path.exists(FILES_DUMP_FOLDER):
-    os.mkdir(FILES_DUMP_FOLDER)
+PACK_POOL_SIZE = 8          #Open pack.zip handles
+PACK_CHUNK = 1024 * 1024
+
+PLACE_WORKERS = min(8, os.cpu_count() or 1)
+
+
+class _PackPool:
+    """
+    Bounded LRU pool of pack.zip handles, opened on first extract.
+    Member tables are kept after eviction, so reopening pack is single open()
+    """
+    handles: OrderedDict                        #{packPath: file, ...}
+    members: Dict[str, Tuple[tuple, dict]]      #{packPath: (stat, {name: ZipInfo, ...}), ...}
+
+    def __init__(self, size: int):
+        self.size = size
+        self.handles = OrderedDict()
+        self.members = {}
+        self.lock = threading.RLock()
+
+    def memberTable(self, packPath: str) -> Dict[str, zipfile.ZipInfo]:
+        stat = os.stat(packPath)
+        statKey = (stat.st_size, stat.st_mtime_ns)
+
+        with self.lock:
+            cached = self.members.get(packPath, None)
+            if cached is not None and cached[0] == statKey:
+                return cached[1]
+
+            #Pack was rebuilt
+            self.close(packPath)
+
+            with zipfile.ZipFile(packPath, "r") as packZip:
+                table = {zinfo.filename: zinfo for zinfo in packZip.infolist()}
+            self.members[packPath] = (statKey, table)
+
+            return table
+
+    def handle(self, packPath: str):
+        with self.lock:
+            if packPath in self.handles:
+                self.handles.move_to_end(packPath)
+                return self.handles[packPath]
+
+            while len(self.handles) >= self.size:
+                _, oldHandle = self.handles.popitem(last=False)
+                oldHandle.close()
+
+            self.handles[packPath] = open(packPath, "rb")
+            return self.handles[packPath]
+
+    def extract(self, packPath: str, member: str, targetPath: str):
+        """
+        Extract member to targetPath through temporary file
+        """
+        zinfo = self.memberTable(packPath)[member]
+
+        if zinfo.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            with zipfile.ZipFile(packPath, "r") as packZip, packZip.open(member) as src:
+                self._writeTarget(targetPath, iter(lambda: src.read(PACK_CHUNK), b""), zinfo)
+            return
+
+        with self.lock:
+            packFile = self.handle(packPath)
+            packFile.seek(zinfo.header_offset)
+            header = ZIP_LOCAL_HEADER.unpack(packFile.read(ZIP_LOCAL_HEADER.size))
+            if header[0] != zipfile.stringFileHeader:
+                raise zipfile.BadZipFile(f"Bad local header of '{member}' in '{packPath}'")
+            dataOffset = packFile.tell() + header[-2] + header[-1]
+
+        self._writeTarget(targetPath, self._readMember(packPath, zinfo, dataOffset), zinfo)
+
+    def _readMember(self, packPath: str, zinfo: zipfile.ZipInfo, dataOffset: int):
+        decompressor = zlib.decompressobj(-15) if zinfo.compress_type == zipfile.ZIP_DEFLATED else None
+        left = zinfo.compress_size
+
+        while left > 0:
+            #Handle may be used by other thread between chunks
+            with self.lock:
+                packFile = self.handle(packPath)
+                packFile.seek(dataOffset)
+                chunk = packFile.read(min(PACK_CHUNK, left))
+
+            if not chunk:
+                raise zipfile.BadZipFile(f"Truncated member '{zinfo.filename}' in '{packPath}'")
+            dataOffset += len(chunk)
+            left -= len(chunk)
+
+            yield decompressor.decompress(chunk) if decompressor else chunk
+
+        if decompressor:
+            yield decompressor.flush()
+
+    @staticmethod
+    def _writeTarget(targetPath: str, chunks, zinfo: zipfile.ZipInfo):
+        os.makedirs(os.path.dirname(targetPath), exist_ok=True)
+
+        tmpPath = targetPath + ".tmp"
+        crc = 0
+        try:
+            with open(tmpPath, "wb") as target:
+                for chunk in chunks:
+                    crc = zlib.crc32(chunk, crc)
+                    target.write(chunk)
+
+            if crc != zinfo.CRC:
+                raise zipfile.BadZipFile(f"Bad CRC-32 for file '{zinfo.filename}'")
+
+            os.replace(tmpPath, targetPath)
+        finally:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+
+    def close(self, packPath: str=None):
+        """
+        Close handle of pack, or all handles
+        """
+        with self.lock:
+            for path in ([packPath] if packPath is not None else list(self.handles)):
+                packFile = self.handles.pop(path, None)
+                if packFile is not None:
+                    packFile.close()
+
+
+PackPool = _PackPool(PACK_POOL_SIZE)
 
 
 class File:
-    packZip: zipfile.ZipFile
+    filesPack: "FilesPack"
     file: str
 
     GHOST_MOD: bool
     
-    def __init__(self, packZip, fileName, filePath, fileHash):
-        self.GHOST_MOD = not bool(packZip)
+    def __init__(self, filesPack, fileName, filePath, fileHash):
+        self.GHOST_MOD = filesPack is None or filesPack.packPath is None
 
-        self.packZip = packZip
+        self.filesPack = filesPack
         self.fileName = fileName
         self.filePath = filePath
         self.fileHash = fileHash
 
-    def place(self):
-        if self.GHOST_MOD: return
-
-        with open(BRAWLHALLA_FILES[self.fileName], "rb") as file:
-            origFileHash = hashlib.sha256(file.read()).hexdigest()[:16]
-
+    def needsDump(self) -> bool:
         #Если файл ниразу небыл сдамплен
         if self.fileName not in ModsConfig.OriginalFiles:
-            self.dump(origFileHash)
+            return True
 
         #Если файл был обновлён
-        if self.fileName in ModsConfig.ModifiedFiles and ModsConfig.ModifiedFiles[self.fileName] != origFileHash:
-            self.dump(origFileHash)
+        elif self.fileName in ModsConfig.ModifiedFiles and not CheckFileHash(gameconstants.BRAWLHALLA_FILES[self.fileName], ModsConfig.ModifiedFiles[self.fileName]):
+            return True
+
+        return False
+
+    def place(self):
+        if self.GHOST_MOD: return
+
+        if self.needsDump():
+            self.dump()
 
         ModsConfig.ModifiedFiles = {**ModsConfig.ModifiedFiles, self.fileName:self.fileHash}
-        self.packZip.extract(self.filePath.replace("\\", "/"), BRAWLHALLA_PATH)
+        ModsConfig.flush()
+        self.extract()
+
+    def extract(self):
+        self.filesPack.extract(self.filePath, gameconstants.BRAWLHALLA_FILES[self.fileName])
+
+    def dump(self, origFileHash=None, commit=True) -> str:
+        """
+        commit: save DumpStore and write original hash to ModsConfig, else only return hash
+        """
+        DumpStore.put(self.fileName, gameconstants.BRAWLHALLA_FILES[self.fileName])
 
-    def dump(self, origFileHash=None):
         if origFileHash is None:
-            with open(BRAWLHALLA_FILES[self.fileName], "rb") as file:
-                origFileHash = hashlib.sha256(file.read()).hexdigest()[:16]
+            origFileHash = FileHash(gameconstants.BRAWLHALLA_FILES[self.fileName])
 
-        shutil.copyfile(BRAWLHALLA_FILES[self.fileName], os.path.join(FILES_DUMP_FOLDER, self.fileName))
-        ModsConfig.OriginalFiles = {**ModsConfig.OriginalFiles, self.fileName: origFileHash}
+        if commit:
+            DumpStore.save()
+            ModsConfig.OriginalFiles = {**ModsConfig.OriginalFiles, self.fileName: origFileHash}
+            ModsConfig.flush()
 
-    def repair(self):
-        with open(BRAWLHALLA_FILES[self.fileName], "rb") as file:
-            origFileHash = hashlib.sha256(file.read()).hexdigest()[:16]
+        return origFileHash
 
-        if origFileHash == self.fileHash:
-            shutil.copyfile(os.path.join(FILES_DUMP_FOLDER, self.fileName), BRAWLHALLA_FILES[self.fileName])
+    def repair(self):
+        if CheckFileHash(gameconstants.BRAWLHALLA_FILES[self.fileName], self.fileHash):
+            DumpStore.restore(self.fileName, gameconstants.BRAWLHALLA_FILES[self.fileName], ModsConfig.OriginalFiles.get(self.fileName, None))
             ModsConfig.ModifiedFiles = {**ModsConfig.ModifiedFiles, self.fileName: ModsConfig.OriginalFiles[self.fileName]}
 
     def __repr__(self):
@@ -94,6 +234,7 @@ class File:
 
 class FilesPack:
     modPath: str
+    packPath: str   #None if mod has no pack.zip
     files: List[File]
 
     GHOST_MOD: bool
@@ -105,12 +246,22 @@ class FilesPack:
         self.modHash = modHash
         self.files = []
         if modPath is not None and os.path.exists(os.path.join(self.modPath, FILES_PACK)):
-            self.packZip = zipfile.ZipFile(os.path.join(self.modPath, FILES_PACK), "r") if not self.GHOST_MOD else None
+            self.packPath = os.path.join(self.modPath, FILES_PACK)
         else:
-            self.packZip = None
+            self.packPath = None
 
     def addFile(self, fileName, filePath, fileHash):
-        self.files.append(File(self.packZip, fileName, filePath, fileHash))
+        self.files.append(File(self, fileName, filePath, fileHash))
+
+    def extract(self, filePath: str, targetPath: str):
+        """
+        filePath: path in pack.zip
+        """
+        PackPool.extract(self.packPath, filePath.replace("\\", "/"), targetPath)
+
+    def close(self):
+        if self.packPath is not None:
+            PackPool.close(self.packPath)
 
     def __iter__(self) -> File:
         for file in self.files:
@@ -120,4 +271,72 @@ class FilesPack:
         if self == otherFilesPack:
             return []
         else:
-            return list(set([file.fileName for file in self.files]) & set([file.fileName for file in otherFilesPack.files]))
\ No newline at end of file
+            return list(set([file.fileName for file in self.files]) & set([file.fileName for file in otherFilesPack.files]))
+
+
+def PlaceFiles(files: List[File], workers: int=None):
+    """
+    Batched File.place: dumps of originals, then extraction, both in thread pool.
+    ModsConfig is updated and flushed once, before extraction. Yields files in order as they are placed
+    """
+    workers = workers or PLACE_WORKERS
+
+    #Files replacing same game file are placed in order by one task
+    groups = OrderedDict()
+    for file in files:
+        if file.GHOST_MOD: continue
+        if file.fileName not in groups:
+            groups[file.fileName] = []
+        groups[file.fileName].append(file)
+
+    def dump(file: File):
+        return (file.fileName, file.dump(commit=False)) if file.needsDump() else None
+
+    def extract(groupFiles: List[File]):
+        for file in groupFiles:
+            file.extract()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        dumped = [result for result in executor.map(dump, [groupFiles[0] for groupFiles in groups.values()]) if result is not None]
+
+        #Originals and hashes of files to place are on disk (DumpStore index and ModsConfig, even inside
+        #ModsConfig.batch()) before any game file is replaced. If run is interrupted, game file matches either
+        #its ModifiedFiles hash or none, then it is still original and dumping it again is right
+        if dumped:
+            DumpStore.save()
+            ModsConfig.OriginalFiles = {**ModsConfig.OriginalFiles, **dict(dumped)}
+        if groups:
+            ModsConfig.ModifiedFiles = {**ModsConfig.ModifiedFiles, **{fileName: groupFiles[-1].fileHash for fileName, groupFiles in groups.items()}}
+            ModsConfig.flush()
+
+        futures = {fileName: executor.submit(extract, groupFiles) for fileName, groupFiles in groups.items()}
+
+        try:
+            for file in files:
+                if not file.GHOST_MOD:
+                    futures[file.fileName].result()
+
+                yield file
+
+        finally:
+            for future in futures.values():
+                future.cancel()
+
+
+def CollectDumps(usedFileNames):
+    """
+    Drop dumps of game files no installed mod replaces and which are restored to original
+    """
+    usedFileNames = set(usedFileNames)
+
+    dropped = {
+        fileName
+        for fileName, origFileHash in ModsConfig.OriginalFiles.items()
+        if fileName not in usedFileNames and ModsConfig.ModifiedFiles.get(fileName, origFileHash) == origFileHash
+    }
+
+    if dropped:
+        ModsConfig.OriginalFiles = {fileName: fileHash for fileName, fileHash in ModsConfig.OriginalFiles.items() if fileName not in dropped}
+        ModsConfig.ModifiedFiles = {fileName: fileHash for fileName, fileHash in ModsConfig.ModifiedFiles.items() if fileName not in dropped}
+
+    DumpStore.gc(set(ModsConfig.OriginalFiles))
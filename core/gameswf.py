@@ -23,17 +23,29 @@
 #
 # *****************************************************************************
 
+from typing import Optional
+
 from .utils.imports import *
 from .utils.elementTypes import ElementAnyToObject, ElementAnyToStr
-from .utils.exceptions import FileDoesNotExist
-from .utils.gameconstants import BRAWLHALLA_SWFS
+from .utils.exceptions import FileDoesNotExist, IdRangeExhausted, TagsTruncated
+from .utils import gameconstants
 from .utils.swf import Swf, SwfUtils
+from .utils.swfscanner import SwfScanner
+from .utils.swfindex import ReadSwfIndex, WriteSwfIndex
+from .utils.symbolclass import SymbolClass
+from .utils.metadata import METADATA_TAG_ID, GameSwfMetadata
 
 
 SYMBOL_CLASS_TAG_IS_MODIFIED            = 0xffff
 SYMBOL_CLASS_TAG_BACKUP_ELEMENTS        = 0xfffe
 SYMBOL_CLASS_TAG_BACKUP_ACTION_SCRIPTS  = 0xfffd
 SYMBOL_CLASS_TAG_INSTALLED_MODS         = 0xfffc
+SYMBOL_CLASS_LEGACY_TAGS = [
+    SYMBOL_CLASS_TAG_IS_MODIFIED,
+    SYMBOL_CLASS_TAG_BACKUP_ELEMENTS,
+    SYMBOL_CLASS_TAG_BACKUP_ACTION_SCRIPTS,
+    SYMBOL_CLASS_TAG_INSTALLED_MODS
+]
 
 
 
@@ -44,52 +56,110 @@ GAME_SWF_IMAGES_END       = 0x6fff
 GAME_SWF_FONTS_START      = 0x7000
 GAME_SWF_FONTS_END        = 0x7fff
 GAME_SWF_BACKUP_START     = 0x8000
-GAME_SWF_BACKUP_END       = 0xffff
+GAME_SWF_BACKUP_END       = 0xfffe
+GAME_SWF_METADATA_ID      = METADATA_TAG_ID
+
+
+class IdAllocator:
+    start: int
+    end: int
+    used: set       #{elId, ...}
+    freed: list     #[elId, ...]    Released ids below cursor
+    cursor: int     #Next id to check
+
+    def __init__(self, start: int, end: int, used=()):
+        self.start = start
+        self.end = end
+        self.used = {elId for elId in used if start <= elId <= end}
+        self.freed = []
+        self.cursor = start
+
+    def allocate(self) -> int:
+        while self.freed:
+            elId = self.freed.pop()
+            if elId not in self.used:
+                self.used.add(elId)
+                return elId
+
+        while self.cursor <= self.end and self.cursor in self.used:
+            self.cursor += 1
+
+        if self.cursor > self.end:
+            raise IdRangeExhausted(f"No free ids in range {hex(self.start)}-{hex(self.end)}")
+
+        elId = self.cursor
+        self.used.add(elId)
+        self.cursor += 1
+        return elId
+
+    def reserve(self, elId: int):
+        if self.start <= elId <= self.end:
+            self.used.add(elId)
+
+    def free(self, elId: int):
+        if elId in self.used:
+            self.used.remove(elId)
+            if elId < self.cursor:
+                self.freed.append(elId)
+
+    def __contains__(self, elId):
+        return elId in self.used
 
 
 class GameSwf(Swf, SwfUtils):
-    backupElements: dict        #{elType: {oldId: newId, ...}, ...}
-    backupActionsScripts: dict  #{scriptName: content, ...}
-    installedMods: list         #[modHash, ...]                               #{modHash: {swfName: {elType: {elId: element, ...}, ...}, ...}, ...}
+    metadata: GameSwfMetadata
+    legacyMetadata: bool        #Metadata stored as json in SymbolClass
 
     origElementsList: list  #[element, ...]
     imagesMap: dict         #{elId: element, ...}
     backupElementsList: list#[element, ...]
 
+    backupAllocator: IdAllocator
+    imagesAllocator: IdAllocator
+
     def __init__(self, swfName):
         swfName = swfName.replace(".swf", "") + ".swf"
-        if swfName not in BRAWLHALLA_SWFS:
+        if swfName not in gameconstants.BRAWLHALLA_SWFS:
             raise FileDoesNotExist(f"Game file '{swfName}' doesn't exists")
 
-        super().__init__(BRAWLHALLA_SWFS[swfName])
+        super().__init__(gameconstants.BRAWLHALLA_SWFS[swfName])
 
     def init(self, *args):
         super().init(*args)
 
-        self.backupElements = {}
-        self.backupActionsScripts = {}
-        self.installedMods = []
+        self.metadata = GameSwfMetadata()
+        self.legacyMetadata = False
 
         self.origElementsList = []
         self.imagesMap = {}
         self.backupElementsList = []
 
-    def load(self):
-        super().load()
+        self.backupAllocator = IdAllocator(GAME_SWF_BACKUP_START, GAME_SWF_BACKUP_END)
+        self.imagesAllocator = IdAllocator(GAME_SWF_IMAGES_START, GAME_SWF_IMAGES_END)
 
-        if self.symbolClass.getTag(SYMBOL_CLASS_TAG_IS_MODIFIED):
-            self.backupElements = self.symbolClass.getTag(SYMBOL_CLASS_TAG_BACKUP_ELEMENTS)
-            self.backupActionsScripts = self.symbolClass.getTag(SYMBOL_CLASS_TAG_BACKUP_ACTION_SCRIPTS)
-            self.installedMods = self.symbolClass.getTag(SYMBOL_CLASS_TAG_INSTALLED_MODS)
-        else:
-            self.symbolClass.addTag(SYMBOL_CLASS_TAG_IS_MODIFIED, True)
-            self.symbolClass.addTag(SYMBOL_CLASS_TAG_BACKUP_ELEMENTS, {})
-            self.symbolClass.addTag(SYMBOL_CLASS_TAG_BACKUP_ACTION_SCRIPTS, {})
-            self.symbolClass.addTag(SYMBOL_CLASS_TAG_INSTALLED_MODS, [])
-            self.symbolClass.save()
+    def load(self, elTypes=None, lazy=False):
+        """
+        With elTypes or lazy, origElementsList and backupElementsList hold only the types indexed at load
+        """
+        if lazy or elTypes is not None:
+            #Images are needed to allocate new image ids
+            elTypes = {*(elTypes or []), *DefineBitsLosslessTags}
+
+        super().load(elTypes=elTypes, lazy=lazy)
+
+        metadataTag = self.binaryData.get(GAME_SWF_METADATA_ID, None)
 
-        for elType, elIdsMap in self.backupElements.items():
-            self.backupElements[elType] = {int(old):int(new) for old, new in elIdsMap.items()}
+        if metadataTag is not None:
+            self.metadata = GameSwfMetadata(bytes(metadataTag.binaryData.getRangeData()))
+
+        elif self.symbolClass is not None and self.symbolClass.getTag(SYMBOL_CLASS_TAG_IS_MODIFIED):
+            #Migrate from json in SymbolClass
+            self.metadata = GameSwfMetadata.fromObjects(
+                installedMods=self.symbolClass.getTag(SYMBOL_CLASS_TAG_INSTALLED_MODS),
+                backupElements=self.symbolClass.getTag(SYMBOL_CLASS_TAG_BACKUP_ELEMENTS),
+                backupActionsScripts=self.symbolClass.getTag(SYMBOL_CLASS_TAG_BACKUP_ACTION_SCRIPTS)
+            )
+            self.legacyMetadata = True
 
         for element, elId in self.elementsMap.items():
             elType = type(element)
@@ -103,15 +173,89 @@ class GameSwf(Swf, SwfUtils):
             elif elId >= GAME_SWF_BACKUP_START and elId <= GAME_SWF_BACKUP_END:
                 self.backupElementsList.append(element)
 
+        usedIds = [*self.elementsMap.values(), *[_elId for _elIds in self.backupElements.values() for _elId in _elIds.values()]]
+        self.backupAllocator = IdAllocator(GAME_SWF_BACKUP_START, GAME_SWF_BACKUP_END, usedIds)
+        self.imagesAllocator = IdAllocator(GAME_SWF_IMAGES_START, GAME_SWF_IMAGES_END, usedIds)
+
         return self
 
-    def save(self):
-        self.symbolClass.setTag(SYMBOL_CLASS_TAG_BACKUP_ELEMENTS, self.backupElements)
-        self.symbolClass.setTag(SYMBOL_CLASS_TAG_BACKUP_ACTION_SCRIPTS, self.backupActionsScripts)
-        self.symbolClass.setTag(SYMBOL_CLASS_TAG_INSTALLED_MODS, self.installedMods)
-        self.symbolClass.save()
+    @property
+    def backupElements(self) -> dict:
+        """
+        {elType: {oldId: newId, ...}, ...}
+        """
+        return self.metadata.backupElements
+
+    @property
+    def backupActionsScripts(self) -> dict:
+        """
+        {scriptName: content, ...}
+        """
+        return self.metadata.backupActionsScripts
+
+    @property
+    def installedMods(self) -> list:
+        """
+        [modHash, ...]
+        """
+        return self.metadata.installedMods
+
+    @staticmethod
+    def readMetadata(swfName) -> Optional[GameSwfMetadata]:
+        """
+        Read metadata with SwfScanner, without loading swf in FFDec. None if swf can't be scanned
+        """
+        swfName = swfName.replace(".swf", "") + ".swf"
+        if swfName not in gameconstants.BRAWLHALLA_SWFS:
+            raise FileDoesNotExist(f"Game file '{swfName}' doesn't exists")
+
+        index = ReadSwfIndex(gameconstants.BRAWLHALLA_SWFS[swfName])
+        if index is not None and index.metadata is not None:
+            return GameSwfMetadata(index.metadata)
+
+        try:
+            scanner = SwfScanner(gameconstants.BRAWLHALLA_SWFS[swfName]).scan()
+        except (OSError, ValueError, TagsTruncated):
+            return None
+
+        if GAME_SWF_METADATA_ID in scanner.binaryData:
+            return GameSwfMetadata(scanner.binaryData[GAME_SWF_METADATA_ID])
+
+        symbolClass = SymbolClass.fromTagToNameMap(scanner.symbolClass)
+        if symbolClass.getTag(SYMBOL_CLASS_TAG_IS_MODIFIED):
+            return GameSwfMetadata.fromObjects(
+                installedMods=symbolClass.getTag(SYMBOL_CLASS_TAG_INSTALLED_MODS),
+                backupElements=symbolClass.getTag(SYMBOL_CLASS_TAG_BACKUP_ELEMENTS),
+                backupActionsScripts=symbolClass.getTag(SYMBOL_CLASS_TAG_BACKUP_ACTION_SCRIPTS)
+            )
+
+        return GameSwfMetadata()
+
+    def save(self, incremental=False):
+        metadataTag = self.binaryData.get(GAME_SWF_METADATA_ID, None)
+
+        if metadataTag is None:
+            metadataTag = DefineBinaryDataTag(self.swf)
+            metadataTag.tag = GAME_SWF_METADATA_ID
+            self.swf.addTag(metadataTag)
+            self.binaryData[GAME_SWF_METADATA_ID] = metadataTag
+
+        metadata = self.metadata.encode()
+        metadataTag.binaryData = ByteArrayRange(JArray(JByte)(metadata))
+        metadataTag.setModified(True)
+
+        if self.legacyMetadata:
+            for tag in SYMBOL_CLASS_LEGACY_TAGS:
+                self.symbolClass.removeTag(tag)
+            self.symbolClass.save()
+            self.legacyMetadata = False
+
+        super().save(incremental)
 
-        super().save()
+        #Index of written file for read-only paths (readMetadata), with hash taken while writing
+        if self.tagsIndex is not None:
+            self.tagsIndex.metadata = metadata
+            WriteSwfIndex(self.swfPath, self.tagsIndex, self.tagsIndex.contentHash)
 
     def __backupElement(self, element, elId, newElId):
         if element is None: return 
@@ -153,7 +297,7 @@ class GameSwf(Swf, SwfUtils):
 
             if self.backupElements.get(strElType, {}).get(elId, None) is None:
                 element = self.getElementById(elId, elType)
-                newElId = max([_elId for _elIds in self.backupElements.values() for _elId in _elIds.values()] or [GAME_SWF_BACKUP_START-1]) + 1
+                newElId = self.backupAllocator.allocate()
 
                 self.__backupElement(element, elId, newElId)
 
@@ -208,6 +352,7 @@ class GameSwf(Swf, SwfUtils):
                             image = self.imagesMap.pop(imageId, None)
                             if image:
                                 self.removeElement(image)
+                                self.imagesAllocator.free(imageId)
 
                     self.replaceElement(element, origElement)
 
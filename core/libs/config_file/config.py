@@ -1,10 +1,22 @@
-import re, os, json
+import re, os, json, atexit, tempfile, multiprocessing
+from contextlib import contextmanager
 from typing import Union
 
 __all__ = ["ConfigFile", "ConfigElement"]
 _type = type
 
 END_STRING = ";\t\n"
+LOG_SUFFIX = ".log"
+COMPACT_MIN_SIZE = 64 * 1024
+
+LINE_PATTERN = re.compile(f' *?([A-Za-z0-9_]+) *?\\[ *?(bool|int|str|list|dict) *?\\][ =]*(.*){END_STRING}')
+
+
+def _is_main_process() -> bool:
+    parent_process = getattr(multiprocessing, "parent_process", None)   # Python 3.8+
+    if parent_process is not None:
+        return parent_process() is None
+    return multiprocessing.current_process().name == "MainProcess"
 
 
 class ConfigFileMeta(type):
@@ -47,67 +59,158 @@ class ConfigFile(metaclass=ConfigFileMeta):
 
     str_to_type = {v: k for k, v in type_to_str.items()}
 
-    def __init__(self, path):
+    def __init__(self, path, owner: bool = None):
+        """
+        owner: process that compacts the .log into .cfg (on load, on exit and when the log outgrows it).
+               Default is the main process: worker processes import modules again and create the same
+               configs, they only append to the .log so a compaction can't drop lines the owner appends
+        """
         self._path = path
+        self._owner = _is_main_process() if owner is None else owner
+        self._log_path = path + LOG_SUFFIX
+        self._batch_depth = 0
+        self._batch_changed = []
+        self._lines = {}    # {key: serialized line, ...}
+        self._base_size = 0
+        self._log_size = 0
 
         # Create .cfg file
         if not os.path.exists(self._path):
             open(self._path, "w").close()
 
+        with open(self._path, "r") as cfg:
+            content = cfg.read()
+        self._base_size = len(content)
+
+        # Changes appended by a previous run that did not compact on exit
+        has_log = os.path.exists(self._log_path)
+        if has_log:
+            with open(self._log_path, "r") as log:
+                content += "\n" + log.read()
+
+        # Single pass over the file, later lines override earlier ones
+        found = {}
+        for match in LINE_PATTERN.finditer(content):
+            name, attr_type, attr = match.groups()
+            if name not in found:
+                found[name] = []
+            found[name].append((attr_type, attr, match.group(0).lstrip(" ")))
+
         new_elements = False
 
         # Load config by ConfigElements on child class
-        with open(self._path, "r") as cfg:
-            cfgContent = cfg.read()
-
-            for element in self._elements.values():
-                _attr = re.findall(
-                    f' *?{element.name} *?\[ *?({self.type_to_str[element.type]}) *?\][ =]*(.*){END_STRING}',
-                    cfgContent)
-
-                if _attr:
-                    attr_type = self.str_to_type[_attr[0][0]]
-
-                    if _attr[0][1]:
-                        attr: str = _attr[0][1]
-
-                        if attr_type in [list, dict]:
-                            element.attr = json.loads(attr)
-                        elif attr_type in [int]:
-                            element.attr = int(attr)
-                        elif attr_type in [bool]:
-                            element.attr = True if attr.casefold() in ["true", "1"] else False
-                        else:
-                            element.attr = attr
-                    else:
-                        element.attr = None
+        for key, element in self._elements.items():
+            for attr_type, attr, line in reversed(found.get(element.name, [])):
+                if attr_type != self.type_to_str[element.type]:
+                    continue
 
-                else:
-                    new_elements = True
+                try:
+                    element.attr = self._decode(self.str_to_type[attr_type], attr)
+                except ValueError:
+                    continue
+
+                self._lines[key] = line
+                break
+
+            else:
+                self._lines[key] = self._encode(element)
+                new_elements = True
+
+        if self._owner:
+            if new_elements or has_log:
+                self._write_all()
+
+            atexit.register(self.compact)
+
+    @staticmethod
+    def _decode(attr_type, attr: str):
+        if not attr:
+            return None
+        elif attr_type in [list, dict]:
+            return json.loads(attr)
+        elif attr_type in [int]:
+            return int(attr)
+        elif attr_type in [bool]:
+            return True if attr.casefold() in ["true", "1"] else False
+        else:
+            return attr
 
-        if new_elements:
+    def _encode(self, element) -> str:
+        attr = element.attr
+        attr_type = self.type_to_str[element.type]
+
+        if attr is None:
+            return f'{element.name}[{attr_type}]{END_STRING}'
+
+        if element.type in [list, dict]:
+            attr = json.dumps(attr)
+        else:
+            attr = str(attr)
+
+        return f'{element.name}[{attr_type}] = {attr}{END_STRING}'
+
+    @contextmanager
+    def batch(self):
+        """
+        Defer writes until the outermost batch exits, then write the file once
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._batch_changed:
+                changed, self._batch_changed = self._batch_changed, []
+                self._persist(changed)
+
+    def flush(self):
+        """
+        Write changes deferred by batch() right away, batch stays open
+        """
+        if self._batch_changed:
+            changed, self._batch_changed = self._batch_changed, []
+            self._persist(changed)
+
+    def _persist(self, keys):
+        """
+        Append changed elements to the .log file, compact it into .cfg when it outgrows the file
+        """
+        content = "".join(self._lines[key] for key in keys)
+
+        if self._owner and self._log_size + len(content) > max(self._base_size, COMPACT_MIN_SIZE):
+            self._write_all()
+            return
+
+        with open(self._log_path, "a") as log:
+            # Finish a line cut off by an interrupted write
+            if log.tell() and self._log_size == 0:
+                content = "\n" + content
+            log.write(content)
+
+        self._log_size += len(content)
+
+    def compact(self):
+        """
+        Merge the .log file into .cfg, only in the owner process
+        """
+        if self._owner and os.path.exists(self._log_path):
             self._write_all()
 
     def _write_all(self):
-        with open(self._path, "w") as cfg:
-            for element in self._elements.values():
-                attr = element.attr
-                attr_type = self.type_to_str[element.type]
+        content = "".join(self._lines[key] for key in self._elements)
 
-                if attr is None:
-                    cfg.write(f'{element.name}[{attr_type}]{END_STRING}')
+        # Unique temporary file, worker processes may write the same config
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self._path) + ".", suffix=".tmp", dir=os.path.dirname(self._path) or ".")
+        with os.fdopen(fd, "w") as cfg:
+            cfg.write(content)
 
-                else:
-                    if element.type in [list, dict]:
-                        attr = json.dumps(attr)
-                    elif element.type in [int]:
-                        attr = str(attr)
-                    elif element.type in [bool]:
-                        attr = str(attr)
-                    else:
-                        attr = str(attr)
+        os.replace(tmp_path, self._path)
+
+        if os.path.exists(self._log_path):
+            os.remove(self._log_path)
 
-                    cfg.write(f'{element.name}[{attr_type}] = {attr}{END_STRING}')
+        self._base_size = len(content)
+        self._log_size = 0
 
     def __setattr__(self, key, value):
         if key in self._elements:
@@ -118,7 +221,13 @@ class ConfigFile(metaclass=ConfigFileMeta):
                     raise TypeError("Variable type does not match specified type")
 
                 element.attr = value
-                self._write_all()
+                self._lines[key] = self._encode(element)
+
+                if self._batch_depth:
+                    if key not in self._batch_changed:
+                        self._batch_changed.append(key)
+                else:
+                    self._persist([key])
 
         # elif not key.startswith("_"):
         #    if key not in self._elements:
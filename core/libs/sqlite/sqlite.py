@@ -25,10 +25,17 @@ class Sql():
     def execute(self, table, *args):
         if self.debug: print(args)
 
-        columns = [col["name"] for col in self.columns(table)]
+        return list(self._rows(self.c.execute(*args)))
 
-        return [
-            dict(
+
+    def _rows(self, cursor):
+        if cursor.description is None:
+            return
+
+        columns = [col[0] for col in cursor.description]
+
+        for row in cursor:
+            yield dict(
                 zip(
                     columns, 
                     [
@@ -37,8 +44,15 @@ class Sql():
                     ]
                 )
             )
-            for row in self.c.execute(*args)
-        ]
+
+
+    def iterate(self, table, *args):
+        """
+        Построчное выполнение запроса (отдельный курсор)
+        """
+        if self.debug: print(args)
+
+        return self._rows(self.conn.execute(*args))
 
 
 
@@ -52,6 +66,16 @@ class Sql():
         return self.execute(table, *args)
         
 
+    def read_iter(self, table=None):
+        """
+        Построчное чтение таблицы
+        """
+
+        args = (f'SELECT * FROM {table}',)
+
+        return self.iterate(table, *args)
+
+
     def search(self, table=None, data=None):
         """
         Поиск по таблице
@@ -128,6 +152,116 @@ class Sql():
         return
 
 
+    def add_many(self, table=None, rows=None, autosave=True):
+        """
+        Добавление нескольких записей в таблицу одной транзакцией
+
+        add_many("TABLE_NAME", [{"COLUMN_NAME": "CONTENT", ...}, ...])
+        """
+
+        for columns, values in self._group_rows(rows).items():
+            args = (
+                'INSERT INTO {} ({}) VALUES ({})'.format(
+                    table,
+                    ", ".join(columns),
+                    ", ".join(["?"]*len(columns))
+                ),
+                values
+            )
+
+            if self.debug: print(args)
+            self.c.executemany(*args)
+
+        if autosave: self.conn.commit()
+
+        return
+
+
+    def upsert_many(self, table=None, keys=None, rows=None, autosave=True):
+        """
+        Обновление записей по совпадению ключевых столбцов или добавление новых одной транзакцией
+
+        upsert_many("TABLE_NAME", ["KEY_COLUMN", ...], [{"KEY_COLUMN": "CONTENT", "COLUMN_NAME": "CONTENT", ...}, ...])
+        """
+
+        existing = {
+            tuple(row) 
+            for row in self.conn.execute(f'SELECT {", ".join(keys)} FROM {table}')
+        }
+
+        new_rows = []
+        update_rows = []
+        for row in rows:
+            if tuple(row[key] for key in keys) in existing:
+                update_rows.append(row)
+            else:
+                new_rows.append(row)
+
+        for columns, values in self._group_rows(update_rows).items():
+            args = (
+                'UPDATE {} SET {} WHERE {}'.format(
+                    table,
+                    ", ".join([key + " = ?" for key in columns]),
+                    " and ".join([key + " = ?" for key in keys])
+                ),
+                [
+                    [*row, *[row[columns.index(key)] for key in keys]]
+                    for row in values
+                ]
+            )
+
+            if self.debug: print(args)
+            self.c.executemany(*args)
+
+        self.add_many(table, new_rows, False)
+
+        if autosave: self.conn.commit()
+
+        return
+
+
+    def delete_many(self, table=None, rows=None, autosave=True):
+        """
+        Удаление нескольких записей по совпадению ключей в столбцах одной транзакцией
+
+        delete_many("TABLE_NAME", [{"COLUMN_NAME": "CONTENT", ...}, ...])
+        """
+
+        groups = {}
+        for row in rows:
+            pattern = tuple((key, value is None) for key, value in row.items())
+            if pattern not in groups:
+                groups[pattern] = []
+            groups[pattern].append([v for v in row.values() if v is not None])
+
+        for pattern, values in groups.items():
+            args = (
+                f"DELETE FROM {table} WHERE " + " and ".join(
+                    [((key + " is null") if is_null else (key + " = ?")) for key, is_null in pattern]
+                ), 
+                values
+            )
+
+            if self.debug: print(args)
+            self.c.executemany(*args)
+
+        if autosave: self.conn.commit()
+
+        return
+
+
+    def _group_rows(self, rows):
+        groups = {}
+
+        for row in rows:
+            columns = tuple(row)
+            if columns not in groups:
+                groups[columns] = []
+            groups[columns].append([row[key] for key in columns])
+
+        return groups
+
+
     def delete(self, table=None, data=None, autosave=True):
         """
         Удаление записи из таблицы по совпадению ключей в столбцах
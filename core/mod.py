@@ -27,16 +27,22 @@ import json
 import hashlib
 import time
 import zipfile
-from typing import List, Dict
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Set
 
-from . import MODS_PATH
+from . import GetModsPath
 from . import Sql
-from .utils.localConfig import ModsConfig
+from .utils.localConfig import LOCAL_DATA_PATH, ModsConfig
 from .utils.exceptions import ModResourcesNotFound, ModFolderDoesNotExist, ModNotBuilded, ModifierDoesNotExist
 from .utils.imports import *
 from .utils.elementTypes import ElementObjectToStr
-from .utils.gameconstants import BRAWLHALLA_PATH, BRAWLHALLA_SWFS, BRAWLHALLA_FILES
+from .utils import gameconstants
 from .utils.swf import Swf
+from .utils.hashing import FileHashes, HashCache
+from .utils.zippack import WriteMembers, CopyMember
+from .utils.atomicfile import AtomicWrite
 from .modifier import MODIFIER_FORMAT, Modifier, ModifierTemplate, ModifierCreator
 from .file import FILES_PACK, FilesPack
 
@@ -75,6 +81,63 @@ MOD_TABLE_FILES_STRUCTURE = {
     MOD_TABLE_FILES_HASH: str
 }
 
+#Sources and outputs of last build
+MOD_TABLE_MANIFEST = "Manifest"
+MOD_TABLE_MANIFEST_SOURCE = "source"    #Path relative to mod folder
+MOD_TABLE_MANIFEST_TARGET = "target"    #Modifier swf name or game file name of source, empty for outputs
+MOD_TABLE_MANIFEST_SIZE   = "size"
+MOD_TABLE_MANIFEST_MTIME  = "mtime"
+MOD_TABLE_MANIFEST_HASH   = "hash"
+MOD_TABLE_MANIFEST_STRUCTURE = {
+    MOD_TABLE_MANIFEST_SOURCE: str,
+    MOD_TABLE_MANIFEST_TARGET: str,
+    MOD_TABLE_MANIFEST_SIZE:   int,
+    MOD_TABLE_MANIFEST_MTIME:  int,
+    MOD_TABLE_MANIFEST_HASH:   str
+}
+
+#Sources modified this close to previous build may keep size and mtime (coarse mtime of FAT), they are hashed again
+MANIFEST_RACY_NS = 2 * 1000000000
+
+MODS_CACHE_FILE = os.path.join(LOCAL_DATA_PATH, "mods.cache")
+MODS_CACHE_VERSION = 1
+
+
+def ReadModIndex(modPath: str) -> dict:
+    """
+    Read raw tables of mod index.db
+    """
+    with Sql(os.path.join(modPath, MOD_DATABASE_FILE)) as index:
+        return {
+            MOD_TABLE_CONFIGURATION: {cfg["key"]:cfg["value"] for cfg in index.read_iter(MOD_TABLE_CONFIGURATION)},
+            MOD_TABLE_MODIFIER: [
+                {
+                    MOD_TABLE_MODIFIER_NAME: modifier[MOD_TABLE_MODIFIER_NAME],
+                    MOD_TABLE_MODIFIER_ELEMENTS: modifier[MOD_TABLE_MODIFIER_ELEMENTS]
+                }
+                for modifier in index.read_iter(MOD_TABLE_MODIFIER)
+            ],
+            MOD_TABLE_FILES: [
+                {
+                    MOD_TABLE_FILES_NAME: file[MOD_TABLE_FILES_NAME],
+                    MOD_TABLE_FILES_PATH: file[MOD_TABLE_FILES_PATH],
+                    MOD_TABLE_FILES_HASH: file[MOD_TABLE_FILES_HASH]
+                }
+                for file in index.read_iter(MOD_TABLE_FILES)
+            ]
+        }
+
+
+def _IndexStamp(modPath: str) -> list:
+    stat = os.stat(os.path.join(modPath, MOD_DATABASE_FILE))
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+#Threads loading .bmlswf elements while building. Serial unless asked: output of threaded
+#FFDec loading isn't yet compared with serial build
+BUILD_WORKERS = 1
+
+
 class ModifierFlag:
     pass
 class FileFlag:
@@ -103,7 +166,7 @@ class Mod:
 
     installed: bool
 
-    def __init__(self, modFolder: str=None, modJson: dict=None):
+    def __init__(self, modFolder: str=None, modJson: dict=None, modIndex: dict=None):
         self.GHOST_MOD = bool(modJson)
 
         if self.GHOST_MOD:
@@ -123,7 +186,7 @@ class Mod:
                 self.filesPack.addFile(file[MOD_TABLE_FILES_NAME], file[MOD_TABLE_FILES_PATH], file[MOD_TABLE_FILES_HASH])
 
         else:
-            self.modPath = os.path.join(MODS_PATH, modFolder)
+            self.modPath = os.path.join(GetModsPath(), modFolder)
             self.modFolder = modFolder
 
             if not os.path.exists(self.modPath):
@@ -132,24 +195,25 @@ class Mod:
             if not os.path.exists(os.path.join(self.modPath, MOD_DATABASE_FILE)):
                 raise ModNotBuilded(f"Mod '{modFolder}' not builded")
 
+            if modIndex is None:
+                modIndex = ReadModIndex(self.modPath)
+
             self.modifierList = []
 
-            #Open index.db
-            with Sql(os.path.join(self.modPath, MOD_DATABASE_FILE)) as index:
-                self.loadConfig({cfg["key"]:cfg["value"] for cfg in index.read(MOD_TABLE_CONFIGURATION)})
+            self.loadConfig(modIndex[MOD_TABLE_CONFIGURATION])
 
-                #Load modifiers
-                for modifier in index.read(MOD_TABLE_MODIFIER):
-                    if not os.path.exists(os.path.join(self.modPath, f"{modifier[MOD_TABLE_MODIFIER_NAME]}.{MODIFIER_FORMAT}")):
-                        raise ModifierDoesNotExist(f"Modifier '{modifier[MOD_TABLE_MODIFIER_NAME]}.{MODIFIER_FORMAT}' doesn't exist")
+            #Load modifiers
+            for modifier in modIndex[MOD_TABLE_MODIFIER]:
+                if not os.path.exists(os.path.join(self.modPath, f"{modifier[MOD_TABLE_MODIFIER_NAME]}.{MODIFIER_FORMAT}")):
+                    raise ModifierDoesNotExist(f"Modifier '{modifier[MOD_TABLE_MODIFIER_NAME]}.{MODIFIER_FORMAT}' doesn't exist")
 
-                    self.modifierList.append(Modifier(self, modifier[MOD_TABLE_MODIFIER_NAME], json.loads(modifier[MOD_TABLE_MODIFIER_ELEMENTS])))
+                self.modifierList.append(Modifier(self, modifier[MOD_TABLE_MODIFIER_NAME], json.loads(modifier[MOD_TABLE_MODIFIER_ELEMENTS])))
 
-                self.filesPack = FilesPack(self.modPath, self.modHash)
+            self.filesPack = FilesPack(self.modPath, self.modHash)
 
-                #Load files
-                for file in index.read(MOD_TABLE_FILES):
-                    self.filesPack.addFile(file[MOD_TABLE_FILES_NAME], file[MOD_TABLE_FILES_PATH], file[MOD_TABLE_FILES_HASH])
+            #Load files
+            for file in modIndex[MOD_TABLE_FILES]:
+                self.filesPack.addFile(file[MOD_TABLE_FILES_NAME], file[MOD_TABLE_FILES_PATH], file[MOD_TABLE_FILES_HASH])
 
         #self.installed = self.modHash in ModsConfig.InstalledMods
     @property
@@ -220,9 +284,19 @@ class ModBuilder:
     modPath: str
     modifierResources: dict
     files: dict
-
-    def __init__(self, modFolder):
-        self.modPath = os.path.join(MODS_PATH, modFolder)
+    workers: int
+    packWorkers: int
+    manifestTime: int   #mtime_ns of index.db with manifest of previous build
+
+    def __init__(self, modFolder, workers: int=None, packWorkers: int=1):
+        """
+        workers:     threads loading element files, BUILD_WORKERS if not set
+        packWorkers: threads compressing files of pack.zip
+        """
+        self.modPath = os.path.join(GetModsPath(), modFolder)
+        self.workers = workers or BUILD_WORKERS
+        self.packWorkers = packWorkers
+        self.manifestTime = 0
 
         if not os.path.exists(self.modPath):
             raise ModFolderDoesNotExist(f"Mod folder '{modFolder}' doesn't exist")
@@ -235,12 +309,12 @@ class ModBuilder:
                 self.modifierResources = {
                     folder.replace(".swf", ""):os.path.join(self.modPath, folder)
                     for folder in folders
-                    if folder.replace(".swf", "")+".swf" in BRAWLHALLA_SWFS and folder.replace(".swf", "") != "BrawlhallaAir"
+                    if folder.replace(".swf", "")+".swf" in gameconstants.BRAWLHALLA_SWFS and folder.replace(".swf", "") != "BrawlhallaAir"
                 }
             
             else:
                 for file in files:
-                    if file in BRAWLHALLA_FILES:
+                    if file in gameconstants.BRAWLHALLA_FILES:
                         self.files[os.path.join(path.replace(self.modPath+"\\", ""), file)] = file
 
         if not self.modifierResources and not self.files:
@@ -290,172 +364,583 @@ class ModBuilder:
             if MOD_TABLE_FILES not in indexTables:
                 index.create(MOD_TABLE_FILES, MOD_TABLE_FILES_STRUCTURE)
 
+            #Create build manifest table
+            if MOD_TABLE_MANIFEST not in indexTables:
+                index.create(MOD_TABLE_MANIFEST, MOD_TABLE_MANIFEST_STRUCTURE)
+
             #Write/Update config table
-            for key, value in config.items():
-                if index.search(MOD_TABLE_CONFIGURATION, {"key": key}):
-                    index.update(MOD_TABLE_CONFIGURATION, {"key": key}, {"key": key, "value": value}, False)
-                else:
-                    index.add(MOD_TABLE_CONFIGURATION, {"key": key, "value": value}, False)
+            index.upsert_many(MOD_TABLE_CONFIGURATION, ["key"], [{"key": key, "value": value} for key, value in config.items()], False)
 
             index.save()
 
-    def _build(self):
-        indexModifiersElements = {}
-        output = []
-
-        for swfName, modifierResourcesPath in self.modifierResources.items():
-            indexModifiersElements[swfName] = {}
-            modifierElements = indexModifiersElements[swfName]
-
-            mdcr = ModifierCreator(self.modPath, swfName)
-
-            #Find Modifier elements
-            elementFiles = []
-            scriptFiles = []
-            for element_folder in os.listdir(modifierResourcesPath):
-                if element_folder in ["shapes", "morphshapes", "sprites", "fonts", "texts", "sounds", "images"]:
-                    elementFiles += [
-                                    os.path.join(modifierResourcesPath, element_folder, element) 
-                                    for element in os.listdir(os.path.join(modifierResourcesPath, element_folder))
-                                    if element.endswith(RESOURCE_ELEMENT_FORMAT)
-                                ]
-                elif element_folder in ["scripts"]:
-                    scriptFiles += [
-                                    os.path.join(modifierResourcesPath, element_folder, element) 
-                                    for element in os.listdir(os.path.join(modifierResourcesPath, element_folder))
-                                    if element.endswith(".as")
-                                ]
-
-            #Open .bmlswf's and write its elements to .bmlmodifier
+    def _readManifest(self) -> Dict[str, dict]:
+        """
+        {source: row, ...} of previous build
+        """
+        indexPath = os.path.join(self.modPath, MOD_DATABASE_FILE)
+        self.manifestTime = os.stat(indexPath).st_mtime_ns if os.path.isfile(indexPath) else 0
+
+        with Sql(indexPath) as index:
+            if MOD_TABLE_MANIFEST not in index.tables():
+                return {}
+
+            return {row[MOD_TABLE_MANIFEST_SOURCE]: row for row in index.read_iter(MOD_TABLE_MANIFEST)}
+
+    def _manifestRows(self, paths: Dict[str, str], manifest: Dict[str, dict], hashChanged=True) -> Dict[str, dict]:
+        """
+        paths:       {path: target, ...}
+        hashChanged: hash files changed since previous build, else their hash is left None
+
+        Hashes of files with same size and mtime are taken from manifest, unless modified
+        within MANIFEST_RACY_NS of previous build. Other changes keeping size and mtime need force
+        """
+        rows = {}
+        toHash = {}
+
+        for path, target in paths.items():
+            source = os.path.relpath(path, self.modPath)
+            stat = os.stat(path)
+            old = manifest.get(source, None)
+
+            rows[source] = {
+                MOD_TABLE_MANIFEST_SOURCE: source,
+                MOD_TABLE_MANIFEST_TARGET: target,
+                MOD_TABLE_MANIFEST_SIZE:   stat.st_size,
+                MOD_TABLE_MANIFEST_MTIME:  stat.st_mtime_ns,
+                MOD_TABLE_MANIFEST_HASH:   None
+            }
+
+            if old is not None and old[MOD_TABLE_MANIFEST_SIZE] == stat.st_size and old[MOD_TABLE_MANIFEST_MTIME] == stat.st_mtime_ns:
+                #Outputs are written by builder itself
+                if not target or stat.st_mtime_ns < self.manifestTime - MANIFEST_RACY_NS:
+                    rows[source][MOD_TABLE_MANIFEST_HASH] = old[MOD_TABLE_MANIFEST_HASH]
+                    continue
+
+                #Hash cache has same size and mtime
+                HashCache.forget(path)
+
+            toHash[path] = source
+
+        if hashChanged:
+            for path, fileHash in FileHashes(list(toHash)).items():
+                rows[toHash[path]][MOD_TABLE_MANIFEST_HASH] = fileHash
+
+        return rows
+
+    def _isUpToDate(self, rows: Dict[str, dict], target: str, manifest: Dict[str, dict]) -> bool:
+        """
+        Sources of target are same as in previous build
+        """
+        old = {source: row for source, row in manifest.items() if row[MOD_TABLE_MANIFEST_TARGET] == target}
+
+        return set(old) == set(rows) and all(old[source][MOD_TABLE_MANIFEST_HASH] == row[MOD_TABLE_MANIFEST_HASH] for source, row in rows.items())
+
+    def _isOutputUpToDate(self, outputPath: str, manifest: Dict[str, dict]) -> bool:
+        """
+        Output of previous build wasn't changed or removed
+        """
+        old = manifest.get(os.path.relpath(outputPath, self.modPath), None)
+        if old is None or not os.path.isfile(outputPath):
+            return False
+
+        stat = os.stat(outputPath)
+        return old[MOD_TABLE_MANIFEST_SIZE] == stat.st_size and old[MOD_TABLE_MANIFEST_MTIME] == stat.st_mtime_ns
+
+    def _findModifierSources(self, modifierResourcesPath: str):
+        elementFiles = []
+        scriptFiles = []
+        for element_folder in os.listdir(modifierResourcesPath):
+            if element_folder in ["shapes", "morphshapes", "sprites", "fonts", "texts", "sounds", "images"]:
+                elementFiles += [
+                                os.path.join(modifierResourcesPath, element_folder, element) 
+                                for element in os.listdir(os.path.join(modifierResourcesPath, element_folder))
+                                if element.endswith(RESOURCE_ELEMENT_FORMAT)
+                            ]
+            elif element_folder in ["scripts"]:
+                scriptFiles += [
+                                os.path.join(modifierResourcesPath, element_folder, element) 
+                                for element in os.listdir(os.path.join(modifierResourcesPath, element_folder))
+                                if element.endswith(".as")
+                            ]
+
+        return elementFiles, scriptFiles
+
+    @staticmethod
+    def _loadElement(elementPath: str):
+        """
+        Load .bmlswf and set element id by file name
+        """
+        elementSwf = Swf(elementPath)
+        elementSwf.load()
+
+        #New element id by file name
+        newElId = int(elementPath.rsplit("\\", 1)[1].replace(RESOURCE_ELEMENT_FORMAT, ""))
+        elementChanged = False
+        for element, elId in list(elementSwf.elementsMap.items()):
+            if elId != newElId:
+                elementSwf.setElementId(element, newElId)
+                elementChanged = True
+
+        #Keep source untouched if ids are right
+        if elementChanged:
+            elementSwf.save()
+
+        return elementSwf, newElId
+
+    def _loadElements(self, elementFiles: List[str]):
+        """
+        Yields (elementSwf, elId) in order of elementFiles, loading up to 2*workers files ahead in threads
+        """
+        if self.workers == 1 or len(elementFiles) < 2:
             for elementPath in elementFiles:
-                elementSwf = Swf(elementPath)
-                elementSwf.load()
+                yield self._loadElement(elementPath)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            paths = iter(elementFiles)
+
+            for elementPath in paths:
+                pending.append(executor.submit(self._loadElement, elementPath))
+                if len(pending) >= self.workers * 2:
+                    break
+
+            while pending:
+                yield pending.popleft().result()
+
+                for elementPath in paths:
+                    pending.append(executor.submit(self._loadElement, elementPath))
+                    break
+
+    def _buildModifier(self, swfName: str, elementFiles: List[str], scriptFiles: List[str]) -> dict:
+        """
+        Write .bmlmodifier, returns {elType: [elId, ...], ...}
+        """
+        modifierElements = {}
+
+        mdcr = ModifierCreator(self.modPath, swfName)
+
+        #Open .bmlswf's and write its elements to .bmlmodifier in order of files
+        for elementSwf, newElId in self._loadElements(elementFiles):
+            for element in list(elementSwf.elementsMap):
+                strElType = ElementObjectToStr(element)
+
+                mdcr.addElement(element)
+
+                if strElType not in modifierElements:
+                    modifierElements[strElType] = []
+                modifierElements[strElType].append(newElId)
+
+            elementSwf.close()
+
+        #Write scripts to .bmlmodifier
+        for scriptFile in scriptFiles:
+            with open(scriptFile, "r") as script:
+                strElType = ElementObjectToStr(ActionScriptTag)
+                scriptName = scriptFile.rsplit("\\", 1)[1].replace(".as", "")
+
+                mdcr.addAS(scriptName, script.read())
+
+                if strElType not in modifierElements:
+                    modifierElements[strElType] = []
+                modifierElements[strElType].append(scriptName)
+
+        mdcr.save()
+
+        return modifierElements
+
+    def _buildFilesPack(self, rows: Dict[str, dict], members: Dict[str, str], manifest: Dict[str, dict], builtFiles: Dict[str, str]):
+        """
+        rows:       {source: row, ...}  Mod files
+        members:    {source: path in pack, ...}
+        builtFiles: {fileName: path in pack, ...} of previous build
+
+        Unchanged pack.zip is kept, new files are appended if nothing was changed or removed,
+        else pack.zip is rewritten with unchanged members copied from previous one.
+        Files are hashed while written, their rows get the hash
+        """
+        packPath = os.path.join(self.modPath, FILES_PACK)
+
+        reusable = set()
+        if self._isOutputUpToDate(packPath, manifest):
+            for source, row in rows.items():
+                old = manifest.get(source, None)
+                fileName = row[MOD_TABLE_MANIFEST_TARGET]
+
+                if (
+                    old is not None and
+                    old[MOD_TABLE_MANIFEST_TARGET] == fileName and
+                    old[MOD_TABLE_MANIFEST_HASH] == row[MOD_TABLE_MANIFEST_HASH] and
+                    builtFiles.get(fileName, None) == members[source]
+                ):
+                    reusable.add(members[source])
+
+        oldMembers = set()
+        if reusable:
+            with zipfile.ZipFile(packPath, "r") as oldZip:
+                oldMembers = set(oldZip.namelist())
+            reusable &= oldMembers
+
+        if reusable and oldMembers == reusable and len(reusable) == len(rows):
+            #Nothing changed
+            for source in rows:
+                yield FileFlag, os.path.join(self.modPath, source)
+
+        elif reusable and oldMembers <= reusable:
+            #Nothing changed or removed: append new members
+            with zipfile.ZipFile(packPath, "a") as filesZip:
+                yield from self._writeFilesPack(filesZip, rows, members, reusable)
+
+        else:
+            tmpPath = packPath + ".tmp"
+            with zipfile.ZipFile(tmpPath, "w") as filesZip:
+                if reusable:
+                    with zipfile.ZipFile(packPath, "r") as oldZip:
+                        for source in rows:
+                            if members[source] in reusable:
+                                CopyMember(oldZip, filesZip, members[source])
 
-                #New element id by file name
-                newElId = int(elementPath.rsplit("\\", 1)[1].replace(RESOURCE_ELEMENT_FORMAT, ""))
-                for element in elementSwf.elementsList:
-                    strElType = ElementObjectToStr(element)
-                    elId = elementSwf.getElementId(element)
+                yield from self._writeFilesPack(filesZip, rows, members, reusable)
 
-                    if elId != newElId:
-                        elementSwf.setElementId(element, newElId)
+            os.replace(tmpPath, packPath)
 
-                    mdcr.addElement(element)
+    def _writeFilesPack(self, filesZip: zipfile.ZipFile, rows: Dict[str, dict], members: Dict[str, str], reusable: Set[str]):
+        for source in rows:
+            if members[source] in reusable:
+                yield FileFlag, os.path.join(self.modPath, source)
 
-                    if strElType not in modifierElements:
-                        modifierElements[strElType] = []
-                    modifierElements[strElType].append(newElId)
+        toWrite = [(source, members[source]) for source in rows if members[source] not in reusable]
+        for source, fileHash in WriteMembers(filesZip, [(os.path.join(self.modPath, source), arcName) for source, arcName in toWrite], self.packWorkers):
+            rows[os.path.relpath(source, self.modPath)][MOD_TABLE_MANIFEST_HASH] = fileHash
 
-                elementSwf.save()
-                elementSwf.close()
+            yield FileFlag, source
 
-            #Write scripts to .bmlmodifier
-            for scriptFile in scriptFiles:
-                with open(scriptFile, "r") as script:
-                    strElType = ElementObjectToStr(ActionScriptTag)
-                    scriptName = scriptFile.rsplit("\\", 1)[1].replace(".as", "")
+    def _build(self, force=False):
+        """
+        force: rebuild all, else only modifiers and files changed since previous build
+        """
+        manifest = self._readManifest() if not force else {}
+        newManifest = {}
 
-                    mdcr.addAS(scriptName, script.read())
+        with Sql(os.path.join(self.modPath, MOD_DATABASE_FILE)) as index:
+            builtElements = {
+                modifier[MOD_TABLE_MODIFIER_NAME]: json.loads(modifier[MOD_TABLE_MODIFIER_ELEMENTS])
+                for modifier in index.read_iter(MOD_TABLE_MODIFIER)
+            }
+            builtFiles = {file[MOD_TABLE_FILES_NAME]: file[MOD_TABLE_FILES_PATH] for file in index.read_iter(MOD_TABLE_FILES)}
+
+        indexModifiersElements = {}
+
+        for swfName, modifierResourcesPath in self.modifierResources.items():
+            elementFiles, scriptFiles = self._findModifierSources(modifierResourcesPath)
+            sources = {path: swfName for path in [*elementFiles, *scriptFiles]}
+            outputPath = os.path.join(self.modPath, f"{swfName}.{MODIFIER_FORMAT}")
+
+            rows = self._manifestRows(sources, manifest)
+
+            if swfName in builtElements and self._isUpToDate(rows, swfName, manifest) and self._isOutputUpToDate(outputPath, manifest):
+                indexModifiersElements[swfName] = builtElements[swfName]
+
+            else:
+                indexModifiersElements[swfName] = self._buildModifier(swfName, elementFiles, scriptFiles)
 
-                    if strElType not in modifierElements:
-                        modifierElements[strElType] = []
-                    modifierElements[strElType].append(scriptName)
+                #Element files with fixed ids were saved
+                rows = self._manifestRows(sources, manifest)
 
-            mdcr.save()
+            newManifest.update(rows)
+            newManifest.update(self._manifestRows({outputPath: ""}, manifest))
 
-            yield ModifierFlag, mdcr.swfName
+            yield ModifierFlag, swfName
 
         indexFiles = {}
         indexFilesHashes = {}
         if self.files:
-            #Create files.zip
-            with zipfile.ZipFile(os.path.join(self.modPath, FILES_PACK), "w") as filesZip:
-                for filePath, fileName in self.files.items():
-                    #Add mod files to files.zip
-                    with open(os.path.join(self.modPath, filePath), "rb") as file:
-                        path = BRAWLHALLA_FILES[fileName].replace(BRAWLHALLA_PATH+"\\", "")
-                        indexFiles[fileName] = path
-                        fileData = file.read()
-                        filesZip.writestr(path, fileData)
-                        indexFilesHashes[fileName] = hashlib.sha256(fileData).hexdigest()[:16]
-
-                    yield FileFlag, os.path.join(self.modPath, filePath)
+            sources = {os.path.join(self.modPath, filePath): fileName for filePath, fileName in self.files.items()}
+            #Changed files are hashed while packed
+            rows = self._manifestRows(sources, manifest, False)
+            members = {}
+
+            for source, row in rows.items():
+                fileName = row[MOD_TABLE_MANIFEST_TARGET]
+                members[source] = gameconstants.BRAWLHALLA_FILES[fileName].replace(gameconstants.BRAWLHALLA_PATH+"\\", "")
+                indexFiles[fileName] = members[source]
+
+            yield from self._buildFilesPack(rows, members, manifest, builtFiles)
+
+            for row in rows.values():
+                indexFilesHashes[row[MOD_TABLE_MANIFEST_TARGET]] = row[MOD_TABLE_MANIFEST_HASH]
+
+            packPath = os.path.join(self.modPath, FILES_PACK)
+            newManifest.update(rows)
+            newManifest.update(self._manifestRows({packPath: ""}, manifest))
+
+        HashCache.save()
 
         #Write mod elements to index.db
         with Sql(os.path.join(self.modPath, MOD_DATABASE_FILE)) as index:
-            for name, elements in indexModifiersElements.items():
-                if index.search(MOD_TABLE_MODIFIER, {MOD_TABLE_MODIFIER_NAME: name}):
-                    index.update(MOD_TABLE_MODIFIER, {MOD_TABLE_MODIFIER_NAME: name}, {MOD_TABLE_MODIFIER_ELEMENTS: json.dumps(elements)}, False)
-                else:
-                    index.add(MOD_TABLE_MODIFIER, {MOD_TABLE_MODIFIER_NAME: name, MOD_TABLE_MODIFIER_ELEMENTS: json.dumps(elements)}, False)
+            index.upsert_many(MOD_TABLE_MODIFIER, [MOD_TABLE_MODIFIER_NAME], [
+                {MOD_TABLE_MODIFIER_NAME: name, MOD_TABLE_MODIFIER_ELEMENTS: json.dumps(elements)}
+                for name, elements in indexModifiersElements.items()
+            ], False)
 
-            for modifier in index.read(MOD_TABLE_MODIFIER):
-                if modifier[MOD_TABLE_MODIFIER_NAME] not in indexModifiersElements:
-                    index.delete(MOD_TABLE_MODIFIER, modifier, False)
+            index.delete_many(MOD_TABLE_MODIFIER, [
+                modifier
+                for modifier in index.read_iter(MOD_TABLE_MODIFIER)
+                if modifier[MOD_TABLE_MODIFIER_NAME] not in indexModifiersElements
+            ], False)
 
             #Add new files
-            for fileName, path in indexFiles.items():
-                if index.search(MOD_TABLE_FILES, {MOD_TABLE_FILES_NAME: fileName}):
-                    index.update(MOD_TABLE_FILES, {MOD_TABLE_FILES_NAME: fileName}, {MOD_TABLE_FILES_PATH: path, MOD_TABLE_FILES_HASH: indexFilesHashes[fileName], MOD_TABLE_FILES_HASH: indexFilesHashes[fileName]}, False)
-                else:
-                    index.add(MOD_TABLE_FILES, {MOD_TABLE_FILES_NAME: fileName, MOD_TABLE_FILES_PATH: path, MOD_TABLE_FILES_HASH: indexFilesHashes[fileName]}, False)
+            index.upsert_many(MOD_TABLE_FILES, [MOD_TABLE_FILES_NAME], [
+                {MOD_TABLE_FILES_NAME: fileName, MOD_TABLE_FILES_PATH: path, MOD_TABLE_FILES_HASH: indexFilesHashes[fileName]}
+                for fileName, path in indexFiles.items()
+            ], False)
 
             #Remove not-exist files
-            for file in index.read(MOD_TABLE_FILES):
-                if file[MOD_TABLE_FILES_NAME] not in indexFiles:
-                    index.delete(MOD_TABLE_FILES, file, False)
+            index.delete_many(MOD_TABLE_FILES, [
+                file
+                for file in index.read_iter(MOD_TABLE_FILES)
+                if file[MOD_TABLE_FILES_NAME] not in indexFiles
+            ], False)
+
+            #Rewrite build manifest
+            if MOD_TABLE_MANIFEST not in index.tables():
+                index.create(MOD_TABLE_MANIFEST, MOD_TABLE_MANIFEST_STRUCTURE)
+            else:
+                index.delete_all(MOD_TABLE_MANIFEST)
+            index.add_many(MOD_TABLE_MANIFEST, list(newManifest.values()), False)
 
             index.save()
 
-    def build(self, generator=False):
+    def build(self, generator=False, force=False):
         if generator:
-            return self._build()
+            return self._build(force)
         else:
-            return [n for n in self._build()]
+            return [n for n in self._build(force)]
+
+
+
+class ModsIndex:
+    """
+    Mods using game elements and files. Claims are counted, so a mod keeps its entry until every
+    modifier or files pack of it that was added is removed
+    """
+    elementsMap: Dict[tuple, Dict[str, int]]    #{(swfName, elId): {modHash: claims, ...}, ...}
+    filesMap: Dict[str, Dict[str, int]]         #{fileName: {modHash: claims, ...}, ...}
+
+    def __init__(self, mods: List[Mod]=None):
+        self.elementsMap = {}
+        self.filesMap = {}
+
+        for mod in mods or []:
+            self.addMod(mod)
+
+    @staticmethod
+    def _claim(indexMap: dict, key, modHash: str):
+        if key not in indexMap:
+            indexMap[key] = {}
+        indexMap[key][modHash] = indexMap[key].get(modHash, 0) + 1
+
+    @staticmethod
+    def _release(indexMap: dict, key, modHash: str):
+        modHashes = indexMap.get(key)
+        if modHashes is None or modHash not in modHashes: return
+
+        modHashes[modHash] -= 1
+        if not modHashes[modHash]:
+            del modHashes[modHash]
+            if not modHashes:
+                del indexMap[key]
+
+    def addModifier(self, modifier: ModifierTemplate):
+        for elIds in (modifier.elements or {}).values():
+            for elId in elIds:
+                self._claim(self.elementsMap, (modifier.swfName, elId), modifier.modHash)
+
+    def removeModifier(self, modifier: ModifierTemplate):
+        for elIds in (modifier.elements or {}).values():
+            for elId in elIds:
+                self._release(self.elementsMap, (modifier.swfName, elId), modifier.modHash)
+
+    def addFilesPack(self, filesPack: FilesPack):
+        for file in filesPack:
+            self._claim(self.filesMap, file.fileName, filesPack.modHash)
+
+    def removeFilesPack(self, filesPack: FilesPack):
+        for file in filesPack:
+            self._release(self.filesMap, file.fileName, filesPack.modHash)
+
+    def addMod(self, mod: Mod):
+        for modifier in mod.modifierList:
+            self.addModifier(modifier)
+        self.addFilesPack(mod.filesPack)
+
+    def removeMod(self, mod: Mod):
+        for modifier in mod.modifierList:
+            self.removeModifier(modifier)
+        self.removeFilesPack(mod.filesPack)
+
+    def findModifierMatches(self, modifier: ModifierTemplate) -> List[str]:
+        """
+        Hashes of other mods that use any element of modifier
+        """
+        matches = []
+
+        for elIds in (modifier.elements or {}).values():
+            for elId in elIds:
+                for modHash in self.elementsMap.get((modifier.swfName, elId), ()):
+                    if modHash != modifier.modHash and modHash not in matches:
+                        matches.append(modHash)
+
+        return matches
+
+    def findFilesMatches(self, filesPack: FilesPack) -> List[str]:
+        """
+        Hashes of other mods that replace any file of filesPack
+        """
+        matches = []
+
+        for file in filesPack:
+            for modHash in self.filesMap.get(file.fileName, ()):
+                if modHash != filesPack.modHash and modHash not in matches:
+                    matches.append(modHash)
+
+        return matches
 
 
 
 class _ModsFinder:
+    """
+    Mods are found on first access to found data or on call
+    """
     mods: List[Mod]
     modsMap: Dict[str, Mod]
+    foldersMap: Dict[str, Mod]      #{modFolder: mod, ...}
+    foldersStamps: Dict[str, list]  #{modFolder: [mtime, size], ...}
+    installedIndex: ModsIndex
+    errors: List[str]
+
+    FOUND_ATTRS = ["mods", "modsMap", "foldersMap", "foldersStamps", "installedIndex", "errors"]
 
     def __init__(self):
-        self.mods = []
-        self.modsMap = {}
-        self.errors = []
-        self.__call__()
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name):
+        if name not in self.FOUND_ATTRS:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        with self._lock:
+            if name not in self.__dict__:
+                self.__call__()
+
+        return self.__dict__[name]
 
     def __iter__(self) -> Mod:
         for mod in self.mods:
             yield mod
 
-    def __call__(self):
-        for folder in os.listdir(MODS_PATH):
-            try:
-                mod = Mod(folder)
-                self.mods.append(mod)
-                self.modsMap[mod.modHash] = mod
+    def _readCache(self) -> dict:
+        try:
+            with open(MODS_CACHE_FILE, "r") as cacheFile:
+                cache = json.load(cacheFile)
+        except (OSError, ValueError):
+            return {}
 
-                if mod.modHash not in ModsConfig.JsonMods:
-                    ModsConfig.JsonMods = {**ModsConfig.JsonMods, mod.modHash:mod.exportToJson()}
+        if cache.get("version") != MODS_CACHE_VERSION:
+            return {}
 
-            except ModNotBuilded:
-                pass
-            except:
-                self.errors.append(f"Mod loading error '{folder}'")
+        return cache.get("mods", {})
 
+    def _writeCache(self, cache: dict):
+        try:
+            with AtomicWrite(MODS_CACHE_FILE) as cacheFile:
+                json.dump({"version": MODS_CACHE_VERSION, "mods": cache}, cacheFile)
+        except OSError:
+            pass
+
+    def __call__(self):
+        with self._lock:
+            self._find()
+
+    def _find(self):
+        modsFolder = GetModsPath()
+        modsPath = os.path.abspath(modsFolder)
+        cache = self._readCache()
+        cacheChanged = False
+
+        mods = []
+        modsMap = {}
+        foldersMap = {}
+        foldersStamps = {}
+        errors = []
+
+        with ModsConfig.batch():
+            for folder in os.listdir(modsFolder):
+                modPath = os.path.join(modsFolder, folder)
+                if not os.path.isfile(os.path.join(modPath, MOD_DATABASE_FILE)): continue
+
+                try:
+                    stamp = _IndexStamp(modPath)
+                    mod = self.__dict__.get("foldersMap", {}).get(folder, None)
+
+                    #Folder changed since previous scan
+                    if mod is None or self.__dict__.get("foldersStamps", {}).get(folder) != stamp:
+                        cacheKey = os.path.join(modsPath, folder)
+                        cached = cache.get(cacheKey, None)
+
+                        if cached is None or cached["stamp"] != stamp:
+                            modIndex = ReadModIndex(modPath)
+                            mod = Mod(folder, modIndex=modIndex)
+
+                            #New or rebuilt mod: modifiers are checked once, before index is cached
+                            for modifier in mod.modifierList:
+                                if not modifier.isValid():
+                                    raise ModifierDoesNotExist(f"Modifier '{modifier.modifierPath}' is not valid")
+
+                            cache[cacheKey] = {"stamp": stamp, "index": modIndex}
+                            cacheChanged = True
+
+                        else:
+                            mod = Mod(folder, modIndex=cached["index"])
+
+                    mods.append(mod)
+                    modsMap[mod.modHash] = mod
+                    foldersMap[folder] = mod
+                    foldersStamps[folder] = stamp
+
+                    if mod.modHash not in ModsConfig.JsonMods:
+                        ModsConfig.JsonMods = {**ModsConfig.JsonMods, mod.modHash:mod.exportToJson()}
+
+                except ModNotBuilded:
+                    pass
+                except:
+                    errors.append(f"Mod loading error '{folder}'")
+
+        #Forget removed mod folders
+        for cacheKey in list(cache):
+            if os.path.dirname(cacheKey) == modsPath and os.path.basename(cacheKey) not in foldersMap:
+                cache.pop(cacheKey)
+                cacheChanged = True
+
+        if cacheChanged:
+            self._writeCache(cache)
 
         for modHash, modJson in ModsConfig.JsonMods.items():
-            if modHash in self.modsMap: continue
+            if modHash in modsMap: continue
 
-            mod = Mod(modJson=modJson)
-            self.mods.append(mod)
-            self.modsMap[mod.modHash] = mod
+            mod = self.__dict__.get("modsMap", {}).get(modHash, None)
+            if mod is None or not mod.GHOST_MOD:
+                mod = Mod(modJson=modJson)
 
-        for modHash in self.modsMap:
-            if modHash in ModsConfig.JsonMods: continue
-            mod = self.modsMap.pop(self.modsMap)
-            self.mods.remove(mod)
+            mods.append(mod)
+            modsMap[mod.modHash] = mod
+
+        self.mods = mods
+        self.modsMap = modsMap
+        self.foldersMap = foldersMap
+        self.foldersStamps = foldersStamps
+        self.errors = errors
+
+        self.installedIndex = ModsIndex([mod for mod in self.mods if mod.installed])
 
     def refind(self):
         self.__call__()
@@ -466,9 +951,7 @@ class _ModsFinder:
                 return mod
 
     def findByHash(self, modHash):
-        for mod in self.mods:
-            if mod.modHash == modHash:
-                return mod
+        return self.modsMap.get(modHash, None)
 
 
 
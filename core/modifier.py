@@ -28,6 +28,8 @@ from typing import Dict, List
 from .utils.imports import FILLSTYLE, DefineShapeTags
 from .utils.swf import Swf, SwfCreator
 from .utils.symbolclass import SymbolClass
+from .utils.swfscanner import SwfScanner
+from .utils.exceptions import TagsTruncated
 from .utils.elementTypes import ElementAnyToObject, ElementObjectToStr
 
 MODIFIER_FORMAT = "bmlmodifier"
@@ -86,6 +88,21 @@ class ModifierTemplate:
 
         return matches
 
+    def isValid(self) -> bool:
+        """
+        Modifier file exists and is marked in SymbolClass. Checked with SwfScanner, without FFDec
+        """
+        if self.modifierPath is None or not os.path.isfile(self.modifierPath):
+            return False
+
+        try:
+            scanner = SwfScanner(self.modifierPath).scan()
+        except (OSError, ValueError, TagsTruncated):
+            return False
+
+        symbolClass = SymbolClass.fromTagToNameMap(scanner.symbolClass)
+        return symbolClass.getTag(SYMBOL_CLASS_TAG_IS_MODIFIER) is True
+
 
 
 class Modifier(ModifierTemplate, Swf):
@@ -23,18 +23,28 @@
 #
 # *****************************************************************************
 
+import os
+
 from .utils.imports import *
+from .utils import gameconstants
+from .utils.exceptions import SwfProcessingFailed
+from .utils.workerpool import TaskDoneFlag, TaskFailedFlag, RunTasks
 from .utils.elementTypes import ElementAnyToObject
 from .utils.localConfig import ModsConfig
+from .utils.hashing import HashCache
 
-from .file import File
+from .file import File, PlaceFiles, CollectDumps
 from .modifier import ModifierTemplate, Modifier
-from .mod import Mod, ModsFinder
-from .gameswf import GameSwf, GAME_SWF_IMAGES_START, GAME_SWF_IMAGES_END
+from .mod import Mod, ModsIndex, ModsFinder
+from .gameswf import GameSwf
 
 from typing import Dict, List, Union, Tuple
 
 
+#Processes of parallel mode, each with own JVM
+PROCESS_WORKERS = min(4, os.cpu_count() or 1)
+
+
 class OpenGameSwfFlag:
     pass
 
@@ -63,6 +73,40 @@ class ErrorFlag:
     pass
 
 
+class _ModStub:
+    def __init__(self, modPath: str, modHash: str):
+        self.modPath = modPath
+        self.modHash = modHash
+
+
+def _ModifierTask(modifier: ModifierTemplate) -> tuple:
+    """
+    Picklable modifier: (modHash, modPath, swfName, elements)
+    """
+    return modifier.modHash, modifier.modPath, modifier.swfName, modifier.jsonElements
+
+
+def _ModifierFromTask(task: tuple) -> ModifierTemplate:
+    modHash, modPath, swfName, elements = task
+    if modPath is None:
+        return ModifierTemplate(swfName, elements, modHash)
+    return Modifier(_ModStub(modPath, modHash), swfName, elements)
+
+
+def _SwfWorker(swfName: str, toUninstall: List[tuple], toInstall: List[tuple]):
+    """
+    Process game swf in worker process, yields (flag, modHash)
+    """
+    yield OpenGameSwfFlag, None
+
+    for flag, *args in Processor()._processSwf(
+            swfName,
+            [_ModifierFromTask(task) for task in toUninstall],
+            [_ModifierFromTask(task) for task in toInstall]
+    ):
+        yield flag, args[0].modHash if args else None
+
+
 class Processor:
     modifiersToInstall: Dict[str, List[ModifierTemplate]]
     filePacksToInstall: list
@@ -70,14 +114,25 @@ class Processor:
     filesPacksToUninstall: list
 
     conflictMods: dict
+    queuedIndex: ModsIndex
+
+    parallel: bool
+    workers: int
+
+    def __init__(self, parallel=False, workers: int=None):
+        """
+        parallel: process game swfs in worker processes, each with own JVM
+        """
+        self.parallel = parallel
+        self.workers = workers or PROCESS_WORKERS
 
-    def __init__(self):
         self.modifiersToInstall = {}
         self.filePacksToInstall = []
         self.modifiersToUninstall = {}
         self.filesPacksToUninstall = []
 
         self.conflictMods = {}  # {InstalledMod: NewMod}
+        self.queuedIndex = ModsIndex()
 
     def addModsToInstall(self, *mods):
         mods: List[Mod]
@@ -89,38 +144,19 @@ class Processor:
                 if modifier.swfName not in self.modifiersToInstall:
                     self.modifiersToInstall[modifier.swfName] = []
 
-                for otherModifier in self.modifiersToInstall.get(modifier.swfName, []):
-                    if modifier.findElementMatches(otherModifier):
-                        otherMod = ModsFinder.findByHash(otherModifier.modHash)
-                        if otherMod not in self.conflictMods.get(mod, []):
-                            self.conflictMods[mod] = [*self.conflictMods.get(mod, []), otherMod]
-
-                for otherMod in ModsFinder:
-                    if not otherMod.installed: continue
-
-                    for otherModifier in otherMod.modifierList:
-                        if modifier.findElementMatches(otherModifier):
-                            if otherMod not in self.conflictMods.get(mod, []):
-                                self.conflictMods[mod] = [*self.conflictMods.get(mod, []), otherMod]
+                self._addConflicts(mod, self.queuedIndex.findModifierMatches(modifier))
+                self._addConflicts(mod, ModsFinder.installedIndex.findModifierMatches(modifier))
 
                 self.modifiersToInstall[modifier.swfName].append(modifier)
+                self.queuedIndex.addModifier(modifier)
                 if modifier in self.modifiersToUninstall.get(modifier.swfName, {}):
                     self.modifiersToUninstall[modifier.swfName].remove(modifier)
 
-            for otherFilesPack in self.filePacksToInstall:
-                if mod.filesPack.findFilesMatches(otherFilesPack):
-                    otherMod = ModsFinder.findByHash(otherFilesPack.modHash)
-                    if otherMod not in self.conflictMods.get(mod, []):
-                        self.conflictMods[mod] = [*self.conflictMods.get(mod, []), otherMod]
-
-            for otherMod in ModsFinder:
-                if not otherMod.installed: continue
-
-                if mod.filesPack.findFilesMatches(otherMod.filesPack):
-                    if otherMod not in self.conflictMods.get(mod, []):
-                        self.conflictMods[mod] = [*self.conflictMods.get(mod, []), otherMod]
+            self._addConflicts(mod, self.queuedIndex.findFilesMatches(mod.filesPack))
+            self._addConflicts(mod, ModsFinder.installedIndex.findFilesMatches(mod.filesPack))
 
             self.filePacksToInstall.append(mod.filesPack)
+            self.queuedIndex.addFilesPack(mod.filesPack)
 
     def addModsToUninstall(self, *mods):
         mods: List[Mod]
@@ -133,9 +169,27 @@ class Processor:
                 self.modifiersToUninstall[modifier.swfName].append(modifier)
                 if modifier in self.modifiersToInstall.get(modifier.swfName, {}):
                     self.modifiersToInstall[modifier.swfName].remove(modifier)
+                    self.queuedIndex.removeModifier(modifier)
 
             self.filesPacksToUninstall.append(mod.filesPack)
 
+    @staticmethod
+    def _uniqueModifiers(modifiers: Dict[str, List[ModifierTemplate]]) -> List[ModifierTemplate]:
+        """
+        One modifier of each mod and swf, mods may be queued several times
+        """
+        return list({
+            (modifier.modHash, modifier.swfName): modifier
+            for swfModifiers in modifiers.values()
+            for modifier in swfModifiers
+        }.values())
+
+    def _addConflicts(self, mod: Mod, modHashes: List[str]):
+        for modHash in modHashes:
+            otherMod = ModsFinder.findByHash(modHash)
+            if otherMod not in self.conflictMods.get(mod, []):
+                self.conflictMods[mod] = [*self.conflictMods.get(mod, []), otherMod]
+
     def installModifier(self, gameSwf: GameSwf, modifier: Modifier):
         if gameSwf.swf is None: gameSwf.load()
         if modifier.swf is None: modifier.load()
@@ -161,10 +215,7 @@ class Processor:
                     imageId = modifier.repeatingBeatmaps[elId]
                     image = modifier.getElementById(imageId, elTypes=DefineBitsLosslessTags)
 
-                    for n in range(GAME_SWF_IMAGES_START, GAME_SWF_IMAGES_END):
-                        if n not in gameSwf.imagesMap:
-                            newImageId = n
-                            break
+                    newImageId = gameSwf.imagesAllocator.allocate()
 
                     cloneImage = image.cloneTag()
                     modifier.setElementId(cloneImage, newImageId)
@@ -204,10 +255,147 @@ class Processor:
 
         gameSwf.installedMods.remove(modifier.modHash)
 
+    @staticmethod
+    def getElementTypes(modifiers: List[ModifierTemplate]) -> set:
+        """
+        Game swf element types touched by installing or uninstalling modifiers
+        """
+        elTypes = set()
+
+        for modifier in modifiers:
+            for elType in modifier.elements or {}:
+                elTypes.add(elType)
+
+                if elType == DefineEditTextTag:
+                    elTypes.add(CSMTextSettingsTag)
+                elif elType in DefineFontTags:
+                    elTypes.update([DefineFontNameTag, DefineFontAlignZonesTag])
+
+        elTypes.discard(None)
+        elTypes.discard(ActionScriptTag)
+
+        return elTypes
+
+    def planSwfs(self) -> Dict[str, Tuple[List[ModifierTemplate], List[ModifierTemplate]]]:
+        """
+        {swfName: (modifiersToUninstall, modifiersToInstall), ...}
+
+        All work on game swf is grouped, so it is loaded and saved once.
+        Swfs with modifiers to install go first, then uninstall-only ones
+        """
+        plan = {}
+
+        for swfName, modifiers in self.modifiersToInstall.items():
+            if modifiers:
+                plan[swfName] = (list(self.modifiersToUninstall.get(swfName, [])), list(modifiers))
+
+        for swfName, modifiers in self.modifiersToUninstall.items():
+            if swfName not in plan:
+                plan[swfName] = (list(modifiers), [])
+
+        return plan
+
+    def _processSwf(self, swfName: str, toUninstall: List[ModifierTemplate], toInstall: List[ModifierTemplate]):
+        #Nothing to uninstall, skip loading swf in FFDec
+        if not toInstall:
+            metadata = GameSwf.readMetadata(swfName)
+            if metadata is not None and not any(modifier.modHash in metadata.installedMods for modifier in toUninstall):
+                return
+
+        gameSwf = GameSwf(swfName)
+        gameSwf.load(elTypes=self.getElementTypes([*toUninstall, *toInstall]))
+
+        # Uninstaller (reinstalled modifiers too)
+        uninstalled = []
+        for modifier in [*toUninstall, *toInstall]:
+            if modifier.modHash in gameSwf.installedMods and modifier not in uninstalled:
+                uninstalled.append(modifier)
+
+        for modifier in uninstalled:
+            yield UninstalledModifierFlag, modifier
+
+            self.uninstallModifier(gameSwf, modifier)
+
+            yield DoneFlag,
+
+        # Installer
+        for modifier in [
+            modifier
+            for modifier in toInstall
+            if modifier.modHash not in gameSwf.installedMods
+        ]:
+            yield InstalledModifierFlag, modifier
+
+            self.installModifier(gameSwf, modifier)
+
+            yield DoneFlag,
+
+        gameSwf.save()
+        gameSwf.close()
+
+    def _processSwfsParallel(self, plan: Dict[str, Tuple[List[ModifierTemplate], List[ModifierTemplate]]]):
+        """
+        Largest swfs are scheduled first. Flags of each swf are yielded together,
+        flags of other swfs are buffered meanwhile
+        """
+        modifiers = {
+            (modifier.modHash, swfName): modifier
+            for swfName, (toUninstall, toInstall) in plan.items()
+            for modifier in [*toUninstall, *toInstall]
+        }
+
+        order = sorted(plan, key=lambda swfName: os.path.getsize(gameconstants.BRAWLHALLA_SWFS[swfName + ".swf"]), reverse=True)
+
+        buffers = {}    #{swfName: [(flag, modHash), ...], ...}
+        finished = set()
+        errors = {}
+        current = None
+
+        for swfName, message in RunTasks(_SwfWorker, [
+            (swfName, (
+                swfName,
+                [_ModifierTask(modifier) for modifier in plan[swfName][0]],
+                [_ModifierTask(modifier) for modifier in plan[swfName][1]]
+            ))
+            for swfName in order
+        ], self.workers):
+            if swfName not in buffers:
+                buffers[swfName] = []
+
+            if message[0] is TaskDoneFlag:
+                finished.add(swfName)
+            elif message[0] is TaskFailedFlag:
+                errors[swfName] = message[1]
+                finished.add(swfName)
+            else:
+                buffers[swfName].append(message)
+
+            while True:
+                if current is None:
+                    current = next(iter(buffers), None)
+                    if current is None:
+                        break
+
+                for flag, arg in buffers.pop(current, []):
+                    if flag is OpenGameSwfFlag:
+                        yield flag, current
+                    elif arg is not None:
+                        yield flag, modifiers[(arg, current)]
+                    else:
+                        yield flag,
+
+                if current in finished:
+                    current = None
+                else:
+                    buffers[current] = []
+                    break
+
+        if errors:
+            raise SwfProcessingFailed("; ".join(f"{swfName}: {error}" for swfName, error in errors.items()))
+
     def getStepNum(self):
         n = 0
-        n += len([modifier for modifier in self.modifiersToInstall.values()])
-        n += len([modifier for modifier in self.modifiersToUninstall.values()])
+        n += len(self.planSwfs())
         n += len([file for filePack in self.filePacksToInstall for file in filePack])
         n += len([file for filePack in self.filesPacksToUninstall for file in filePack])
         return n
@@ -215,99 +403,73 @@ class Processor:
     def _process(self) -> Tuple[
         Union[InstalledModifierFlag, InstalledFileFlag, UninstalledModifierFlag, UninstalledFileFlag], Union[
             ModifierTemplate, File]]:
-        for swfName in self.modifiersToInstall:
-            yield OpenGameSwfFlag, swfName
-
-            gameSwf = GameSwf(swfName)
-            gameSwf.load()
-
-            # Uninstaller
-            for modifier in set([
-                *[
-                    modifier
-                    for modifier in self.modifiersToUninstall.get(swfName, [])
-                    if modifier.modHash in gameSwf.installedMods
-                ],
-                *[
-                    modifier
-                    for modifier in self.modifiersToInstall[swfName]
-                    if modifier.modHash in gameSwf.installedMods
-                ]
-            ]):
-                yield UninstalledModifierFlag, modifier
-
-                self.uninstallModifier(gameSwf, modifier)
+        #Coalesce ModsConfig writes of the whole run into one
+        with ModsConfig.batch():
+            plan = self.planSwfs()
 
-                yield DoneFlag,
-
-            # Installer
-            for modifier in [
-                modifier
-                for modifier in self.modifiersToInstall[swfName]
-                if modifier.modHash not in gameSwf.installedMods
-            ]:
-                yield InstalledModifierFlag, modifier
-
-                self.installModifier(gameSwf, modifier)
-
-                yield DoneFlag,
+            if self.parallel and len(plan) > 1:
+                yield from self._processSwfsParallel(plan)
 
-            gameSwf.save()
-            gameSwf.close()
+            else:
+                for swfName, (toUninstall, toInstall) in plan.items():
+                    yield OpenGameSwfFlag, swfName
 
-        for swfName in self.modifiersToUninstall:
-            yield OpenGameSwfFlag, swfName
-
-            gameSwf = GameSwf(swfName)
-            gameSwf.load()
-
-            # Uninstaller
-            for modifier in [
-                modifier
-                for modifier in self.modifiersToUninstall[swfName]
-                if modifier.modHash in gameSwf.installedMods
-            ]:
-                yield UninstalledModifierFlag, modifier
-
-                self.uninstallModifier(gameSwf, modifier)
-
-                yield DoneFlag,
+                    yield from self._processSwf(swfName, toUninstall, toInstall)
 
-            gameSwf.save()
-            gameSwf.close()
-
-        for filePack in self.filePacksToInstall:
-            for file in filePack:
+            for file in PlaceFiles([file for filePack in self.filePacksToInstall for file in filePack]):
                 yield InstalledFileFlag, file
-
-                file.place()
-
                 yield DoneFlag,
 
-        for filePack in self.filesPacksToUninstall:
-            for file in filePack:
-                yield UninstalledFileFlag, file
-
-                try:
-                    file.repair()
-                    yield DoneFlag,
-                except:
-                    yield ErrorFlag,
-
-        uninstalledModsHashes = {
-            *[modifier.modHash for modifiers in self.modifiersToUninstall.values() for modifier in modifiers],
-            *[filePack.modHash for filePack in self.filesPacksToUninstall]
-            }
-        installedModsHashes = {
-            *[modifier.modHash for modifiers in self.modifiersToInstall.values() for modifier in modifiers],
-            *[filePack.modHash for filePack in self.filePacksToInstall]}
-        ModsConfig.InstalledMods = list((set(ModsConfig.InstalledMods) - uninstalledModsHashes) | installedModsHashes)
-
-        self.modifiersToInstall = {}
-        self.filePacksToInstall = []
-        self.modifiersToUninstall = {}
-        self.filesPacksToUninstall = []
-        self.conflictMods = {}  # {InstalledMod: NewMod}
+            for filePack in self.filePacksToInstall:
+                filePack.close()
+
+            for filePack in self.filesPacksToUninstall:
+                for file in filePack:
+                    yield UninstalledFileFlag, file
+
+                    try:
+                        file.repair()
+                        yield DoneFlag,
+                    except:
+                        yield ErrorFlag,
+
+            uninstalledModsHashes = {
+                *[modifier.modHash for modifiers in self.modifiersToUninstall.values() for modifier in modifiers],
+                *[filePack.modHash for filePack in self.filesPacksToUninstall]
+                }
+            installedModsHashes = {
+                *[modifier.modHash for modifiers in self.modifiersToInstall.values() for modifier in modifiers],
+                *[filePack.modHash for filePack in self.filePacksToInstall]}
+            wasInstalled = set(ModsConfig.InstalledMods)
+            ModsConfig.InstalledMods = list((wasInstalled - uninstalledModsHashes) | installedModsHashes)
+
+            #Keep installed mods index in step with ModsConfig.InstalledMods, each installed mod is added once
+            stillInstalled = wasInstalled - uninstalledModsHashes
+            for modifier in self._uniqueModifiers(self.modifiersToUninstall):
+                if modifier.modHash in wasInstalled:
+                    ModsFinder.installedIndex.removeModifier(modifier)
+            for filePack in {filePack.modHash: filePack for filePack in self.filesPacksToUninstall}.values():
+                if filePack.modHash in wasInstalled:
+                    ModsFinder.installedIndex.removeFilesPack(filePack)
+            for modifier in self._uniqueModifiers(self.modifiersToInstall):
+                if modifier.modHash not in stillInstalled:
+                    ModsFinder.installedIndex.addModifier(modifier)
+            for filePack in {filePack.modHash: filePack for filePack in self.filePacksToInstall}.values():
+                if filePack.modHash not in stillInstalled:
+                    ModsFinder.installedIndex.addFilesPack(filePack)
+
+            #Originals of files no installed mod replaces anymore
+            if self.filesPacksToUninstall:
+                CollectDumps(ModsFinder.installedIndex.filesMap)
+
+            self.modifiersToInstall = {}
+            self.filePacksToInstall = []
+            self.modifiersToUninstall = {}
+            self.filesPacksToUninstall = []
+            self.conflictMods = {}  # {InstalledMod: NewMod}
+            self.queuedIndex = ModsIndex()
+
+        HashCache.save()
 
     def process(self, generator=False):
         if generator:
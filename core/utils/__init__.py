@@ -30,5 +30,12 @@ from .elementTypes import *
 from .exceptions import *
 from .symbolclass import SymbolClass
 from .swf import Swf
-from .gameconstants import *
+from . import gameconstants
+from .lazy import LazyAttributes
+
+#Game constants are searched on first access
+LazyAttributes(__name__, {
+    name: (lambda name=name: getattr(gameconstants, name))
+    for name in ["BRAWLHALLA_PATH", "BRAWLHALLA_SWFS", "BRAWLHALLA_FILES", "BRAWLHALLA_COLLISIONS", "BRAWLHALLA_VERSION"]
+}, cache=False)
 
@@ -0,0 +1,338 @@
+# *****************************************************************************
+#
+#                           Brawlhalla Modloader Core
+#   Copyright (C) 2020 Farbigoz
+#   
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#   Contacts:
+#       GitHub: https://github.com/Farbigoz
+#       Gmail: ferattori@gmail.com
+#       VK: https://vk.com/fabriziog    (Preferably)
+#
+# *****************************************************************************
+
+__all__ = ["AbcReader", "DoAbcData", "IterInstructions", "FindPushedString"]
+
+OP_PUSHSTRING   = 0x2c
+OP_LOOKUPSWITCH = 0x1b
+OP_DEBUG        = 0xef
+
+#Operands of AVM2 instructions. Opcodes missing here are invalid
+_U30, _S24, _U8 = "u30", "s24", "u8"
+_OPERANDS = {
+    **dict.fromkeys([
+        0x01, 0x02, 0x03, 0x07, 0x09, 0x1c, 0x1d, 0x1e, 0x1f, 0x20, 0x21, 0x23, 0x26, 0x27, 0x28, 0x29, 0x2a, 0x2b,
+        0x30, *range(0x35, 0x3f), 0x47, 0x48, 0x50, 0x51, 0x52, 0x57, 0x64, *range(0x70, 0x79), *range(0x81, 0x86),
+        0x87, 0x88, 0x89, 0x90, 0x91, 0x93, *range(0x95, 0x98), *range(0xa0, 0xb2), 0xb3, 0xb4, 0xc0, 0xc1,
+        *range(0xc4, 0xc8), *range(0xd0, 0xd8), 0xf3,
+    ], ()),
+    **dict.fromkeys([
+        0x04, 0x05, 0x06, 0x08, 0x22, 0x25, 0x2c, 0x2d, 0x2e, 0x2f, 0x31, 0x40, 0x41, 0x42, 0x49, 0x53, 0x55, 0x56,
+        0x58, 0x59, 0x5a, 0x5d, 0x5e, 0x5f, 0x60, 0x61, 0x62, 0x63, 0x66, 0x67, 0x68, 0x6a, 0x6c, 0x6d, 0x6e, 0x6f,
+        0x80, 0x86, 0x92, 0x94, 0xb2, 0xc2, 0xc3, 0xf0, 0xf1, 0xf2,
+    ], (_U30,)),
+    **dict.fromkeys([0x32, 0x43, 0x44, 0x45, 0x46, 0x4a, 0x4c, 0x4e, 0x4f], (_U30, _U30)),
+    **dict.fromkeys([*range(0x0c, 0x1b)], (_S24,)),
+    **dict.fromkeys([0x24, 0x65], (_U8,)),
+    OP_DEBUG: (_U8, _U30, _U8, _U30),
+}
+
+#Multiname kinds
+_MULTINAME_QNAME        = [0x07, 0x0d]  #ns, name
+_MULTINAME_RTQNAME      = [0x0f, 0x10]  #name
+_MULTINAME_RTQNAMEL     = [0x11, 0x12]  #-
+_MULTINAME_MULTINAME    = [0x09, 0x0e]  #name, ns set
+_MULTINAME_MULTINAMEL   = [0x1b, 0x1c]  #ns set
+_MULTINAME_TYPENAME     = [0x1d]        #qname, params
+
+_METHOD_HAS_OPTIONAL    = 0x08
+_METHOD_HAS_PARAM_NAMES = 0x80
+_INSTANCE_PROTECTED_NS  = 0x08
+_TRAIT_ATTR_METADATA    = 0x04
+
+_TRAIT_SLOT     = [0, 6]
+_TRAIT_METHOD   = [1, 2, 3]
+_TRAIT_CLASS    = [4]
+_TRAIT_FUNCTION = [5]
+
+
+def DoAbcData(tagCode: int, data: bytes) -> bytes:
+    """
+    ABC bytes of DoABC (72) or DoABC2 (82) tag data
+    """
+    if tagCode == 82:
+        #flags UI32, name STRING
+        return data[data.index(b"\x00", 4) + 1:]
+    return data
+
+
+def EncodeU30(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+class AbcReader:
+    """
+    Sequential reader of abcFile, parses only what is needed to reach the requested part
+    """
+    data: bytes
+    pos: int
+    strings: list       #[str, ...]   Index 0 is ""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 4    #minor, major version
+        self.strings = None
+
+    def u8(self) -> int:
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+    def u30(self) -> int:
+        value = 0
+        for shift in range(0, 35, 7):
+            byte = self.data[self.pos]
+            self.pos += 1
+            value |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                break
+        return value
+
+    def skipU30(self, count: int=1):
+        data = self.data
+        pos = self.pos
+        for _ in range(count):
+            while data[pos] & 0x80:
+                pos += 1
+            pos += 1
+        self.pos = pos
+
+    def readStrings(self) -> list:
+        """
+        Skip int, uint and double pools, read string pool
+        """
+        if self.strings is not None:
+            return self.strings
+
+        self.skipU30(max(self.u30() - 1, 0))    #int
+        self.skipU30(max(self.u30() - 1, 0))    #uint
+        doubleCount = max(self.u30() - 1, 0)
+        self.pos += doubleCount * 8             #double
+
+        strings = [""]
+        for _ in range(max(self.u30() - 1, 0)):
+            size = self.u30()
+            strings.append(self.data[self.pos:self.pos+size].decode("utf-8", "replace"))
+            self.pos += size
+
+        self.strings = strings
+        return strings
+
+    def _skipTraits(self):
+        for _ in range(self.u30()):
+            self.skipU30()      #name
+            kind = self.u8()
+            kindType = kind & 0x0f
+
+            if kindType in _TRAIT_SLOT:
+                self.skipU30(2)     #slot id, type name
+                if self.u30():      #vindex
+                    self.pos += 1   #vkind
+            elif kindType in _TRAIT_METHOD or kindType in _TRAIT_CLASS or kindType in _TRAIT_FUNCTION:
+                self.skipU30(2)
+            else:
+                raise ValueError(f"Unknown trait kind {kindType}")
+
+            if (kind >> 4) & _TRAIT_ATTR_METADATA:
+                self.skipU30(self.u30())
+
+    def iterBodiesCode(self):
+        """
+        Iterate code of method bodies: (method index, code memoryview)
+        """
+        self.readStrings()
+
+        #Namespaces
+        for _ in range(max(self.u30() - 1, 0)):
+            self.pos += 1
+            self.skipU30()
+
+        #Namespace sets
+        for _ in range(max(self.u30() - 1, 0)):
+            self.skipU30(self.u30())
+
+        #Multinames
+        for _ in range(max(self.u30() - 1, 0)):
+            kind = self.u8()
+            if kind in _MULTINAME_QNAME or kind in _MULTINAME_MULTINAME:
+                self.skipU30(2)
+            elif kind in _MULTINAME_RTQNAME or kind in _MULTINAME_MULTINAMEL:
+                self.skipU30()
+            elif kind in _MULTINAME_TYPENAME:
+                self.skipU30()
+                self.skipU30(self.u30())
+            elif kind not in _MULTINAME_RTQNAMEL:
+                raise ValueError(f"Unknown multiname kind {kind}")
+
+        #Methods
+        for _ in range(self.u30()):
+            paramCount = self.u30()
+            self.skipU30(1 + paramCount + 1)    #return type, param types, name
+            flags = self.u8()
+            if flags & _METHOD_HAS_OPTIONAL:
+                for _ in range(self.u30()):
+                    self.skipU30()
+                    self.pos += 1
+            if flags & _METHOD_HAS_PARAM_NAMES:
+                self.skipU30(paramCount)
+
+        #Metadata
+        for _ in range(self.u30()):
+            self.skipU30()
+            self.skipU30(self.u30() * 2)
+
+        #Instances and classes
+        classCount = self.u30()
+        for _ in range(classCount):
+            self.skipU30(2)     #name, super name
+            if self.u8() & _INSTANCE_PROTECTED_NS:
+                self.skipU30()
+            self.skipU30(self.u30())    #interfaces
+            self.skipU30()              #iinit
+            self._skipTraits()
+
+        for _ in range(classCount):
+            self.skipU30()      #cinit
+            self._skipTraits()
+
+        #Scripts
+        for _ in range(self.u30()):
+            self.skipU30()      #init
+            self._skipTraits()
+
+        #Method bodies
+        view = memoryview(self.data)
+        for _ in range(self.u30()):
+            method = self.u30()
+            self.skipU30(4)     #max stack, local count, init scope depth, max scope depth
+            codeLength = self.u30()
+            yield method, view[self.pos:self.pos+codeLength]
+            self.pos += codeLength
+
+            self.skipU30(self.u30() * 5)    #exceptions
+            self._skipTraits()
+
+
+def _ReadU30(code, pos: int):
+    value = 0
+    for shift in range(0, 35, 7):
+        byte = code[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            break
+    return value, pos
+
+
+def IterInstructions(code):
+    """
+    Decode method body code: (offset, opcode, (operand, ...)). ValueError on unknown opcode
+    """
+    pos = 0
+    end = len(code)
+    while pos < end:
+        offset = pos
+        opcode = code[pos]
+        pos += 1
+
+        if opcode == OP_LOOKUPSWITCH:
+            #default offset, case count, case count + 1 offsets
+            pos += 3
+            caseCount, pos = _ReadU30(code, pos)
+            pos += (caseCount + 1) * 3
+            if pos > end:
+                raise IndexError("lookupswitch runs past end of code")
+            yield offset, opcode, (caseCount,)
+            continue
+
+        kinds = _OPERANDS.get(opcode, None)
+        if kinds is None:
+            raise ValueError(f"Unknown opcode {hex(opcode)} at {offset}")
+
+        operands = []
+        for kind in kinds:
+            if kind == _U30:
+                value, pos = _ReadU30(code, pos)
+            elif kind == _U8:
+                value = code[pos]
+                pos += 1
+            else:
+                if pos + 3 > end:
+                    raise IndexError("s24 operand runs past end of code")
+                value = int.from_bytes(bytes(code[pos:pos+3]), "little", signed=True)
+                pos += 3
+            operands.append(value)
+
+        yield offset, opcode, tuple(operands)
+
+
+def FindPushedString(abcDatas, pattern):
+    """
+    First match of pattern in string constants of ABCs. Method bodies are decoded and searched
+    for pushstring only if one ABC has several matching strings
+    """
+    for abcData in abcDatas:
+        reader = AbcReader(abcData)
+
+        matches = {}
+        try:
+            for n, string in enumerate(reader.readStrings()):
+                match = pattern.search(string)
+                if match:
+                    matches[n] = match
+        except (IndexError, ValueError):
+            continue
+
+        if not matches:
+            continue
+
+        if len({match.group(0) for match in matches.values()}) == 1:
+            return next(iter(matches.values()))
+
+        try:
+            for _, code in reader.iterBodiesCode():
+                code = bytes(code)
+                #Quick reject: no pushstring opcode byte anywhere in body
+                if OP_PUSHSTRING not in code:
+                    continue
+
+                try:
+                    for _, opcode, operands in IterInstructions(code):
+                        if opcode == OP_PUSHSTRING and operands[0] in matches:
+                            return matches[operands[0]]
+                except (IndexError, ValueError):
+                    #Undecodable body, other bodies are still searched
+                    continue
+        except (IndexError, ValueError):
+            continue
+
+    return None
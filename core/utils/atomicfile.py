@@ -0,0 +1,48 @@
+# *****************************************************************************
+#
+#                           Brawlhalla Modloader Core
+#   Copyright (C) 2020 Farbigoz
+#   
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#   Contacts:
+#       GitHub: https://github.com/Farbigoz
+#       Gmail: ferattori@gmail.com
+#       VK: https://vk.com/fabriziog    (Preferably)
+#
+# *****************************************************************************
+
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+__all__ = ["AtomicWrite"]
+
+
+@contextmanager
+def AtomicWrite(path: str, mode: str="w"):
+    """
+    Write file through unique temporary file in same folder, then replace it at once.
+    Concurrent writers (threads, worker processes) never share temporary file
+    """
+    fd, tmpPath = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path) or ".")
+
+    try:
+        with os.fdopen(fd, mode) as file:
+            yield file
+        os.replace(tmpPath, path)
+    finally:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
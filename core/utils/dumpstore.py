@@ -0,0 +1,321 @@
+# *****************************************************************************
+#
+#                           Brawlhalla Modloader Core
+#   Copyright (C) 2020 Farbigoz
+#   
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#   Contacts:
+#       GitHub: https://github.com/Farbigoz
+#       Gmail: ferattori@gmail.com
+#       VK: https://vk.com/fabriziog    (Preferably)
+#
+# *****************************************************************************
+
+
+import os
+import json
+import zlib
+import shutil
+import hashlib
+import threading
+from typing import Dict, Iterable
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .localConfig import LOCAL_DATA_PATH
+from .hashing import HASH_CHUNK, HASH_ALGORITHMS, HashCache, ShortHash, HashAlgorithm
+from .exceptions import DumpCorrupted
+from .atomicfile import AtomicWrite
+
+__all__ = ["DUMP_STORE_PATH", "CloneFile", "DumpStore"]
+
+DUMP_STORE_PATH = os.path.join(LOCAL_DATA_PATH, "dumps")
+DUMP_STORE_INDEX = "index.json"
+DUMP_STORE_VERSION = 1
+
+#Flat dumps by file name of previous versions
+LEGACY_DUMP_PATH = os.path.join(LOCAL_DATA_PATH, "files")
+
+#Codec of new blobs: "zstd", "zlib" or "raw". zstd is used if zstandard is installed
+DUMP_CODEC = "zstd" if zstandard is not None else "zlib"
+DUMP_ZLIB_LEVEL = 6
+DUMP_ZSTD_LEVEL = 3
+
+#Already compressed formats are stored raw, raw blobs can be reflinked
+DUMP_RAW_FORMATS = (".mp3", ".png", ".jpg", ".jpeg")
+
+FICLONE = 0x40049409
+
+
+def _Reflink(src: str, dst: str) -> bool:
+    """
+    Copy-on-write clone (Linux FICLONE: btrfs, xfs)
+    """
+    if fcntl is None:
+        return False
+
+    try:
+        with open(src, "rb") as srcFile, open(dst, "wb") as dstFile:
+            fcntl.ioctl(dstFile.fileno(), FICLONE, srcFile.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+def _CloneTo(src: str, dst: str):
+    """
+    Reflink, else copy. Never hardlink: dumps must not share data with files other tools may rewrite in place
+    """
+    if not _Reflink(src, dst):
+        shutil.copyfile(src, dst)
+
+
+def CloneFile(src: str, dst: str):
+    """
+    Clone src to dst through temporary file
+    """
+    tmpPath = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    try:
+        _CloneTo(src, tmpPath)
+        os.replace(tmpPath, dst)
+    finally:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+
+
+def _Compressor(codec: str):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=DUMP_ZSTD_LEVEL).compressobj()
+    elif codec == "zlib":
+        return zlib.compressobj(DUMP_ZLIB_LEVEL)
+    return None
+
+
+def _Decompressor(codec: str):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to restore zstd dump")
+        return zstandard.ZstdDecompressor().decompressobj()
+    elif codec == "zlib":
+        return zlib.decompressobj()
+    return None
+
+
+class _DumpStore:
+    """
+    Content-addressed store of original game files.
+    Blobs are named by sha256 of original content, file names are mapped to blobs
+    """
+    storePath: str
+    files: Dict[str, dict]      #{fileName: {"digest": str, "codec": str, "size": int}, ...}
+
+    def __init__(self, storePath: str):
+        self.storePath = storePath
+        self.files = None
+        self.changed = False
+        self.lock = threading.RLock()
+
+    def _load(self):
+        self.files = {}
+        try:
+            with open(os.path.join(self.storePath, DUMP_STORE_INDEX), "r") as indexFile:
+                index = json.load(indexFile)
+            if index.get("version") == DUMP_STORE_VERSION:
+                self.files = index.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    def _entries(self) -> Dict[str, dict]:
+        with self.lock:
+            if self.files is None:
+                self._load()
+            return self.files
+
+    def blobPath(self, digest: str, codec: str) -> str:
+        return os.path.join(self.storePath, digest[:2], f"{digest}.{codec}")
+
+    def __contains__(self, fileName: str) -> bool:
+        return fileName in self._entries() or os.path.isfile(os.path.join(LEGACY_DUMP_PATH, fileName))
+
+    def put(self, fileName: str, path: str, codec: str=None) -> str:
+        """
+        Store file under fileName, returns sha256 hexdigest of content. Same content is stored once
+        """
+        codec = codec or ("raw" if path.lower().endswith(DUMP_RAW_FORMATS) else DUMP_CODEC)
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        os.makedirs(self.storePath, exist_ok=True)
+        tmpPath = os.path.join(self.storePath, f"{fileName}.{threading.get_ident()}.tmp")
+
+        try:
+            fileHash = hashlib.sha256()
+            if codec == "raw":
+                _CloneTo(path, tmpPath)
+                with open(tmpPath, "rb") as blob:
+                    for chunk in iter(lambda: blob.read(HASH_CHUNK), b""):
+                        fileHash.update(chunk)
+
+            else:
+                compressor = _Compressor(codec)
+                with open(path, "rb") as src, open(tmpPath, "wb") as blob:
+                    for chunk in iter(lambda: src.read(HASH_CHUNK), b""):
+                        fileHash.update(chunk)
+                        blob.write(compressor.compress(chunk))
+                    blob.write(compressor.flush())
+
+            digest = fileHash.hexdigest()
+            blobPath = self.blobPath(digest, codec)
+
+            with self.lock:
+                if not os.path.exists(blobPath):
+                    os.makedirs(os.path.dirname(blobPath), exist_ok=True)
+                    os.replace(tmpPath, blobPath)
+
+                self._entries()[fileName] = {"digest": digest, "codec": codec, "size": stat.st_size}
+                self.changed = True
+
+        finally:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+
+        #Content was read in full, spare hashing it again
+        if os.stat(path).st_mtime_ns == stat.st_mtime_ns:
+            HashCache.put(path, stat, "sha256", digest)
+
+        return digest
+
+    def restore(self, fileName: str, targetPath: str, origFileHash: str=None):
+        """
+        Stream original of fileName to targetPath through temporary file.
+
+        Restored content is checked against blob digest and origFileHash (short hash from
+        ModsConfig.OriginalFiles) before target is replaced, DumpCorrupted is raised on mismatch
+        """
+        entry = self._entries().get(fileName, None)
+
+        #Dump of previous versions
+        if entry is None:
+            srcPath, codec, digest = os.path.join(LEGACY_DUMP_PATH, fileName), "raw", None
+        else:
+            srcPath, codec, digest = self.blobPath(entry["digest"], entry["codec"]), entry["codec"], entry["digest"]
+
+        contentHash = hashlib.sha256()
+        origAlgorithm = HashAlgorithm(origFileHash) if origFileHash else None
+        origHash = HASH_ALGORITHMS[origAlgorithm]() if origAlgorithm not in (None, "sha256") else contentHash
+
+        def update(chunk):
+            contentHash.update(chunk)
+            if origHash is not contentHash:
+                origHash.update(chunk)
+
+        tmpPath = f"{targetPath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if codec == "raw":
+                _CloneTo(srcPath, tmpPath)
+                with open(tmpPath, "rb") as target:
+                    for chunk in iter(lambda: target.read(HASH_CHUNK), b""):
+                        update(chunk)
+
+            else:
+                decompressor = _Decompressor(codec)
+                with open(srcPath, "rb") as blob, open(tmpPath, "wb") as target:
+                    for chunk in iter(lambda: blob.read(HASH_CHUNK), b""):
+                        chunk = decompressor.decompress(chunk)
+                        update(chunk)
+                        target.write(chunk)
+                    if hasattr(decompressor, "flush"):
+                        chunk = decompressor.flush()
+                        update(chunk)
+                        target.write(chunk)
+
+            if digest is not None and contentHash.hexdigest() != digest:
+                raise DumpCorrupted(f"Dump of '{fileName}' doesn't match its digest")
+
+            if origFileHash and ShortHash(origHash.hexdigest(), origAlgorithm) != origFileHash:
+                raise DumpCorrupted(f"Dump of '{fileName}' doesn't match original hash '{origFileHash}'")
+
+            os.replace(tmpPath, targetPath)
+        finally:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+
+    def remove(self, fileName: str):
+        with self.lock:
+            if self._entries().pop(fileName, None) is not None:
+                self.changed = True
+
+    def gc(self, keepFileNames: Iterable[str]=None):
+        """
+        Forget file names not in keepFileNames and delete blobs no file name is mapped to
+        """
+        with self.lock:
+            entries = self._entries()
+
+            if keepFileNames is not None:
+                keepFileNames = set(keepFileNames)
+                for fileName in list(entries):
+                    if fileName not in keepFileNames:
+                        self.remove(fileName)
+
+                #Flat dumps of previous versions
+                if os.path.isdir(LEGACY_DUMP_PATH):
+                    for fileName in os.listdir(LEGACY_DUMP_PATH):
+                        if fileName not in keepFileNames:
+                            os.remove(os.path.join(LEGACY_DUMP_PATH, fileName))
+
+            self.save()
+
+            used = {os.path.basename(self.blobPath(entry["digest"], entry["codec"])) for entry in entries.values()}
+
+            if not os.path.isdir(self.storePath):
+                return
+
+            for folder in os.listdir(self.storePath):
+                folderPath = os.path.join(self.storePath, folder)
+                if not os.path.isdir(folderPath):
+                    continue
+
+                for blob in os.listdir(folderPath):
+                    if blob not in used:
+                        os.remove(os.path.join(folderPath, blob))
+
+                if not os.listdir(folderPath):
+                    os.rmdir(folderPath)
+
+    def save(self):
+        with self.lock:
+            if not self.changed:
+                return
+
+            os.makedirs(self.storePath, exist_ok=True)
+            with AtomicWrite(os.path.join(self.storePath, DUMP_STORE_INDEX)) as indexFile:
+                json.dump({"version": DUMP_STORE_VERSION, "files": self.files}, indexFile)
+
+            self.changed = False
+
+
+DumpStore = _DumpStore(DUMP_STORE_PATH)
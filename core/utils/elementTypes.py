@@ -23,6 +23,8 @@
 #
 # *****************************************************************************
 
+import threading
+
 from .imports import *
 
 __all__ = ["ElementStrToObject", "ElementObjectToStr"]
@@ -47,21 +49,36 @@ _types = {
     "SymbolClassTag": SymbolClassTag,
     "ActionScriptTag": ActionScriptTag
 }
-_types = {**_types, **{v:k for k,v in _types.items()}}
+_names = None      #{Element class: Element name, ...}    Built on first use, classes are resolved with JVM
+_namesLock = threading.Lock()
+
+
+def _Names() -> dict:
+    global _names
+    if _names is None:
+        with _namesLock:
+            if _names is None:
+                _names = {ResolveJClass(v):k for k,v in _types.items()}
+    return _names
 
 
 def ElementStrToObject(elType: str) -> object:
     """
     Convert Element name to Element class
     """
-    return _types.get(elType, None)
+    return ResolveJClass(_types.get(elType, None))
 
 
 def ElementObjectToStr(elType: object) -> str:
     """
     Convert Element class to Element name
     """
-    return _types.get(elType, None) or _types.get(type(elType), None)
+    if type(elType) == str:
+        return ElementStrToObject(elType)
+    elType = ResolveJClass(elType)
+    if not isinstance(elType, type):
+        elType = type(elType)
+    return _Names().get(elType, None)
 
 
 def ElementAnyToObject(elType: object) -> object:
@@ -70,10 +87,12 @@ def ElementAnyToObject(elType: object) -> object:
     """
     if type(elType) == str:
         return ElementStrToObject(elType)
-    elif elType not in _types:
-        return type(elType)
-    else:
+
+    elType = ResolveJClass(elType)
+    if isinstance(elType, type):
         return elType
+    else:
+        return type(elType)
 
 
 def ElementAnyToStr(elType: object) -> str:
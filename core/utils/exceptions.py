@@ -46,6 +46,18 @@ class ModifierDoesNotExist(Exception):
 class FileDoesNotExist(Exception):
     pass
 
+class IdRangeExhausted(Exception):
+    pass
+
+class SwfProcessingFailed(Exception):
+    pass
+
+class DumpCorrupted(Exception):
+    pass
+
+class TagsTruncated(Exception):
+    pass
+
 
 
 
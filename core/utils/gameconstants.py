@@ -25,13 +25,21 @@
 
 from sys import platform
 
-import os, re, hashlib
+import os, re, sys
 
 from .localConfig import CoreConfig
+from .lazy import LazyAttributes, ResetLazyAttributes
+from .gameindex import GetGameIndex, ResetGameIndexes
+from .hashing import FileDigest
+from .exceptions import TagsTruncated
+from .swfscanner import SwfScanner, TAG_DO_ABC, TAG_DO_ABC2
+from .swfindex import SwfIndex, ReadSwfIndex, WriteSwfIndex
+from .abcreader import DoAbcData, FindPushedString
+from .metadata import METADATA_TAG_ID
 from .swf import Swf
 from .imports import ArrayList, Configuration, HighlightedTextWriter, ScriptExportMode
 
-__all__ = ["BRAWLHALLA_PATH", "BRAWLHALLA_SWFS", "BRAWLHALLA_FILES", "BRAWLHALLA_VERSION"]
+__all__ = ["BRAWLHALLA_PATH", "BRAWLHALLA_SWFS", "BRAWLHALLA_FILES", "BRAWLHALLA_COLLISIONS", "BRAWLHALLA_VERSION", "RefindBrawlhalla"]
 
 
 if platform in ["win32", "win64"]:
@@ -91,53 +99,73 @@ else:
     def SearchBrawlhallaHome():
         return None
 
-BRAWLHALLA_PATH = SearchBrawlhallaHome()
-
 
 def SearchBrawlhallaSwfs(brawlhallaPath: str):
     if brawlhallaPath is None:
         return None
 
-    brawlhallaSwfs = {}
-
-    for path, _, files in os.walk(brawlhallaPath):
-        if len(path.replace(brawlhallaPath, "").split("\\")) > 2: continue
-        
-        for file in files:
-            if not file.endswith(".swf"): continue
+    return GetGameIndex(brawlhallaPath).swfs
 
-            brawlhallaSwfs[file] = os.path.join(path, file)
 
-    return brawlhallaSwfs
+def SearchBrawlhallaFiles(brawlhallaPath: str):
+    if brawlhallaPath is None:
+        return None
 
-BRAWLHALLA_SWFS = SearchBrawlhallaSwfs(BRAWLHALLA_PATH) if isinstance(BRAWLHALLA_PATH, str) else None
+    return GetGameIndex(brawlhallaPath).files
 
 
-def SearchBrawlhallaFiles(brawlhallaPath: str):
+def SearchBrawlhallaCollisions(brawlhallaPath: str):
+    """
+    {fileName: [path, ...], ...} game files with same name in several folders
+    """
     if brawlhallaPath is None:
         return None
 
-    brawlhallaFiles = {}
+    return GetGameIndex(brawlhallaPath).collisions
+
+
+BRAWLHALLA_VERSION_PATTERN = re.compile(r'^(\d\.\d\d)$|^(\d\.\d\d\.\d)')
+
 
-    for path, _, files in os.walk(brawlhallaPath):
-        for file in files:
-            if file.endswith(".mp3") or file.endswith(".png") or file.endswith(".jpg"):
-                brawlhallaFiles[file] = os.path.join(path, file)
-                #brawlhallaFiles[brawlhallaFiles[file].replace(brawlhallaPath+"\\", "")] = brawlhallaFiles[file]
+def _SearchBrawlhallaVersionInAbc(brawlhallaAirPath: str, brawlhallaAirHash: str):
+    """
+    Version string from ABC constant pools, read without FFDec. Writes swf index of the same scan
+    """
+    scanner = SwfScanner(brawlhallaAirPath, keepTags=[TAG_DO_ABC, TAG_DO_ABC2]).scan()
 
-    return brawlhallaFiles
+    if ReadSwfIndex(brawlhallaAirPath) is None:
+        WriteSwfIndex(brawlhallaAirPath, SwfIndex(
+            scanner.indices, scanner.codes, scanner.ids, scanner.offsets, scanner.lengths, scanner.tagsCount,
+            scanner.binaryData.get(METADATA_TAG_ID, None)
+        ), bytes.fromhex(brawlhallaAirHash))
 
-BRAWLHALLA_FILES = SearchBrawlhallaFiles(BRAWLHALLA_PATH) if isinstance(BRAWLHALLA_PATH, str) else None
+    match = FindPushedString((
+        DoAbcData(tagCode, data)
+        for tagCode in [TAG_DO_ABC, TAG_DO_ABC2]
+        for data in scanner.keptTags.get(tagCode, [])
+    ), BRAWLHALLA_VERSION_PATTERN)
+
+    if match is not None:
+        return match.group(1) or match.group(2)
 
 
 def SearchBrawlhallaVersion(brawlhallaAirPath: str):
-    with open(brawlhallaAirPath, "rb") as file:
-        brawlhallaAirHash = hashlib.sha256(file.read()).hexdigest()
+    brawlhallaAirHash = FileDigest(brawlhallaAirPath, "sha256")
 
     if brawlhallaAirHash == CoreConfig.BrawlhallaAirHash:
         return CoreConfig.BrawlhallaVersion
 
+    try:
+        version = _SearchBrawlhallaVersionInAbc(brawlhallaAirPath, brawlhallaAirHash)
+    except (OSError, ValueError, TagsTruncated):
+        version = None
+
+    if version is not None:
+        CoreConfig.BrawlhallaVersion = version
+        CoreConfig.BrawlhallaAirHash = brawlhallaAirHash
+        return CoreConfig.BrawlhallaVersion
 
+    #Fallback: search pushstring in PCODE of all methods
     brawlhallaAir = Swf(brawlhallaAirPath)
     brawlhallaAir.load()
 
@@ -165,4 +193,25 @@ def SearchBrawlhallaVersion(brawlhallaAirPath: str):
 
     return CoreConfig.BrawlhallaVersion
 
-BRAWLHALLA_VERSION = SearchBrawlhallaVersion(BRAWLHALLA_SWFS["BrawlhallaAir.swf"]) if isinstance(BRAWLHALLA_PATH, str) else None
+
+
+#Game paths and version are searched on first access: gameconstants.BRAWLHALLA_PATH
+def _BrawlhallaPath():
+    brawlhallaPath = getattr(sys.modules[__name__], "BRAWLHALLA_PATH")
+    return brawlhallaPath if isinstance(brawlhallaPath, str) else None
+
+LazyAttributes(__name__, {
+    "BRAWLHALLA_PATH":      lambda: SearchBrawlhallaHome(),
+    "BRAWLHALLA_SWFS":      lambda: SearchBrawlhallaSwfs(_BrawlhallaPath()) if _BrawlhallaPath() else None,
+    "BRAWLHALLA_FILES":     lambda: SearchBrawlhallaFiles(_BrawlhallaPath()) if _BrawlhallaPath() else None,
+    "BRAWLHALLA_COLLISIONS":lambda: SearchBrawlhallaCollisions(_BrawlhallaPath()) if _BrawlhallaPath() else None,
+    "BRAWLHALLA_VERSION":   lambda: SearchBrawlhallaVersion(getattr(sys.modules[__name__], "BRAWLHALLA_SWFS")["BrawlhallaAir.swf"]) if _BrawlhallaPath() else None,
+})
+
+
+def RefindBrawlhalla():
+    """
+    Search game again on next access
+    """
+    ResetGameIndexes()
+    ResetLazyAttributes(__name__)
@@ -0,0 +1,190 @@
+# *****************************************************************************
+#
+#                           Brawlhalla Modloader Core
+#   Copyright (C) 2020 Farbigoz
+#   
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#   Contacts:
+#       GitHub: https://github.com/Farbigoz
+#       Gmail: ferattori@gmail.com
+#       VK: https://vk.com/fabriziog    (Preferably)
+#
+# *****************************************************************************
+
+import os
+import json
+import threading
+from typing import Dict, List
+
+from .localConfig import LOCAL_DATA_PATH
+from .atomicfile import AtomicWrite
+
+__all__ = ["GameIndex", "GetGameIndex", "ResetGameIndexes"]
+
+GAME_INDEX_FILE = os.path.join(LOCAL_DATA_PATH, "gameindex.cache")
+GAME_INDEX_VERSION = 1
+
+GAME_SWF_EXTENSIONS = (".swf",)
+GAME_FILE_EXTENSIONS = (".mp3", ".png", ".jpg")
+GAME_SWF_MAX_DEPTH = 1     #Swfs in game folder and its subfolders only
+
+
+class GameIndex:
+    """
+    Game files by directory. Only directories with changed mtime are listed again
+    """
+    root: str
+    dirs: Dict[str, dict]       #{relDir: {"mtime": mtime_ns, "files": [name, ...], "dirs": [name, ...]}, ...}
+    order: List[str]            #[relDir, ...]  Top-down walk order
+
+    swfs: Dict[str, str]        #{fileName: path, ...}
+    files: Dict[str, str]       #{fileName: path, ...}
+    collisions: Dict[str, List[str]]    #{fileName: [path, ...], ...}   Names found in several folders, last path is used
+
+    def __init__(self, root: str, dirs: dict=None):
+        self.root = root
+        self.dirs = dirs or {}
+        self.order = []
+
+        self.swfs = {}
+        self.files = {}
+        self.collisions = {}
+
+    def _listDir(self, path: str, mtime: int) -> dict:
+        files = []
+        dirs = []
+
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                    elif entry.name.endswith(GAME_SWF_EXTENSIONS + GAME_FILE_EXTENSIONS):
+                        files.append(entry.name)
+                except OSError:
+                    pass
+
+        return {"mtime": mtime, "files": files, "dirs": dirs}
+
+    def update(self) -> bool:
+        """
+        Returns True if any directory was listed again
+        """
+        dirs = {}
+        order = []
+        changed = False
+
+        stack = [""]
+        while stack:
+            relDir = stack.pop()
+            path = os.path.join(self.root, relDir) if relDir else self.root
+
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                cached = self.dirs.get(relDir, None)
+
+                if cached is None or cached["mtime"] != mtime:
+                    cached = self._listDir(path, mtime)
+                    changed = True
+            except OSError:
+                changed = True
+                continue
+
+            dirs[relDir] = cached
+            order.append(relDir)
+            stack.extend(reversed([os.path.join(relDir, subDir) if relDir else subDir for subDir in cached["dirs"]]))
+
+        changed = changed or len(dirs) != len(self.dirs)
+
+        self.dirs = dirs
+        self.order = order
+        self._buildMaps()
+
+        return changed
+
+    def _buildMaps(self):
+        swfs = {}
+        files = {}
+        found = {}
+
+        for relDir in self.order:
+            depth = relDir.count(os.sep) + 1 if relDir else 0
+            path = os.path.join(self.root, relDir) if relDir else self.root
+
+            for fileName in self.dirs[relDir]["files"]:
+                if fileName.endswith(GAME_SWF_EXTENSIONS):
+                    if depth > GAME_SWF_MAX_DEPTH: continue
+                    filesMap = swfs
+                else:
+                    filesMap = files
+
+                filePath = os.path.join(path, fileName)
+                filesMap[fileName] = filePath
+
+                if fileName not in found:
+                    found[fileName] = []
+                found[fileName].append(filePath)
+
+        self.swfs = swfs
+        self.files = files
+        self.collisions = {fileName: paths for fileName, paths in found.items() if len(paths) > 1}
+
+
+_gameIndexes = {}       #{root: GameIndex, ...}    Updated in this session
+_gameIndexesLock = threading.Lock()
+
+
+def _ReadCache() -> dict:
+    try:
+        with open(GAME_INDEX_FILE, "r") as cacheFile:
+            cache = json.load(cacheFile)
+    except (OSError, ValueError):
+        return {}
+
+    if cache.get("version") != GAME_INDEX_VERSION:
+        return {}
+
+    return cache.get("roots", {})
+
+
+def _WriteCache(roots: dict):
+    try:
+        with AtomicWrite(GAME_INDEX_FILE) as cacheFile:
+            json.dump({"version": GAME_INDEX_VERSION, "roots": roots}, cacheFile)
+    except OSError:
+        pass
+
+
+def GetGameIndex(root: str) -> GameIndex:
+    """
+    Game index of root, updated once per session (until ResetGameIndexes)
+    """
+    with _gameIndexesLock:
+        if root not in _gameIndexes:
+            roots = _ReadCache()
+            gameIndex = GameIndex(root, roots.get(root, None))
+
+            if gameIndex.update():
+                roots[root] = gameIndex.dirs
+                _WriteCache(roots)
+
+            _gameIndexes[root] = gameIndex
+
+        return _gameIndexes[root]
+
+
+def ResetGameIndexes():
+    with _gameIndexesLock:
+        _gameIndexes.clear()
@@ -0,0 +1,238 @@
+# *****************************************************************************
+#
+#                           Brawlhalla Modloader Core
+#   Copyright (C) 2020 Farbigoz
+#   
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#   Contacts:
+#       GitHub: https://github.com/Farbigoz
+#       Gmail: ferattori@gmail.com
+#       VK: https://vk.com/fabriziog    (Preferably)
+#
+# *****************************************************************************
+
+import os
+import json
+import atexit
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from .localConfig import LOCAL_DATA_PATH
+from .atomicfile import AtomicWrite
+
+__all__ = ["HASH_ALGORITHMS", "SetHashAlgorithm", "FileDigest", "FileHash", "ShortHash", "FileHashes", "StreamFileHash", "HashAlgorithm", "CheckFileHash", "HashCache"]
+
+HASH_CACHE_FILE = os.path.join(LOCAL_DATA_PATH, "hashes.cache")
+HASH_CACHE_VERSION = 1
+
+HASH_CHUNK = 1024 * 1024
+HASH_LENGTH = 16
+HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+HASH_ALGORITHMS = {
+    "sha256":   hashlib.sha256,
+    "blake2b":  hashlib.blake2b,
+}
+
+#Prefix of short hash. sha256 hashes are untagged as in mods built before
+HASH_TAGS = {
+    "sha256":   "",
+    "blake2b":  "b2:",
+}
+
+HASH_ALGORITHM = "sha256"   #Algorithm of new hashes
+
+
+def SetHashAlgorithm(algorithm: str):
+    global HASH_ALGORITHM
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(f"Unknown hash algorithm '{algorithm}'")
+    HASH_ALGORITHM = algorithm
+
+
+def _StatKey(stat: os.stat_result) -> list:
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+class _HashCache:
+    """
+    Digests of files memoized by (path, size, mtime_ns, inode)
+    """
+    cachePath: str
+    entries: Dict[str, dict]    #{path: {"stat": [size, mtime_ns, inode], "digests": {algorithm: hexdigest}}, ...}
+
+    def __init__(self, cachePath: str):
+        self.cachePath = cachePath
+        self.entries = None
+        self.changed = False
+        self.lock = threading.Lock()
+
+    def _load(self):
+        self.entries = {}
+        try:
+            with open(self.cachePath, "r") as cacheFile:
+                cache = json.load(cacheFile)
+            if cache.get("version") == HASH_CACHE_VERSION:
+                self.entries = cache.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    def get(self, path: str, stat: os.stat_result, algorithm: str) -> str:
+        with self.lock:
+            if self.entries is None:
+                self._load()
+
+            entry = self.entries.get(path, None)
+            if entry is not None and entry["stat"] == _StatKey(stat):
+                return entry["digests"].get(algorithm, None)
+
+    def put(self, path: str, stat: os.stat_result, algorithm: str, digest: str):
+        with self.lock:
+            if self.entries is None:
+                self._load()
+
+            statKey = _StatKey(stat)
+            entry = self.entries.get(path, None)
+            if entry is None or entry["stat"] != statKey:
+                entry = self.entries[path] = {"stat": statKey, "digests": {}}
+
+            entry["digests"][algorithm] = digest
+            self.changed = True
+
+    def forget(self, path: str):
+        with self.lock:
+            if self.entries is not None and self.entries.pop(os.path.abspath(path), None) is not None:
+                self.changed = True
+
+    def save(self):
+        with self.lock:
+            if not self.changed:
+                return
+
+            #Keep entries saved meanwhile by other processes
+            entries = self.entries
+            self._load()
+            self.entries.update(entries)
+
+            #Drop entries of removed files
+            self.entries = {path: entry for path, entry in self.entries.items() if os.path.exists(path)}
+
+            try:
+                with AtomicWrite(self.cachePath) as cacheFile:
+                    json.dump({"version": HASH_CACHE_VERSION, "files": self.entries}, cacheFile)
+                self.changed = False
+            except OSError:
+                pass
+
+
+HashCache = _HashCache(HASH_CACHE_FILE)
+atexit.register(HashCache.save)
+
+
+def FileDigest(path: str, algorithm: str=None) -> str:
+    """
+    Full hexdigest of file, hashed in chunks
+    """
+    algorithm = algorithm or HASH_ALGORITHM
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+
+    digest = HashCache.get(path, stat, algorithm)
+    if digest is None:
+        fileHash = HASH_ALGORITHMS[algorithm]()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK), b""):
+                fileHash.update(chunk)
+        digest = fileHash.hexdigest()
+
+        #File was changed while hashing
+        if _StatKey(os.stat(path)) == _StatKey(stat):
+            HashCache.put(path, stat, algorithm, digest)
+
+    return digest
+
+
+def ShortHash(digest: str, algorithm: str) -> str:
+    """
+    Short hash stored in mod index and ModsConfig: "{tag}{hexdigest[:16]}"
+    """
+    return HASH_TAGS[algorithm] + digest[:HASH_LENGTH]
+
+
+def FileHash(path: str, algorithm: str=None) -> str:
+    """
+    Short hash of file
+    """
+    algorithm = algorithm or HASH_ALGORITHM
+    return ShortHash(FileDigest(path, algorithm), algorithm)
+
+
+def StreamFileHash(path: str, onChunk, algorithm: str=None) -> str:
+    """
+    Read file in chunks passing each to onChunk, returns FileHash of same pass
+    """
+    algorithm = algorithm or HASH_ALGORITHM
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+
+    fileHash = HASH_ALGORITHMS[algorithm]()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK), b""):
+            fileHash.update(chunk)
+            onChunk(chunk)
+    digest = fileHash.hexdigest()
+
+    #File was changed while reading
+    if _StatKey(os.stat(path)) == _StatKey(stat):
+        HashCache.put(path, stat, algorithm, digest)
+
+    return ShortHash(digest, algorithm)
+
+
+def FileHashes(paths: List[str], algorithm: str=None, workers: int=None) -> Dict[str, str]:
+    """
+    {path: FileHash(path), ...} hashed in thread pool
+    """
+    algorithm = algorithm or HASH_ALGORITHM
+    workers = workers or HASH_WORKERS
+    paths = list(paths)
+
+    if workers == 1 or len(paths) < 2:
+        return {path: FileHash(path, algorithm) for path in paths}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(paths, executor.map(lambda path: FileHash(path, algorithm), paths)))
+
+
+def HashAlgorithm(fileHash: str) -> str:
+    """
+    Algorithm of short hash by its tag
+    """
+    for algorithm, tag in HASH_TAGS.items():
+        if tag and fileHash.startswith(tag):
+            return algorithm
+    return "sha256"
+
+
+def CheckFileHash(path: str, fileHash: str) -> bool:
+    """
+    File matches short hash made with any of HASH_ALGORITHMS
+    """
+    if not fileHash:
+        return False
+
+    return FileHash(path, HashAlgorithm(fileHash)) == fileHash
@@ -24,79 +24,149 @@
 # *****************************************************************************
 
 import jpype, os
+import threading
 from sys import platform
-from jpype import JClass, JString, JInt
+from jpype import JClass, JString, JInt, JByte, JArray
 
 FFDEC_LIB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "libs/ffdec_lib.jar"))
 
 #/Library/Internet Plug-Ins/JavaAppletPlugin.plugin/Contents/Home/
 
-# Run JVM
-try:
-    jpype.startJVM(classpath=[FFDEC_LIB_PATH])
-except:
-    if platform == "darwin":
-        jvmpath = "/Library/Internet Plug-Ins/JavaAppletPlugin.plugin/Contents/Home/lib/jli/libjli.dylib"
-        jpype.startJVM(jvmpath=jvmpath, classpath=[FFDEC_LIB_PATH])
-        
+_jvmLock = threading.RLock()
+
+
+def StartJVM():
+    """
+    Run JVM once, on first use of java class
+    """
+    with _jvmLock:
+        if jpype.isJVMStarted():
+            return
+
+        try:
+            jpype.startJVM(classpath=[FFDEC_LIB_PATH])
+        except:
+            if platform == "darwin":
+                jvmpath = "/Library/Internet Plug-Ins/JavaAppletPlugin.plugin/Contents/Home/lib/jli/libjli.dylib"
+                jpype.startJVM(jvmpath=jvmpath, classpath=[FFDEC_LIB_PATH])
+
+
+class _LazyJClass:
+    """
+    Java class resolved on first use. Equals to resolved class
+    """
+    def __init__(self, javaName: str):
+        self.javaName = javaName
+        self.jClass = None
+
+    def resolve(self):
+        if self.jClass is None:
+            with _jvmLock:
+                if self.jClass is None:
+                    StartJVM()
+                    self.jClass = JClass(self.javaName)
+        return self.jClass
+
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __instancecheck__(self, instance):
+        return isinstance(instance, self.resolve())
+
+    def __subclasscheck__(self, subclass):
+        return issubclass(subclass, self.resolve())
+
+    def __eq__(self, other):
+        if isinstance(other, _LazyJClass):
+            return self.javaName == other.javaName
+        #Java class can't exist before JVM
+        if not jpype.isJVMStarted():
+            return False
+        return self.resolve() is other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        #Equal to resolved class, so same hash. Hashing starts JVM
+        return hash(self.resolve())
+
+    def __repr__(self):
+        return f"<java class '{self.javaName}'>"
+
+
+def ResolveJClass(cls):
+    """
+    Java class of lazy class, other objects as is
+    """
+    if isinstance(cls, _LazyJClass):
+        return cls.resolve()
+    return cls
+
 
 # Java
-ArrayList = JClass('java.util.ArrayList')
-FileInputStream = JClass('java.io.FileInputStream')
-FileOutputStream = JClass('java.io.FileOutputStream')
-BufferedInputStream = JClass('java.io.BufferedInputStream')
-BufferedOutputStream = JClass('java.io.BufferedOutputStream')
-ByteArrayOutputStream = JClass('java.io.ByteArrayOutputStream')
+ArrayList = _LazyJClass('java.util.ArrayList')
+FileInputStream = _LazyJClass('java.io.FileInputStream')
+FileOutputStream = _LazyJClass('java.io.FileOutputStream')
+BufferedInputStream = _LazyJClass('java.io.BufferedInputStream')
+BufferedOutputStream = _LazyJClass('java.io.BufferedOutputStream')
+ByteArrayOutputStream = _LazyJClass('java.io.ByteArrayOutputStream')
 
 # FFDEc_lib
 #  Swf
-SWF = JClass('com.jpexs.decompiler.flash.SWF')
-SWFHeader = JClass('com.jpexs.decompiler.flash.SWFHeader')
-SWFOutputStream = JClass('com.jpexs.decompiler.flash.SWFOutputStream')
+SWF = _LazyJClass('com.jpexs.decompiler.flash.SWF')
+SWFHeader = _LazyJClass('com.jpexs.decompiler.flash.SWFHeader')
+SWFOutputStream = _LazyJClass('com.jpexs.decompiler.flash.SWFOutputStream')
 
-Configuration = JClass('com.jpexs.decompiler.flash.configuration.Configuration')
-HighlightedTextWriter = JClass('com.jpexs.decompiler.flash.helpers.HighlightedTextWriter')
-ScriptExportMode = JClass('com.jpexs.decompiler.flash.exporters.modes.ScriptExportMode')
+Configuration = _LazyJClass('com.jpexs.decompiler.flash.configuration.Configuration')
+HighlightedTextWriter = _LazyJClass('com.jpexs.decompiler.flash.helpers.HighlightedTextWriter')
+ScriptExportMode = _LazyJClass('com.jpexs.decompiler.flash.exporters.modes.ScriptExportMode')
 
-As3ScriptReplacerFactory = JClass('com.jpexs.decompiler.flash.importers.As3ScriptReplacerFactory')
+As3ScriptReplacerFactory = _LazyJClass('com.jpexs.decompiler.flash.importers.As3ScriptReplacerFactory')
 
 #  Types
-RECT = JClass('com.jpexs.decompiler.flash.types.RECT')
-FILLSTYLE = JClass('com.jpexs.decompiler.flash.types.FILLSTYLE')
+ByteArrayRange = _LazyJClass('com.jpexs.helpers.ByteArrayRange')
+
+RECT = _LazyJClass('com.jpexs.decompiler.flash.types.RECT')
+FILLSTYLE = _LazyJClass('com.jpexs.decompiler.flash.types.FILLSTYLE')
 
 #  Tags
-DefineBitsLosslessTag = JClass('com.jpexs.decompiler.flash.tags.DefineBitsLosslessTag')
-DefineBitsLossless2Tag = JClass('com.jpexs.decompiler.flash.tags.DefineBitsLossless2Tag')
+DefineBitsLosslessTag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineBitsLosslessTag')
+DefineBitsLossless2Tag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineBitsLossless2Tag')
 DefineBitsLosslessTags = [
     DefineBitsLosslessTag, 
     DefineBitsLossless2Tag
 ]
-DefineShapeTag = JClass('com.jpexs.decompiler.flash.tags.DefineShapeTag')
-DefineShape2Tag = JClass('com.jpexs.decompiler.flash.tags.DefineShape2Tag')
-DefineShape3Tag = JClass('com.jpexs.decompiler.flash.tags.DefineShape3Tag')
-DefineShape4Tag = JClass('com.jpexs.decompiler.flash.tags.DefineShape4Tag')
+DefineShapeTag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineShapeTag')
+DefineShape2Tag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineShape2Tag')
+DefineShape3Tag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineShape3Tag')
+DefineShape4Tag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineShape4Tag')
 DefineShapeTags = [
     DefineShapeTag,
     DefineShape2Tag,
     DefineShape3Tag,
     DefineShape4Tag
 ]
-DefineFontTag = JClass('com.jpexs.decompiler.flash.tags.DefineFontTag')
-DefineFont2Tag = JClass('com.jpexs.decompiler.flash.tags.DefineFont2Tag')
-DefineFont3Tag = JClass('com.jpexs.decompiler.flash.tags.DefineFont3Tag')
-DefineFont4Tag = JClass('com.jpexs.decompiler.flash.tags.DefineFont4Tag')
+DefineFontTag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineFontTag')
+DefineFont2Tag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineFont2Tag')
+DefineFont3Tag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineFont3Tag')
+DefineFont4Tag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineFont4Tag')
 DefineFontTags = [
     DefineFontTag,
     DefineFont2Tag,
     DefineFont3Tag,
     DefineFont4Tag
 ]
-DefineSpriteTag = JClass('com.jpexs.decompiler.flash.tags.DefineSpriteTag')
-DefineSoundTag = JClass('com.jpexs.decompiler.flash.tags.DefineSoundTag')
-DefineEditTextTag = JClass('com.jpexs.decompiler.flash.tags.DefineEditTextTag')
-CSMTextSettingsTag = JClass('com.jpexs.decompiler.flash.tags.CSMTextSettingsTag')
-DefineFontNameTag = JClass('com.jpexs.decompiler.flash.tags.DefineFontNameTag')
-DefineFontAlignZonesTag = JClass('com.jpexs.decompiler.flash.tags.DefineFontAlignZonesTag')
-SymbolClassTag = JClass('com.jpexs.decompiler.flash.tags.SymbolClassTag')
+DefineSpriteTag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineSpriteTag')
+DefineSoundTag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineSoundTag')
+DefineEditTextTag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineEditTextTag')
+CSMTextSettingsTag = _LazyJClass('com.jpexs.decompiler.flash.tags.CSMTextSettingsTag')
+DefineFontNameTag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineFontNameTag')
+DefineFontAlignZonesTag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineFontAlignZonesTag')
+SymbolClassTag = _LazyJClass('com.jpexs.decompiler.flash.tags.SymbolClassTag')
+DefineBinaryDataTag = _LazyJClass('com.jpexs.decompiler.flash.tags.DefineBinaryDataTag')
 class ActionScriptTag:
     pass
\ No newline at end of file
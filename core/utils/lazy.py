@@ -0,0 +1,75 @@
+# *****************************************************************************
+#
+#                           Brawlhalla Modloader Core
+#   Copyright (C) 2020 Farbigoz
+#   
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#   Contacts:
+#       GitHub: https://github.com/Farbigoz
+#       Gmail: ferattori@gmail.com
+#       VK: https://vk.com/fabriziog    (Preferably)
+#
+# *****************************************************************************
+
+import sys
+import threading
+from types import ModuleType
+
+__all__ = ["LazyAttributes", "ResetLazyAttributes"]
+
+
+class _LazyModule(ModuleType):
+    """
+    Module with attributes computed on first access (module __getattr__ of python 3.7)
+    """
+    def __getattr__(self, name):
+        lazy = self.__dict__.get("_lazyAttributes", {})
+        if name not in lazy:
+            raise AttributeError(f"module '{self.__name__}' has no attribute '{name}'")
+
+        getter, cache = lazy[name]
+        if not cache:
+            return getter()
+
+        with self.__dict__["_lazyLock"]:
+            if name not in self.__dict__:
+                self.__dict__[name] = getter()
+        return self.__dict__[name]
+
+
+def LazyAttributes(moduleName: str, attributes: dict, cache=True):
+    """
+    attributes: {name: getter, ...}
+    cache:      keep value after first access, else call getter on every access
+    """
+    module = sys.modules[moduleName]
+
+    if not isinstance(module, _LazyModule):
+        module._lazyAttributes = {}
+        module._lazyLock = threading.RLock()
+        module.__class__ = _LazyModule
+
+    module._lazyAttributes.update({name: (getter, cache) for name, getter in attributes.items()})
+
+
+def ResetLazyAttributes(moduleName: str):
+    """
+    Forget cached values, they are computed again on next access
+    """
+    module = sys.modules[moduleName]
+
+    with module._lazyLock:
+        for name in module._lazyAttributes:
+            module.__dict__.pop(name, None)
@@ -0,0 +1,211 @@
+# *****************************************************************************
+#
+#                           Brawlhalla Modloader Core
+#   Copyright (C) 2020 Farbigoz
+#   
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#   Contacts:
+#       GitHub: https://github.com/Farbigoz
+#       Gmail: ferattori@gmail.com
+#       VK: https://vk.com/fabriziog    (Preferably)
+#
+# *****************************************************************************
+
+import struct
+import zlib
+from typing import Dict, List
+
+METADATA_TAG_ID  = 0xffff   #characterId of DefineBinaryData with GameSwfMetadata
+
+METADATA_MAGIC   = b"BMLM"
+METADATA_VERSION = 1
+
+SECTION_INSTALLED_MODS         = 0x01
+SECTION_BACKUP_ELEMENTS        = 0x02
+SECTION_BACKUP_ACTION_SCRIPTS  = 0x03
+
+_HEADER   = struct.Struct("<4sBH")    #magic, version, section count
+_SECTION  = struct.Struct("<BI")      #section id, length
+_UI16     = struct.Struct("<H")
+_UI32     = struct.Struct("<I")
+
+
+def _packStr(string: str) -> bytes:
+    data = string.encode()
+    return _UI16.pack(len(data)) + data
+
+
+def _unpackStr(data: bytes, pos: int):
+    size, = _UI16.unpack_from(data, pos)
+    pos += _UI16.size
+    return data[pos:pos+size].decode(), pos + size
+
+
+def _encodeInstalledMods(installedMods: List[str]) -> bytes:
+    return _UI16.pack(len(installedMods)) + b"".join(_packStr(modHash) for modHash in installedMods)
+
+
+def _decodeInstalledMods(data: bytes) -> List[str]:
+    installedMods = []
+    if not data: return installedMods
+
+    count, = _UI16.unpack_from(data, 0)
+    pos = _UI16.size
+    for _ in range(count):
+        modHash, pos = _unpackStr(data, pos)
+        installedMods.append(modHash)
+
+    return installedMods
+
+
+def _encodeBackupElements(backupElements: Dict[str, Dict[int, int]]) -> bytes:
+    content = bytearray(_UI16.pack(len(backupElements)))
+
+    for elType, elIdsMap in backupElements.items():
+        content += _packStr(elType)
+        content += _UI32.pack(len(elIdsMap))
+        content += struct.pack(f"<{len(elIdsMap)*2}H", *[elId for pair in elIdsMap.items() for elId in pair])
+
+    return bytes(content)
+
+
+def _decodeBackupElements(data: bytes) -> Dict[str, Dict[int, int]]:
+    backupElements = {}
+    if not data: return backupElements
+
+    count, = _UI16.unpack_from(data, 0)
+    pos = _UI16.size
+    for _ in range(count):
+        elType, pos = _unpackStr(data, pos)
+        size, = _UI32.unpack_from(data, pos)
+        pos += _UI32.size
+
+        elIds = struct.unpack_from(f"<{size*2}H", data, pos)
+        pos += size * 2 * _UI16.size
+
+        backupElements[elType] = dict(zip(elIds[0::2], elIds[1::2]))
+
+    return backupElements
+
+
+class GameSwfMetadata:
+    """
+    Versioned binary storage of modloader data of game swf
+
+    Sections are kept encoded until first access, untouched sections are written back as is
+    """
+    raw: Dict[int, bytes]       #{sectionId: data, ...}
+    decoded: Dict[int, object]  #{sectionId: object, ...}
+
+    def __init__(self, data: bytes=None):
+        self.raw = {}
+        self.decoded = {}
+        self.scriptsCache = {}  #{scriptName: (content, packed), ...}
+
+        if data:
+            magic, version, count = _HEADER.unpack_from(data, 0)
+            if magic != METADATA_MAGIC or version > METADATA_VERSION:
+                raise ValueError("Unsupported game swf metadata")
+
+            pos = _HEADER.size
+            sections = []
+            for _ in range(count):
+                sections.append(_SECTION.unpack_from(data, pos))
+                pos += _SECTION.size
+
+            for sectionId, size in sections:
+                self.raw[sectionId] = data[pos:pos+size]
+                pos += size
+
+    @classmethod
+    def fromObjects(cls, installedMods: list=None, backupElements: dict=None, backupActionsScripts: dict=None):
+        metadata = cls()
+        metadata.decoded[SECTION_INSTALLED_MODS] = list(installedMods or [])
+        metadata.decoded[SECTION_BACKUP_ELEMENTS] = {
+            elType: {int(old):int(new) for old, new in elIdsMap.items()}
+            for elType, elIdsMap in (backupElements or {}).items()
+        }
+        metadata.decoded[SECTION_BACKUP_ACTION_SCRIPTS] = dict(backupActionsScripts or {})
+        return metadata
+
+    def _section(self, sectionId: int, decode):
+        if sectionId not in self.decoded:
+            self.decoded[sectionId] = decode(self.raw.pop(sectionId, b""))
+        return self.decoded[sectionId]
+
+    @property
+    def installedMods(self) -> List[str]:
+        return self._section(SECTION_INSTALLED_MODS, _decodeInstalledMods)
+
+    @property
+    def backupElements(self) -> Dict[str, Dict[int, int]]:
+        return self._section(SECTION_BACKUP_ELEMENTS, _decodeBackupElements)
+
+    @property
+    def backupActionsScripts(self) -> Dict[str, str]:
+        return self._section(SECTION_BACKUP_ACTION_SCRIPTS, self._decodeActionScripts)
+
+    def _decodeActionScripts(self, data: bytes) -> Dict[str, str]:
+        scripts = {}
+        if not data: return scripts
+
+        count, = _UI32.unpack_from(data, 0)
+        pos = _UI32.size
+        for _ in range(count):
+            start = pos
+            name, pos = _unpackStr(data, pos)
+            size, = _UI32.unpack_from(data, pos)
+            pos += _UI32.size
+
+            content = zlib.decompress(data[pos:pos+size]).decode()
+            pos += size
+
+            scripts[name] = content
+            self.scriptsCache[name] = (content, data[start:pos])
+
+        return scripts
+
+    def _encodeActionScripts(self, scripts: Dict[str, str]) -> bytes:
+        content = bytearray(_UI32.pack(len(scripts)))
+
+        for name, script in scripts.items():
+            cached = self.scriptsCache.get(name)
+            if cached is None or cached[0] != script:
+                packed = zlib.compress(script.encode())
+                cached = (script, _packStr(name) + _UI32.pack(len(packed)) + packed)
+                self.scriptsCache[name] = cached
+
+            content += cached[1]
+
+        return bytes(content)
+
+    def encode(self) -> bytes:
+        encoders = {
+            SECTION_INSTALLED_MODS: _encodeInstalledMods,
+            SECTION_BACKUP_ELEMENTS: _encodeBackupElements,
+            SECTION_BACKUP_ACTION_SCRIPTS: self._encodeActionScripts
+        }
+
+        sections = dict(self.raw)
+        for sectionId, obj in self.decoded.items():
+            sections[sectionId] = encoders[sectionId](obj)
+
+        content = bytearray(_HEADER.pack(METADATA_MAGIC, METADATA_VERSION, len(sections)))
+        for sectionId, data in sorted(sections.items()):
+            content += _SECTION.pack(sectionId, len(data))
+        for sectionId, data in sorted(sections.items()):
+            content += data
+
+        return bytes(content)
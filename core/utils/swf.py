@@ -23,10 +23,17 @@
 #
 # *****************************************************************************
 
-from .exceptions import FileDoesNotExist
+from .exceptions import FileDoesNotExist, TagsTruncated
+from .atomicfile import AtomicWrite
 from .imports import *
-from .elementTypes import ElementAnyToObject, ElementAnyToStr
+import zlib
+import struct
+import hashlib
+
+from .elementTypes import ElementAnyToObject, ElementObjectToStr
 from .symbolclass import SymbolClass
+from .tagstream import ELEMENT_TAG_CODES, IndexTags, IterTags
+from .swfindex import SwfIndex
 
 
 SYMBOL_CLASS_TAG_IS_MODIFIED            = 0xffff
@@ -35,80 +42,66 @@ SYMBOL_CLASS_TAG_BACKUP_ACTION_SCRIPTS  = 0xfffd
 SYMBOL_CLASS_TAG_INSTALLED_MODS         = 0xfffc
 
 
-class SwfUtils:
-    def setElementId(self, element: object, elId: int):
-        elType = type(element)
-
-        if elType in DefineShapeTags:
-            element.shapeId = elId
-
-        elif elType == DefineSpriteTag:
-            element.spriteId = elId
-
-        elif elType == DefineSoundTag:
-            element.soundId = elId
-
-        elif elType == DefineEditTextTag:
-            element.characterID = elId
-
-        elif elType == CSMTextSettingsTag:
-            element.textID = elId
-
-        elif elType == DefineFontTag:
-            element.fontId = elId
-            element.characterID = elId
-
-        elif elType in DefineFontTags:
-            element.fontID = elId
+#Element attributes holding element id, first one is read
+ELEMENT_ID_ATTRS = {
+    **{elType: ("shapeId",) for elType in ["DefineShapeTag", "DefineShape2Tag", "DefineShape3Tag", "DefineShape4Tag"]},
+    "DefineSpriteTag":          ("spriteId",),
+    "DefineSoundTag":           ("soundId",),
+    "DefineEditTextTag":        ("characterID",),
+    "CSMTextSettingsTag":       ("textID",),
+    "DefineFontTag":            ("fontId", "characterID"),
+    **{elType: ("fontID",) for elType in ["DefineFont2Tag", "DefineFont3Tag", "DefineFont4Tag"]},
+    "DefineFontNameTag":        ("fontId",),
+    "DefineFontAlignZonesTag":  ("fontID",),
+    **{elType: ("characterID",) for elType in ["DefineBitsLosslessTag", "DefineBitsLossless2Tag"]},
+}
+
+_UNRESOLVED = object()
+
+
+def WriteSwf(swfPath: str, compression: str, version: int, chunks: list) -> bytes:
+    """
+    Write swf of uncompressed body chunks (frame header and tags) with FWS/CWS header.
+    Returns sha256 of written bytes
+    """
+    fileSize = 8 + sum(len(chunk) for chunk in chunks)
+    contentHash = hashlib.sha256()
+
+    with AtomicWrite(swfPath, "wb") as file:
+        def write(data):
+            contentHash.update(data)
+            file.write(data)
+
+        write(b"CWS" if compression == "ZLIB" else b"FWS")
+        write(struct.pack("<BI", version, fileSize))
+
+        if compression == "ZLIB":
+            compressor = zlib.compressobj()
+            for chunk in chunks:
+                write(compressor.compress(chunk))
+            write(compressor.flush())
+        else:
+            for chunk in chunks:
+                write(chunk)
 
-        elif elType == DefineFontNameTag:
-            element.fontId = elId
+    return contentHash.digest()
 
-        elif elType == DefineFontAlignZonesTag:
-            element.fontID = elId
 
-        elif elType in DefineBitsLosslessTags:
-            element.characterID = elId
+class SwfUtils:
+    def setElementId(self, element: object, elId: int):
+        for attr in ELEMENT_ID_ATTRS.get(ElementObjectToStr(element), ()):
+            setattr(element, attr, elId)
 
         element.setModified(True)
 
         return element
 
     def getElementId(self, element: object):
-        elType = type(element)
-        elId = -1
-
-        if elType in DefineShapeTags:
-            elId = element.shapeId
-
-        elif elType == DefineSpriteTag:
-            elId = element.spriteId
+        attrs = ELEMENT_ID_ATTRS.get(ElementObjectToStr(element), None)
+        if attrs is None:
+            return None
 
-        elif elType == DefineSoundTag:
-            elId = element.soundId
-
-        elif elType == DefineEditTextTag:
-            elId = element.characterID
-
-        elif elType == CSMTextSettingsTag:
-            elId = element.textID
-
-        elif elType == DefineFontTag:
-            elId = element.fontId
-
-        elif elType in DefineFontTags:
-            elId = element.fontID
-
-        elif elType == DefineFontNameTag:
-            elId = element.fontId
-
-        elif elType == DefineFontAlignZonesTag:
-            elId = element.fontID
-
-        elif elType in DefineBitsLosslessTags:
-            elId = element.characterID
-
-        elId = int(elId)
+        elId = int(getattr(element, attrs[0]))
 
         if elId > 0:
             return elId
@@ -121,7 +114,12 @@ class Swf(SwfUtils):
     elementsList: list          #[element, ...]
     elementsMap: dict           #{element: elId, ...}
     elementsMapByType: dict     #{elType: {elId: element, ...}, ...}
+    binaryData: dict            #{characterId: DefineBinaryDataTag, ...}
     symbolClass: SymbolClass
+    tagsByType: dict            #{elType: [(element, elId), ...], ...}    Not indexed yet
+    loadedTags: list            #[element, ...]   Tags as read from file
+    tagsIndex: SwfIndex         #Element tags of file, updated on save
+    loadedIndex: SwfIndex       #Element tags of file as loaded, tag numbers of loadedTags
 
     def __init__(self, swfPath: str):
         if not os.path.exists(swfPath):
@@ -136,33 +134,107 @@ class Swf(SwfUtils):
         self.elementsList = []
         self.elementsMap = {}
         self.elementsMapByType = {}
+        self.binaryData = {}
         self.symbolClass = None
-
-    def load(self) -> SWF:
+        self.tagsByType = {}
+        self.loadedTags = []
+        self.tagsIndex = None
+        self.loadedIndex = None
+
+    def load(self, elTypes=None, lazy=False) -> SWF:
+        """
+        lazy:    index elements of each type on first query of this type
+        elTypes: index only these types right away, others on first query
+
+        Until a type is indexed its elements are missing from elementsList and elementsMap
+        """
         fileStream = FileInputStream(self.swfPath)
         self.swf = SWF(BufferedInputStream(fileStream), True)
         fileStream.close()
 
-        for element in self.swf.getTags():
+        deferred = lazy or elTypes is not None
+
+        tags = self.swf.getTags().toArrayList().toArray()
+        elementIds = self._readElementIds(tags)
+        self.loadedTags = list(tags)
+
+        for n, element in enumerate(tags):
             elType = type(element)
-            elId = None
 
             if elType == SymbolClassTag:
                 self.symbolClass = SymbolClass(element)
+            elif elType == DefineBinaryDataTag:
+                self.binaryData[int(element.tag)] = element
+            elif deferred:
+                if elType not in self.tagsByType:
+                    self.tagsByType[elType] = []
+                self.tagsByType[elType].append((element, elementIds.get(n, _UNRESOLVED)))
             else:
-                elId = self.getElementId(element)
-            
-            if elId is not None:
-                self.elementsList.append(element)
+                self._indexElement(element, elType, elementIds.get(n, _UNRESOLVED))
 
-                self.elementsMap[element] = elId
-
-                if elType not in self.elementsMapByType:
-                    self.elementsMapByType[elType] = {}
-                self.elementsMapByType[elType][elId] = element
+        for elType in elTypes or []:
+            self._indexType(ElementAnyToObject(elType))
 
         return self
 
+    def _readTagsIndex(self, tagsCount: int) -> SwfIndex:
+        """
+        Parsed in python from original swf bytes taken in one call. None if index doesn't match tag list exactly
+        """
+        #Tag list has no EndTag, index counts it only if it is in file
+        expectedCount = tagsCount + 1 if self.swf.hasEndTag else tagsCount
+
+        data = self.swf.uncompressedData
+        if data is None:
+            return None
+
+        try:
+            index = SwfIndex(*IndexTags(memoryview(data).cast("B")))
+        except TagsTruncated:
+            return None
+
+        if index.count != expectedCount:
+            return None
+
+        return index
+
+    def _readElementIds(self, tags) -> dict:
+        """
+        {tagIndex: elId, ...}
+        """
+        self.tagsIndex = self.loadedIndex = self._readTagsIndex(len(tags))
+        if self.tagsIndex is None:
+            return {}
+
+        elementIds = {}
+        index = self.tagsIndex
+        for n, tagCode, elId in zip(index.indices, index.codes, index.ids):
+            if n < len(tags) and ElementObjectToStr(type(tags[n])) == ELEMENT_TAG_CODES[tagCode]:
+                elementIds[n] = elId if elId > 0 else None
+
+        return elementIds
+
+    def _indexElement(self, element, elType, elId=_UNRESOLVED):
+        if elId is _UNRESOLVED:
+            elId = self.getElementId(element)
+
+        if elId is not None:
+            self.elementsList.append(element)
+
+            self.elementsMap[element] = elId
+
+            if elType not in self.elementsMapByType:
+                self.elementsMapByType[elType] = {}
+            self.elementsMapByType[elType][elId] = element
+
+    def _indexType(self, elType):
+        for element, elId in self.tagsByType.pop(elType, []):
+            self._indexElement(element, elType, elId)
+
+    def _indexAll(self):
+        for elType in list(self.tagsByType):
+            self._indexType(elType)
+
     def close(self):
         if self.swf:
             self.swf.clearTagSwfs()
@@ -170,21 +242,115 @@ class Swf(SwfUtils):
 
         self.init(self.swfPath)
 
-    def save(self):
+    def save(self, incremental=False):
+        """
+        incremental: copy bytes of untouched tags from the original file, serialize only changed ones.
+                     Opt-in until it is checked against SWF.saveTo on real game files
+        """
         if self.swf is not None:
+            if incremental and self._saveIncremental():
+                return
+
             fileStream = FileOutputStream(self.swfPath)
             self.swf.saveTo(fileStream)
             fileStream.close()
 
+            self.tagsIndex = None
+
+    def _saveIncremental(self) -> bool:
+        compression = str(self.swf.compression)
+        data = self.swf.uncompressedData
+
+        if self.swf.gfx or compression not in ["NONE", "ZLIB"] or data is None or not self.loadedTags:
+            return False
+
+        version = int(self.swf.version)
+        original = memoryview(data).cast("B")
+        originalRanges = {tagStart: (n, tagStart, tagEnd) for n, (_, tagStart, _, tagEnd) in enumerate(IterTags(original))}
+
+        #Index of written file: entries of copied tags are moved, changed tags are parsed.
+        #Tags are always copied from loaded data, so entries are taken from index of loaded file
+        oldIndex = self.loadedIndex
+        oldEntries = {n: k for k, n in enumerate(oldIndex.indices)} if oldIndex is not None else {}
+        newIndex = SwfIndex()
+        tagsCount = 0
+
+        #Frame size, rate and count
+        headerStream = ByteArrayOutputStream()
+        headerSwfStream = SWFOutputStream(headerStream, version)
+        headerSwfStream.writeRECT(self.swf.displayRect)
+        headerSwfStream.writeFIXED8(self.swf.frameRate)
+        headerSwfStream.writeUI16(self.swf.frameCount)
+        chunks = [bytes(headerStream.toByteArray())]
+        offset = 8 + len(chunks[0])
+
+        def addChangedChunk(chunk):
+            nonlocal offset, tagsCount
+            indices, codes, ids, offsets, lengths, count = IndexTags(chunk, 0)
+            for n, tagCode, elId, tagStart, tagLength in zip(indices, codes, ids, offsets, lengths):
+                newIndex.append(tagsCount + n, tagCode, elId, offset + tagStart, tagLength)
+            chunks.append(chunk)
+            offset += len(chunk)
+            tagsCount += count
+
+        changedStream = None
+        for tag in self.swf.getTags().toArrayList().toArray():
+            originalRange = None
+
+            tagRange = tag.getOriginalRange() if not tag.isModified() else None
+            if tagRange is not None:
+                #Same tag object as read from this file at this position
+                originalRange = originalRanges.get(int(tagRange.getPos()), None)
+                if originalRange is not None and not self.loadedTags[originalRange[0]].equals(tag):
+                    originalRange = None
+
+            if originalRange is None:
+                if changedStream is None:
+                    changedStream = ByteArrayOutputStream()
+                    changedSwfStream = SWFOutputStream(changedStream, version)
+                tag.writeTag(changedSwfStream)
+
+            else:
+                if changedStream is not None:
+                    addChangedChunk(bytes(changedStream.toByteArray()))
+                    changedStream = None
+
+                n, tagStart, tagEnd = originalRange
+                if n in oldEntries:
+                    k = oldEntries[n]
+                    newIndex.append(tagsCount, oldIndex.codes[k], oldIndex.ids[k], offset, tagEnd - tagStart)
+
+                chunks.append(original[tagStart:tagEnd])
+                offset += tagEnd - tagStart
+                tagsCount += 1
+
+        if changedStream is not None:
+            addChangedChunk(bytes(changedStream.toByteArray()))
+
+        if self.swf.hasEndTag:
+            chunks.append(b"\x00\x00")
+            tagsCount += 1
+
+        newIndex.count = tagsCount
+        newIndex.contentHash = WriteSwf(self.swfPath, compression, version, chunks)
+        self.tagsIndex = newIndex if oldIndex is not None else None
+
+        return True
+
     def getElementById(self, elId: int, elType=None, elTypes=[]):
         if elType:
-            return self.elementsMapByType.get(ElementAnyToObject(elType), {}).get(elId, None)
+            elType = ElementAnyToObject(elType)
+            self._indexType(elType)
+            return self.elementsMapByType.get(elType, {}).get(elId, None)
         elif elTypes:
             for elType in elTypes:
-                elements = self.elementsMapByType.get(ElementAnyToObject(elType), {})
+                elType = ElementAnyToObject(elType)
+                self._indexType(elType)
+                elements = self.elementsMapByType.get(elType, {})
                 if elId in elements:
                     return elements[elId]
         else:
+            self._indexAll()
             for elType, elements in self.elementsMapByType.items():
                 if elId in elements:
                     return elements[elId]
@@ -193,10 +359,12 @@ class Swf(SwfUtils):
         if elTypes:
             for elType in elTypes:
                 elType = ElementAnyToObject(elType)
+                self._indexType(elType)
                 elements = self.elementsMapByType.get(elType, {})
                 if elId in elements:
                     return elType
         else:
+            self._indexAll()
             for elType, elements in self.elementsMapByType.items():
                 if elId in elements:
                     return elType 
@@ -206,10 +374,12 @@ class Swf(SwfUtils):
         return self.swf.getAS3Packs()
 
     def addElement(self, element):
+        elType = ElementAnyToObject(element)
+        self._indexType(elType)
+
         self.swf.addTag(element)
 
         elId = self.getElementId(element)
-        elType = ElementAnyToObject(element)
 
         self.elementsList.append(element)
         self.elementsMap[element] = elId
@@ -223,6 +393,7 @@ class Swf(SwfUtils):
     def removeElement(self, element):
         elId = self.getElementId(element)
         elType = ElementAnyToObject(element)
+        self._indexType(elType)
 
         self.swf.removeTag(element)
 
@@ -0,0 +1,173 @@
+# *****************************************************************************
+#
+#                           Brawlhalla Modloader Core
+#   Copyright (C) 2020 Farbigoz
+#   
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#   Contacts:
+#       GitHub: https://github.com/Farbigoz
+#       Gmail: ferattori@gmail.com
+#       VK: https://vk.com/fabriziog    (Preferably)
+#
+# *****************************************************************************
+
+import os
+import struct
+import hashlib
+from array import array
+
+from .localConfig import LOCAL_DATA_PATH
+from .atomicfile import AtomicWrite
+from .hashing import FileDigest
+
+__all__ = ["SWF_INDEX_PATH", "SwfIndex", "ReadSwfIndex", "WriteSwfIndex"]
+
+SWF_INDEX_PATH = os.path.join(LOCAL_DATA_PATH, "swfindex")
+
+SWF_INDEX_MAGIC = b"BMLI"
+SWF_INDEX_VERSION = 1
+
+#magic, version, file size, file mtime_ns, content hash, tags count, elements count, metadata length
+_HEADER = struct.Struct("<4sBQQ32sIII")
+_NO_METADATA = 0xffffffff
+
+
+class SwfIndex:
+    """
+    Element tags of swf file: parallel arrays as returned by IndexTags, and modloader metadata
+    """
+    indices: array      #[tagIndex, ...]
+    codes: array        #[tagCode, ...]
+    ids: array          #[elId, ...]
+    offsets: array      #[tagStart, ...]    In uncompressed file
+    lengths: array      #[tagLength, ...]
+    count: int          #All tags
+    metadata: bytes     #Encoded GameSwfMetadata or None
+
+    fileSize: int
+    fileMtime: int
+    contentHash: bytes
+
+    def __init__(self, indices=None, codes=None, ids=None, offsets=None, lengths=None, count=0, metadata=None):
+        self.indices = indices if indices is not None else array("I")
+        self.codes = codes if codes is not None else array("H")
+        self.ids = ids if ids is not None else array("H")
+        self.offsets = offsets if offsets is not None else array("I")
+        self.lengths = lengths if lengths is not None else array("I")
+        self.count = count
+        self.metadata = metadata
+
+        self.fileSize = 0
+        self.fileMtime = 0
+        self.contentHash = b""
+
+    def append(self, tagIndex: int, tagCode: int, elId: int, tagStart: int, tagLength: int):
+        self.indices.append(tagIndex)
+        self.codes.append(tagCode)
+        self.ids.append(elId)
+        self.offsets.append(tagStart)
+        self.lengths.append(tagLength)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def encode(self) -> bytes:
+        metadataLength = len(self.metadata) if self.metadata is not None else _NO_METADATA
+
+        return b"".join([
+            _HEADER.pack(SWF_INDEX_MAGIC, SWF_INDEX_VERSION, self.fileSize, self.fileMtime, self.contentHash,
+                         self.count, len(self.indices), metadataLength),
+            self.indices.tobytes(),
+            self.codes.tobytes(),
+            self.ids.tobytes(),
+            self.offsets.tobytes(),
+            self.lengths.tobytes(),
+            self.metadata or b""
+        ])
+
+    @classmethod
+    def decode(cls, data: bytes):
+        magic, version, fileSize, fileMtime, contentHash, count, n, metadataLength = _HEADER.unpack_from(data, 0)
+        if magic != SWF_INDEX_MAGIC or version != SWF_INDEX_VERSION:
+            raise ValueError("Unsupported swf index")
+
+        index = cls(count=count)
+        index.fileSize = fileSize
+        index.fileMtime = fileMtime
+        index.contentHash = contentHash
+
+        pos = _HEADER.size
+        for arr in [index.indices, index.codes, index.ids, index.offsets, index.lengths]:
+            size = arr.itemsize * n
+            arr.frombytes(data[pos:pos+size])
+            pos += size
+
+        if metadataLength != _NO_METADATA:
+            index.metadata = bytes(data[pos:pos+metadataLength])
+            pos += metadataLength
+
+        if pos != len(data):
+            raise ValueError("Corrupted swf index")
+
+        return index
+
+
+def _IndexPath(swfPath: str) -> str:
+    return os.path.join(SWF_INDEX_PATH, hashlib.sha1(os.path.abspath(swfPath).encode()).hexdigest() + ".idx")
+
+
+def ReadSwfIndex(swfPath: str) -> SwfIndex:
+    """
+    Cached index of swf file or None if file was changed since index was written
+    """
+    try:
+        with open(_IndexPath(swfPath), "rb") as indexFile:
+            index = SwfIndex.decode(indexFile.read())
+
+        stat = os.stat(swfPath)
+        if stat.st_size != index.fileSize:
+            return None
+
+        if stat.st_mtime_ns != index.fileMtime:
+            #Touched but maybe not changed (copied back, restored from backup)
+            if bytes.fromhex(FileDigest(swfPath, "sha256")) != index.contentHash:
+                return None
+
+            index.fileMtime = stat.st_mtime_ns
+            WriteSwfIndex(swfPath, index, index.contentHash)
+
+    except (OSError, ValueError, struct.error):
+        return None
+
+    return index
+
+
+def WriteSwfIndex(swfPath: str, index: SwfIndex, contentHash: bytes=None):
+    """
+    contentHash: sha256 of file, hashed from file if not given
+    """
+    try:
+        stat = os.stat(swfPath)
+        index.fileSize = stat.st_size
+        index.fileMtime = stat.st_mtime_ns
+        index.contentHash = contentHash if contentHash is not None else bytes.fromhex(FileDigest(swfPath, "sha256"))
+
+        os.makedirs(SWF_INDEX_PATH, exist_ok=True)
+
+        with AtomicWrite(_IndexPath(swfPath), "wb") as indexFile:
+            indexFile.write(index.encode())
+
+    except OSError:
+        pass
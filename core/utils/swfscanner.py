@@ -0,0 +1,254 @@
+# *****************************************************************************
+#
+#                           Brawlhalla Modloader Core
+#   Copyright (C) 2020 Farbigoz
+#   
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#   Contacts:
+#       GitHub: https://github.com/Farbigoz
+#       Gmail: ferattori@gmail.com
+#       VK: https://vk.com/fabriziog    (Preferably)
+#
+# *****************************************************************************
+
+import os
+import mmap
+import lzma
+import zlib
+import struct
+from array import array
+from typing import Dict, List
+
+from .exceptions import TagsTruncated
+from .tagstream import ELEMENT_TAG_CODES, TAG_END
+
+__all__ = ["SwfScanner", "TAG_SYMBOL_CLASS", "TAG_DEFINE_BINARY_DATA", "TAG_DO_ABC", "TAG_DO_ABC2"]
+
+TAG_SYMBOL_CLASS        = 76
+TAG_DEFINE_BINARY_DATA  = 87
+TAG_DO_ABC              = 72
+TAG_DO_ABC2             = 82
+
+READ_CHUNK = 256 * 1024
+
+_UI16 = struct.Struct("<H")
+_UI32 = struct.Struct("<I")
+
+
+class _BodyReader:
+    """
+    Sequential reader over uncompressed swf body of memory-mapped file
+
+    Positions are offsets in uncompressed file (with 8 bytes header)
+    """
+    def __init__(self, mm: mmap.mmap, signature: bytes):
+        self.mm = mm
+        self.pos = 8
+        self.src = 8
+        self.buffer = bytearray()
+        self.bufferPos = 8      #Uncompressed position of buffer[0]
+        self.decompressor = None
+
+        if signature == b"CWS":
+            self.decompressor = zlib.decompressobj()
+
+        elif signature == b"ZWS":
+            #UI32 compressed length, 5 bytes of LZMA properties
+            props = mm[12:17]
+            lc, lp, pb = props[0] % 9, (props[0] // 9) % 5, props[0] // 45
+            self.decompressor = lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=[{
+                "id": lzma.FILTER_LZMA1, "lc": lc, "lp": lp, "pb": pb, "dict_size": _UI32.unpack(props[1:5])[0]
+            }])
+            self.src = 17
+
+    def _fill(self, size: int) -> bool:
+        """
+        Make size bytes from current position available in buffer
+        """
+        needed = self.pos + size - self.bufferPos
+
+        #Drop consumed data
+        consumed = self.pos - self.bufferPos
+        if consumed > READ_CHUNK:
+            del self.buffer[:consumed]
+            self.bufferPos = self.pos
+            needed -= consumed
+
+        while len(self.buffer) < needed and self.src < len(self.mm):
+            chunk = self.mm[self.src:self.src+READ_CHUNK]
+            self.src += len(chunk)
+            try:
+                self.buffer += self.decompressor.decompress(chunk)
+            except (zlib.error, lzma.LZMAError, EOFError):
+                self.src = len(self.mm)
+
+        return len(self.buffer) >= needed
+
+    def atEnd(self) -> bool:
+        if self.decompressor is None:
+            return self.pos >= len(self.mm)
+        return not self._fill(1)
+
+    def read(self, size: int) -> bytes:
+        """
+        Exactly size bytes, raises TagsTruncated at end of data
+        """
+        if self.decompressor is None:
+            data = self.mm[self.pos:self.pos+size]
+        else:
+            self._fill(size)
+            start = self.pos - self.bufferPos
+            data = bytes(self.buffer[start:start+size])
+
+        if len(data) < size:
+            raise TagsTruncated(f"{size} bytes at {self.pos} run past end of data")
+
+        self.pos += size
+        return data
+
+    def skip(self, size: int):
+        if self.decompressor is None:
+            if self.pos + size > len(self.mm):
+                raise TagsTruncated(f"{size} bytes at {self.pos} run past end of data")
+            self.pos += size
+            return
+
+        end = self.pos + size
+        while self.pos < end:
+            step = min(end - self.pos, READ_CHUNK)
+            if not self._fill(step):
+                raise TagsTruncated(f"{size} bytes at {self.pos} run past end of data")
+            self.pos += step
+
+
+class SwfScanner:
+    """
+    Read-only swf tags scanner without JVM
+
+    Walks RECORDHEADERs of memory-mapped file, decompressing CWS/ZWS body on the fly
+    """
+    swfPath: str
+    signature: bytes
+    version: int
+    fileSize: int
+
+    indices: array      #Parallel arrays of element tags
+    codes: array
+    ids: array
+    offsets: array      #Tag start in uncompressed file
+    lengths: array      #Tag length with RECORDHEADER
+    tagsCount: int
+
+    symbolClass: Dict[int, str]     #{tag: name, ...}
+    binaryData: Dict[int, bytes]    #{characterId: data, ...}
+    keptTags: Dict[int, List[bytes]]#{tagCode: [data, ...], ...}
+
+    def __init__(self, swfPath: str, keepTags=()):
+        self.swfPath = swfPath
+        self.keepTags = set(keepTags)
+
+        self.signature = b""
+        self.version = 0
+        self.fileSize = 0
+
+        self.indices = array("I")
+        self.codes = array("H")
+        self.ids = array("H")
+        self.offsets = array("I")
+        self.lengths = array("I")
+        self.tagsCount = 0
+
+        self.symbolClass = {}
+        self.binaryData = {}
+        self.keptTags = {}
+
+    def scan(self):
+        if not os.path.getsize(self.swfPath):
+            raise ValueError(f"'{self.swfPath}' is not a swf file")
+
+        with open(self.swfPath, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            self.signature = mm[0:3]
+            if self.signature not in [b"FWS", b"CWS", b"ZWS"] or len(mm) < 8:
+                raise ValueError(f"'{self.swfPath}' is not a swf file")
+
+            self.version = mm[3]
+            self.fileSize, = _UI32.unpack(mm[4:8])
+
+            reader = _BodyReader(mm, self.signature)
+
+            #Frame size RECT, frame rate, frame count
+            nBits = reader.read(1)[0] >> 3
+            reader.skip((5 + nBits * 4 + 7) // 8 - 1 + 4)
+
+            self._scanTags(reader)
+
+        return self
+
+    def _scanTags(self, reader: _BodyReader):
+        #Files without EndTag end after last tag
+        while not reader.atEnd():
+            tagStart = reader.pos
+
+            codeAndLength, = _UI16.unpack(reader.read(2))
+            tagCode = codeAndLength >> 6
+            length = codeAndLength & 0x3f
+            if length == 0x3f:
+                length, = _UI32.unpack(reader.read(4))
+
+            tagLength = reader.pos - tagStart + length
+
+            if tagCode in ELEMENT_TAG_CODES and length >= 2:
+                elId, = _UI16.unpack(reader.read(2))
+                reader.skip(length - 2)
+
+                self.indices.append(self.tagsCount)
+                self.codes.append(tagCode)
+                self.ids.append(elId)
+                self.offsets.append(tagStart)
+                self.lengths.append(tagLength)
+
+            elif tagCode == TAG_SYMBOL_CLASS:
+                self._readSymbolClass(reader.read(length))
+
+            elif tagCode == TAG_DEFINE_BINARY_DATA and length >= 6:
+                data = reader.read(length)
+                self.binaryData[_UI16.unpack_from(data, 0)[0]] = data[6:]
+
+            elif tagCode in self.keepTags:
+                if tagCode not in self.keptTags:
+                    self.keptTags[tagCode] = []
+                self.keptTags[tagCode].append(reader.read(length))
+
+            else:
+                reader.skip(length)
+
+            self.tagsCount += 1
+
+            if tagCode == TAG_END: break
+
+    def _readSymbolClass(self, data: bytes):
+        if len(data) < 2:
+            raise TagsTruncated("SymbolClass without symbols count")
+
+        count, = _UI16.unpack_from(data, 0)
+        pos = 2
+        for _ in range(count):
+            end = data.find(b"\x00", pos + 2)
+            if pos + 2 > len(data) or end < 0:
+                raise TagsTruncated(f"SymbolClass symbol at {pos} runs past end of tag")
+
+            tag, = _UI16.unpack_from(data, pos)
+            self.symbolClass[tag] = data[pos+2:end].decode("utf-8", "replace")
+            pos = end + 1
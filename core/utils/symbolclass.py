@@ -65,8 +65,7 @@ class ByteArray:
     def write(self, data):
         data = self._normalize_data(data)
 
-        for _elem in data:
-            self.data.append(_elem)
+        self.data.extend(data)
 
     def __len__(self):
         return len(self.data)
@@ -83,6 +82,16 @@ class SymbolClass():
             for tag, name in dict(self.symbolClass.getTagToNameMap()).items():
                 self.tags[int(tag)] = self._str_to_object(tag, name)
 
+    @classmethod
+    def fromTagToNameMap(cls, tagToName: dict):
+        """
+        SymbolClass from {tag: name} read without FFDec (see SwfScanner)
+        """
+        symbolClass = cls()
+        for tag, name in tagToName.items():
+            symbolClass.tags[int(tag)] = symbolClass._str_to_object(tag, name)
+        return symbolClass
+
     def __contains__(self, item):
         return item in self.tags
 
@@ -132,6 +141,9 @@ class SymbolClass():
         if tag not in self.tags: raise SymbolClassTagDoesNotExist("This tag does not exist")
         self.tags[int(tag)] = name
 
+    def removeTag(self, tag: int) -> None:
+        self.tags.pop(int(tag), None)
+
     def getTag(self, tag: int) -> object:
         return self.tags.get(int(tag), None)
 
@@ -0,0 +1,124 @@
+# *****************************************************************************
+#
+#                           Brawlhalla Modloader Core
+#   Copyright (C) 2020 Farbigoz
+#   
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#   Contacts:
+#       GitHub: https://github.com/Farbigoz
+#       Gmail: ferattori@gmail.com
+#       VK: https://vk.com/fabriziog    (Preferably)
+#
+# *****************************************************************************
+
+import struct
+from array import array
+
+from .exceptions import TagsTruncated
+
+__all__ = ["TAG_END", "ELEMENT_TAG_CODES", "TagsOffset", "IterTags", "IndexTags"]
+
+TAG_END = 0
+
+#Tags with element id in first UI16 of data
+ELEMENT_TAG_CODES = {
+    20: "DefineBitsLosslessTag",
+    36: "DefineBitsLossless2Tag",
+    2:  "DefineShapeTag",
+    22: "DefineShape2Tag",
+    32: "DefineShape3Tag",
+    83: "DefineShape4Tag",
+    10: "DefineFontTag",
+    48: "DefineFont2Tag",
+    75: "DefineFont3Tag",
+    91: "DefineFont4Tag",
+    39: "DefineSpriteTag",
+    14: "DefineSoundTag",
+    37: "DefineEditTextTag",
+    74: "CSMTextSettingsTag",
+    88: "DefineFontNameTag",
+    73: "DefineFontAlignZonesTag",
+}
+
+_UI16 = struct.Struct("<H")
+_UI32 = struct.Struct("<I")
+
+
+def TagsOffset(data) -> int:
+    """
+    Offset of first tag in uncompressed swf (with 8 bytes header)
+    """
+    nBits = data[8] >> 3
+    rectSize = (5 + nBits * 4 + 7) // 8
+    return 8 + rectSize + 4
+
+
+def IterTags(data, pos: int=None, end: int=None):
+    """
+    Iterate RECORDHEADERs: (tagCode, tagStart, dataStart, tagEnd).
+    Raises TagsTruncated if header or data of tag runs past end
+    """
+    if pos is None:
+        pos = TagsOffset(data)
+    if end is None:
+        end = len(data)
+
+    while pos < end:
+        if pos + 2 > end:
+            raise TagsTruncated(f"Tag header at {pos} runs past end {end}")
+
+        codeAndLength, = _UI16.unpack_from(data, pos)
+        tagCode = codeAndLength >> 6
+        length = codeAndLength & 0x3f
+        dataStart = pos + 2
+
+        if length == 0x3f:
+            if dataStart + 4 > end:
+                raise TagsTruncated(f"Long tag header at {pos} runs past end {end}")
+            length, = _UI32.unpack_from(data, dataStart)
+            dataStart += 4
+
+        if dataStart + length > end:
+            raise TagsTruncated(f"Tag {tagCode} at {pos} runs past end {end}")
+
+        yield tagCode, pos, dataStart, dataStart + length
+
+        if tagCode == TAG_END:
+            break
+
+        pos = dataStart + length
+
+
+def IndexTags(data, pos: int=None):
+    """
+    Parallel arrays of element tags: (tag index, tag code, element id, tag start, tag length), and count of all tags
+    """
+    indices = array("I")
+    codes = array("H")
+    ids = array("H")
+    offsets = array("I")
+    lengths = array("I")
+
+    count = 0
+    for tagCode, tagStart, dataStart, tagEnd in IterTags(data, pos):
+        if tagCode in ELEMENT_TAG_CODES and tagEnd - dataStart >= 2:
+            indices.append(count)
+            codes.append(tagCode)
+            ids.append(_UI16.unpack_from(data, dataStart)[0])
+            offsets.append(tagStart)
+            lengths.append(tagEnd - tagStart)
+        count += 1
+
+    return indices, codes, ids, offsets, lengths, count
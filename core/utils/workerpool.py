@@ -0,0 +1,157 @@
+# *****************************************************************************
+#
+#                           Brawlhalla Modloader Core
+#   Copyright (C) 2020 Farbigoz
+#   
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#   Contacts:
+#       GitHub: https://github.com/Farbigoz
+#       Gmail: ferattori@gmail.com
+#       VK: https://vk.com/fabriziog    (Preferably)
+#
+# *****************************************************************************
+
+
+import os
+import multiprocessing
+from queue import Empty
+from typing import List, Tuple
+
+__all__ = ["TaskDoneFlag", "TaskFailedFlag", "RunTasks"]
+
+#Seconds without messages after which workers are checked
+POLL_INTERVAL = 1
+
+#Polls a task may look lost before it is failed, its last messages may still be in queue
+LOST_POLLS = 2
+
+
+class TaskDoneFlag:
+    pass
+
+
+class TaskFailedFlag:
+    pass
+
+
+class _TaskStartedFlag:
+    pass
+
+
+_queue = None
+
+
+def _InitWorker(queue, initializer, initargs):
+    global _queue
+    _queue = queue
+
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _RunTask(function, key, args):
+    _queue.put((key, (_TaskStartedFlag, os.getpid())))
+
+    try:
+        for message in function(*args):
+            _queue.put((key, message))
+
+        _queue.put((key, (TaskDoneFlag,)))
+
+    except Exception as e:
+        _queue.put((key, (TaskFailedFlag, f"{type(e).__name__}: {e}")))
+
+
+def _LostTask(result, pid: int, alivePids: set) -> str:
+    """
+    Error of task that can't report anymore, None if it still can
+    """
+    if result.ready():
+        try:
+            result.get()
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+        return "Task finished without reporting"
+
+    if pid is not None and pid not in alivePids:
+        return "Worker process exited"
+
+    return None
+
+
+def RunTasks(function, tasks: List[Tuple[object, tuple]], workers: int, initializer=None, initargs=()):
+    """
+    Run generator function(*args) of each (key, args) task in spawned processes (JVM of this process can't be forked).
+
+    Yields (key, message) for each message yielded by function in worker, then (key, (TaskDoneFlag,)) or
+    (key, (TaskFailedFlag, error)). Task is failed also if its worker process dies
+    """
+    if not tasks:
+        return
+
+    context = multiprocessing.get_context("spawn")
+
+    #Manager queue: put returns once message is delivered, so worker dying right after it can't lose it
+    manager = context.Manager()
+    queue = manager.Queue()
+    pool = context.Pool(min(workers, len(tasks)), _InitWorker, (queue, initializer, initargs))
+
+    results = {}
+    pids = {}       #{key: pid of worker running task, ...}
+    lostPolls = {}
+    finished = set()
+
+    try:
+        for key, args in tasks:
+            results[key] = pool.apply_async(_RunTask, (function, key, args))
+
+        while len(finished) < len(results):
+            try:
+                key, message = queue.get(timeout=POLL_INTERVAL)
+            except Empty:
+                alivePids = {process.pid for process in multiprocessing.active_children()}
+
+                for key, result in results.items():
+                    if key in finished:
+                        continue
+
+                    error = _LostTask(result, pids.get(key, None), alivePids)
+                    if error is None:
+                        lostPolls.pop(key, None)
+                        continue
+
+                    lostPolls[key] = lostPolls.get(key, 0) + 1
+                    if lostPolls[key] >= LOST_POLLS:
+                        finished.add(key)
+                        yield key, (TaskFailedFlag, error)
+
+                continue
+
+            if key in finished:
+                continue
+
+            if message[0] is _TaskStartedFlag:
+                pids[key] = message[1]
+                continue
+
+            if message[0] is TaskDoneFlag or message[0] is TaskFailedFlag:
+                finished.add(key)
+
+            yield key, message
+
+    finally:
+        pool.terminate()
+        pool.join()
+        manager.shutdown()
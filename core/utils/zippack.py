@@ -0,0 +1,202 @@
+# *****************************************************************************
+#
+#                           Brawlhalla Modloader Core
+#   Copyright (C) 2020 Farbigoz
+#   
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#   Contacts:
+#       GitHub: https://github.com/Farbigoz
+#       Gmail: ferattori@gmail.com
+#       VK: https://vk.com/fabriziog    (Preferably)
+#
+# *****************************************************************************
+
+
+import os
+import sys
+import copy
+import zlib
+import shutil
+import struct
+import zipfile
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from .hashing import HASH_CHUNK, StreamFileHash
+
+__all__ = ["STORED_FORMATS", "ZIP_LOCAL_HEADER", "MemberCompression", "WriteMember", "WriteMembers", "CopyMember"]
+
+#Already compressed formats, deflate doesn't shrink them
+STORED_FORMATS = (".mp3", ".png", ".jpg", ".jpeg")
+
+#Compressed members bigger than this are spooled to disk
+SPOOL_SIZE = 8 * 1024 * 1024
+
+ZIP_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+#Raw append uses zipfile internals, checked on these python versions [from, to)
+RAW_WRITE_VERSIONS = ((3, 6), (3, 14))
+_RAW_WRITE_ATTRS = ("_lock", "_seekable", "_writing", "_writecheck", "_didModify", "fp", "start_dir", "filelist", "NameToInfo")
+
+
+def MemberCompression(path: str) -> int:
+    return zipfile.ZIP_STORED if path.lower().endswith(STORED_FORMATS) else zipfile.ZIP_DEFLATED
+
+
+def _MemberInfo(path: str, arcName: str) -> zipfile.ZipInfo:
+    zinfo = zipfile.ZipInfo.from_file(path, arcName)
+    zinfo.compress_type = MemberCompression(path)
+    return zinfo
+
+
+def WriteMember(filesZip: zipfile.ZipFile, path: str, arcName: str) -> str:
+    """
+    Stream file into archive in chunks, returns FileHash of same pass
+    """
+    zinfo = _MemberInfo(path, arcName)
+
+    with filesZip.open(zinfo, "w", force_zip64=zinfo.file_size > zipfile.ZIP64_LIMIT) as member:
+        return StreamFileHash(path, member.write)
+
+
+class _CompressedMember:
+    zinfo: zipfile.ZipInfo
+    data: tempfile.SpooledTemporaryFile     #Compressed bytes
+    hash: str
+
+    def __init__(self, path: str, arcName: str):
+        self.zinfo = _MemberInfo(path, arcName)
+        self.data = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+
+        #Same compressor settings as zipfile, so archive is same as with WriteMember
+        compressor = None
+        if self.zinfo.compress_type == zipfile.ZIP_DEFLATED:
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+
+        state = {"crc": 0, "size": 0}
+
+        def onChunk(chunk):
+            state["crc"] = zlib.crc32(chunk, state["crc"])
+            state["size"] += len(chunk)
+            self.data.write(compressor.compress(chunk) if compressor else chunk)
+
+        self.hash = StreamFileHash(path, onChunk)
+
+        if compressor:
+            self.data.write(compressor.flush())
+
+        self.zinfo.CRC = state["crc"]
+        self.zinfo.file_size = state["size"]
+        self.zinfo.compress_size = self.data.tell()
+        self.data.seek(0)
+
+    def close(self):
+        self.data.close()
+
+
+def _CanWriteRaw(filesZip: zipfile.ZipFile) -> bool:
+    """
+    Else members are written through ZipFile.open
+    """
+    return RAW_WRITE_VERSIONS[0] <= sys.version_info[:2] < RAW_WRITE_VERSIONS[1] and \
+        all(hasattr(filesZip, attr) for attr in _RAW_WRITE_ATTRS)
+
+
+def _WriteRaw(filesZip: zipfile.ZipFile, zinfo: zipfile.ZipInfo, data, size: int):
+    """
+    Append member with known CRC and sizes, data is already compressed. Only if _CanWriteRaw
+    """
+    with filesZip._lock:
+        if filesZip._writing:
+            raise ValueError("Can't write to ZIP archive while an open writing handle exists")
+
+        if filesZip._seekable:
+            filesZip.fp.seek(filesZip.start_dir)
+
+        zinfo.header_offset = filesZip.fp.tell()
+        zinfo.flag_bits &= ~0x08    #No data descriptor, sizes are in local header
+        filesZip._writecheck(zinfo)
+        filesZip._didModify = True
+
+        filesZip.fp.write(zinfo.FileHeader(None))
+        while size > 0:
+            chunk = data.read(min(HASH_CHUNK, size))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Truncated member '{zinfo.filename}'")
+            filesZip.fp.write(chunk)
+            size -= len(chunk)
+
+        filesZip.filelist.append(zinfo)
+        filesZip.NameToInfo[zinfo.filename] = zinfo
+        filesZip.start_dir = filesZip.fp.tell()
+
+
+def CopyMember(srcZip: zipfile.ZipFile, filesZip: zipfile.ZipFile, arcName: str):
+    """
+    Copy compressed member between archives without recompressing
+    """
+    zinfo = copy.copy(srcZip.getinfo(arcName))
+
+    if not _CanWriteRaw(filesZip):
+        with srcZip.open(arcName) as src, filesZip.open(zinfo, "w", force_zip64=zinfo.file_size > zipfile.ZIP64_LIMIT) as member:
+            shutil.copyfileobj(src, member, HASH_CHUNK)
+        return
+
+    with open(srcZip.filename, "rb") as src:
+        src.seek(zinfo.header_offset)
+        header = ZIP_LOCAL_HEADER.unpack(src.read(ZIP_LOCAL_HEADER.size))
+        if header[0] != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile(f"Bad local header of '{arcName}' in '{srcZip.filename}'")
+        src.seek(header[-2] + header[-1], os.SEEK_CUR)
+
+        _WriteRaw(filesZip, zinfo, src, zinfo.compress_size)
+
+
+def WriteMembers(filesZip: zipfile.ZipFile, members: List[Tuple[str, str]], workers: int=1):
+    """
+    members: [(path, arcName), ...]
+
+    Yields (path, FileHash) in order of members. With workers > 1 members are compressed in
+    threads ahead of writing and then appended to archive in order (if _CanWriteRaw)
+    """
+    if workers == 1 or len(members) < 2 or not _CanWriteRaw(filesZip):
+        for path, arcName in members:
+            yield path, WriteMember(filesZip, path, arcName)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        queued = iter(members)
+
+        for path, arcName in queued:
+            pending.append((path, executor.submit(_CompressedMember, path, arcName)))
+            if len(pending) >= workers * 2:
+                break
+
+        while pending:
+            path, future = pending.popleft()
+            member = future.result()
+            try:
+                _WriteRaw(filesZip, member.zinfo, member.data, member.zinfo.compress_size)
+            finally:
+                member.close()
+
+            yield path, member.hash
+
+            for path, arcName in queued:
+                pending.append((path, executor.submit(_CompressedMember, path, arcName)))
+                break
@@ -0,0 +1,19 @@
+"""
+Timing helper of benchmark tests, results are printed with pytest -s
+"""
+import time
+
+
+def Benchmark(name: str, function, repeat: int=5) -> float:
+    """
+    Best time of repeated calls in seconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"\n{name}: {best * 1000:.2f} ms")
+    return best
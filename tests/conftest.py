@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+#Outside Windows core keeps configs and caches in working directory
+TEST_DATA_PATH = tempfile.mkdtemp(prefix="bmlcore-tests-")
+os.chdir(TEST_DATA_PATH)
+
+from core.utils import hashing
+
+#Hash cache is saved at exit, pytest restores working directory before
+hashing.HashCache.cachePath = os.path.join(TEST_DATA_PATH, hashing.HASH_CACHE_FILE)
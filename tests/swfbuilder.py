@@ -0,0 +1,68 @@
+"""
+Hand-built swf files for tests that run without JVM
+"""
+import zlib
+import struct
+
+from core.utils.symbolclass import SymbolClass
+
+
+def SwfTag(tagCode: int, data: bytes, long: bool=False) -> bytes:
+    """
+    Tag with short RECORDHEADER, long one if data doesn't fit or long is set
+    """
+    if long or len(data) >= 0x3f:
+        return struct.pack("<HI", tagCode << 6 | 0x3f, len(data)) + data
+    return struct.pack("<H", tagCode << 6 | len(data)) + data
+
+
+def SymbolClassTag(names: dict) -> bytes:
+    """
+    names: {tag: object, ...} stored as modloader stores them in SymbolClass
+    """
+    symbolClass = SymbolClass()
+    data = struct.pack("<H", len(names))
+    for tag, obj in names.items():
+        data += struct.pack("<H", tag) + symbolClass._object_to_str(tag, obj).encode() + b"\x00"
+    return SwfTag(76, data, long=True)
+
+
+def BinaryDataTag(characterId: int, data: bytes) -> bytes:
+    return SwfTag(87, struct.pack("<HI", characterId, 0) + data, long=True)
+
+
+#DefineShape with id 5, empty bounds, styles and records
+SHAPE = SwfTag(2, struct.pack("<H", 5) + b"\x00" * 5)
+SPRITE = SwfTag(39, struct.pack("<H", 9) + b"\x00" * 100)
+BINARY = BinaryDataTag(6, bytes(range(100)))
+SHOW_FRAME = SwfTag(1, b"")
+END = SwfTag(0, b"")
+
+#Empty frame rect, 24 fps, 1 frame
+FRAME_HEADER = b"\x00" + struct.pack("<HH", 24 << 8, 1)
+
+
+def SwfBody(*tags) -> bytes:
+    return FRAME_HEADER + b"".join(tags)
+
+
+def SwfFile(body: bytes, signature: bytes=b"FWS", version: int=10) -> bytes:
+    header = signature + struct.pack("<BI", version, 8 + len(body))
+    return header + (zlib.compress(body) if signature == b"CWS" else body)
+
+
+def WriteSwfFile(path: str, *tags, signature: bytes=b"FWS"):
+    with open(path, "wb") as file:
+        file.write(SwfFile(SwfBody(*tags), signature))
+
+
+def Uncompressed(data: bytes) -> bytes:
+    return data[:8] + (zlib.decompress(data[8:]) if data[:3] == b"CWS" else data[8:])
+
+
+def HasJVM() -> bool:
+    try:
+        import jpype
+        return bool(jpype.getDefaultJVMPath())
+    except Exception:
+        return False
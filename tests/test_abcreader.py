@@ -0,0 +1,104 @@
+import re
+import struct
+
+import pytest
+
+from core.utils.abcreader import AbcReader, DoAbcData, EncodeU30, IterInstructions, FindPushedString
+
+
+VERSION = re.compile(r'^(\d\.\d\d)$|^(\d\.\d\d\.\d)')
+
+
+def _Abc(strings, bodies):
+    """
+    Minimal abcFile: string pool, one method per body, no classes or scripts
+    """
+    data = bytearray(struct.pack("<HH", 16, 46))
+    data += EncodeU30(0) + EncodeU30(0) + EncodeU30(0)     #int, uint, double pools
+
+    data += EncodeU30(len(strings) + 1)
+    for string in strings:
+        string = string.encode("utf-8")
+        data += EncodeU30(len(string)) + string
+
+    data += EncodeU30(0) + EncodeU30(0) + EncodeU30(0)     #namespaces, namespace sets, multinames
+
+    data += EncodeU30(len(bodies))
+    for _ in bodies:
+        data += b"\x00\x00\x00\x00"                         #param count, return type, name, flags
+
+    data += EncodeU30(0) + EncodeU30(0) + EncodeU30(0)     #metadata, classes, scripts
+
+    data += EncodeU30(len(bodies))
+    for method, code in enumerate(bodies):
+        data += EncodeU30(method) + b"\x01\x01\x00\x01" + EncodeU30(len(code)) + code
+        data += EncodeU30(0) + EncodeU30(0)                 #exceptions, traits
+
+    return bytes(data)
+
+
+def test_read_strings_and_bodies():
+    abc = _Abc(["a", "b"], [b"\x47", b"\x2c\x01\x48"])
+    reader = AbcReader(abc)
+
+    assert reader.readStrings() == ["", "a", "b"]
+    assert [(method, bytes(code)) for method, code in reader.iterBodiesCode()] == [(0, b"\x47"), (1, b"\x2c\x01\x48")]
+
+
+def test_do_abc2_data():
+    abc = _Abc([], [])
+    assert DoAbcData(82, b"\x01\x00\x00\x00name\x00" + abc) == abc
+    assert DoAbcData(72, abc) == abc
+
+
+def test_iter_instructions():
+    code = (
+        b"\x24\x2c"                                 #pushbyte 44
+        + b"\x2c" + EncodeU30(300)                  #pushstring 300
+        + b"\x46\x02\x01"                           #callproperty 2, 1
+        + b"\x10\xfe\xff\xff"                       #jump -2
+        + b"\x1b\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00"  #lookupswitch, 1 case
+        + b"\xef\x01\x02\x00\x03"                   #debug
+        + b"\x48"                                   #returnvalue
+    )
+
+    assert list(IterInstructions(code)) == [
+        (0, 0x24, (44,)),
+        (2, 0x2c, (300,)),
+        (5, 0x46, (2, 1)),
+        (8, 0x10, (-2,)),
+        (12, 0x1b, (1,)),
+        (23, 0xef, (1, 2, 0, 3)),
+        (28, 0x48, ()),
+    ]
+
+
+def test_iter_instructions_invalid():
+    with pytest.raises(ValueError):
+        list(IterInstructions(b"\x02\xff"))
+
+    with pytest.raises(IndexError):
+        list(IterInstructions(b"\x10\x00"))
+
+
+def test_single_match_skips_bodies():
+    abc = _Abc(["text", "1.23"], [b"\xff"])
+    assert FindPushedString([abc], VERSION).group(0) == "1.23"
+
+
+def test_pushed_string_respects_instruction_boundaries():
+    #Raw byte search finds "2c 02" inside "pushbyte 44; nop" before the real pushstring 1
+    code = b"\x24\x2c\x02\x29" + b"\x2c\x01" + b"\x48"
+    abc = _Abc(["4.56", "1.23"], [code])
+
+    assert FindPushedString([abc], VERSION).group(0) == "4.56"
+
+
+def test_pushed_string_skips_undecodable_body():
+    abc = _Abc(["4.56", "1.23"], [b"\xff\x2c\x02", b"\x2c\x01\x48"])
+    assert FindPushedString([abc], VERSION).group(0) == "4.56"
+
+
+def test_pushed_string_not_found():
+    assert FindPushedString([_Abc(["text"], [b"\x2c\x01\x48"])], VERSION) is None
+    assert FindPushedString([_Abc(["4.56", "1.23"], [b"\x24\x2c\x48"])], VERSION) is None
@@ -0,0 +1,53 @@
+import os
+import json
+
+from core.utils.atomicfile import AtomicWrite
+from core.utils.hashing import _HashCache
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    path = str(tmp_path / "cache.json")
+
+    with AtomicWrite(path) as file:
+        file.write("first")
+    with AtomicWrite(path) as file:
+        file.write("second")
+
+    with open(path) as file:
+        assert file.read() == "second"
+    assert os.listdir(str(tmp_path)) == ["cache.json"]
+
+
+def test_atomic_write_keeps_file_on_error(tmp_path):
+    path = str(tmp_path / "cache.json")
+    with AtomicWrite(path) as file:
+        file.write("kept")
+
+    try:
+        with AtomicWrite(path) as file:
+            file.write("lost")
+            raise RuntimeError()
+    except RuntimeError:
+        pass
+
+    with open(path) as file:
+        assert file.read() == "kept"
+    assert os.listdir(str(tmp_path)) == ["cache.json"]
+
+
+def test_hash_cache_merges_entries_of_other_processes(tmp_path):
+    cachePath = str(tmp_path / "hashes.cache")
+    first, second = str(tmp_path / "first"), str(tmp_path / "second")
+    for path in (first, second):
+        with open(path, "w") as file:
+            file.write(path)
+
+    #Two processes loaded cache before either saved
+    firstCache, secondCache = _HashCache(cachePath), _HashCache(cachePath)
+    firstCache.put(first, os.stat(first), "sha256", "a" * 64)
+    secondCache.put(second, os.stat(second), "sha256", "b" * 64)
+    firstCache.save()
+    secondCache.save()
+
+    with open(cachePath) as file:
+        assert set(json.load(file)["files"]) == {first, second}
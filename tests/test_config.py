@@ -0,0 +1,66 @@
+import os
+
+from core.libs.config_file import ConfigFile, ConfigElement
+from core.libs.config_file.config import LOG_SUFFIX
+from core.utils.workerpool import TaskDoneFlag, RunTasks
+
+
+class _Config(ConfigFile):
+    value = ConfigElement(default=0)
+    names = ConfigElement(default=[])
+
+
+def _Read(path):
+    with open(path, "r") as file:
+        return file.read()
+
+
+def _OpenInWorker(path):
+    config = _Config(path)
+    yield "opened", config._owner, config.value, os.path.exists(path + LOG_SUFFIX)
+
+    config.compact()
+    yield "compacted", os.path.exists(path + LOG_SUFFIX)
+
+
+def test_owner_compacts(tmp_path):
+    path = str(tmp_path / "a.cfg")
+    config = _Config(path, owner=True)
+    config.value = 1
+
+    assert os.path.exists(path + LOG_SUFFIX)
+
+    config.compact()
+    assert not os.path.exists(path + LOG_SUFFIX)
+    assert "value[int] = 1" in _Read(path)
+
+
+def test_not_owner_only_appends(tmp_path):
+    path = str(tmp_path / "a.cfg")
+    config = _Config(path, owner=True)
+    config.value = 2
+    content = _Read(path)
+
+    worker = _Config(path, owner=False)
+    assert worker.value == 2
+    worker.names = ["a"]
+    worker.compact()
+
+    assert _Read(path) == content
+    assert "names[list] = [\"a\"]" in _Read(path + LOG_SUFFIX)
+
+    #Lines appended by worker are read on next load
+    assert _Config(path, owner=False).names == ["a"]
+
+
+def test_worker_process_is_not_owner(tmp_path):
+    path = str(tmp_path / "a.cfg")
+    config = _Config(path)
+    assert config._owner
+
+    config.value = 3
+
+    messages = [message for _, message in RunTasks(_OpenInWorker, [("a", (path,))], 1)]
+
+    assert messages == [("opened", False, 3, True), ("compacted", True), (TaskDoneFlag,)]
+    assert os.path.exists(path + LOG_SUFFIX)
@@ -0,0 +1,74 @@
+import os
+import pytest
+
+from core.utils.dumpstore import _DumpStore
+from core.utils.exceptions import DumpCorrupted
+from core.utils.hashing import FileHash
+
+
+@pytest.fixture
+def store(tmp_path):
+    return _DumpStore(str(tmp_path / "dumps"))
+
+
+def _write(path, content: bytes) -> str:
+    with open(path, "wb") as file:
+        file.write(content)
+    return str(path)
+
+
+@pytest.mark.parametrize("fileName", ["music.txt", "music.mp3"])
+def test_restore_roundtrip(store, tmp_path, fileName):
+    content = b"original content " * 10000
+    gamePath = _write(tmp_path / fileName, content)
+    origHash = FileHash(gamePath)
+
+    store.put(fileName, gamePath)
+    _write(gamePath, b"modded")
+
+    store.restore(fileName, gamePath, origHash)
+    with open(gamePath, "rb") as file:
+        assert file.read() == content
+
+
+def test_same_content_stored_once(store, tmp_path):
+    store.put("a.txt", _write(tmp_path / "a.txt", b"same"))
+    store.put("b.txt", _write(tmp_path / "b.txt", b"same"))
+
+    blobs = [file for folder in os.listdir(store.storePath) if os.path.isdir(os.path.join(store.storePath, folder))
+             for file in os.listdir(os.path.join(store.storePath, folder))]
+    assert len(blobs) == 1
+
+
+def test_dump_is_not_hardlinked(store, tmp_path):
+    gamePath = _write(tmp_path / "music.mp3", b"original")
+    store.put("music.mp3", gamePath)
+
+    entry = store.files["music.mp3"]
+    assert os.stat(store.blobPath(entry["digest"], entry["codec"])).st_ino != os.stat(gamePath).st_ino
+
+    store.restore("music.mp3", gamePath)
+    assert os.stat(store.blobPath(entry["digest"], entry["codec"])).st_ino != os.stat(gamePath).st_ino
+
+
+def test_corrupted_blob_is_not_restored(store, tmp_path):
+    gamePath = _write(tmp_path / "music.mp3", b"original")
+    store.put("music.mp3", gamePath)
+    _write(gamePath, b"modded")
+
+    entry = store.files["music.mp3"]
+    _write(store.blobPath(entry["digest"], entry["codec"]), b"rewritten in place")
+
+    with pytest.raises(DumpCorrupted):
+        store.restore("music.mp3", gamePath)
+
+    with open(gamePath, "rb") as file:
+        assert file.read() == b"modded"
+
+
+def test_original_hash_mismatch(store, tmp_path):
+    gamePath = _write(tmp_path / "a.txt", b"original")
+    store.put("a.txt", gamePath)
+
+    with pytest.raises(DumpCorrupted):
+        store.restore("a.txt", gamePath, FileHash(_write(tmp_path / "other.txt", b"other")))
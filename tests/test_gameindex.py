@@ -0,0 +1,124 @@
+import os
+
+from core.utils.gameindex import GAME_SWF_MAX_DEPTH, GameIndex
+
+
+def _Touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb"):
+        pass
+
+
+def _Bump(path):
+    #Directory mtime may not change within filesystem timestamp resolution
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+
+def _CountListDir(monkeypatch):
+    listed = []
+    listDir = GameIndex._listDir
+
+    def _listDir(self, path, mtime):
+        listed.append(os.path.relpath(path, self.root))
+        return listDir(self, path, mtime)
+
+    monkeypatch.setattr(GameIndex, "_listDir", _listDir)
+    return listed
+
+
+def test_unchanged_dirs_not_listed(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    _Touch(os.path.join(root, "Game.swf"))
+    _Touch(os.path.join(root, "sub", "a.png"))
+
+    gameIndex = GameIndex(root)
+    assert gameIndex.update()
+
+    listed = _CountListDir(monkeypatch)
+    cached = GameIndex(root, gameIndex.dirs)
+
+    assert not cached.update()
+    assert listed == []
+    assert cached.swfs == gameIndex.swfs
+    assert cached.files == gameIndex.files
+
+
+def test_added_file_in_subdir(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    _Touch(os.path.join(root, "Game.swf"))
+    _Touch(os.path.join(root, "sub", "a.png"))
+
+    gameIndex = GameIndex(root)
+    gameIndex.update()
+
+    _Touch(os.path.join(root, "sub", "b.png"))
+    _Bump(os.path.join(root, "sub"))
+
+    listed = _CountListDir(monkeypatch)
+
+    assert gameIndex.update()
+    assert listed == ["sub"]
+    assert gameIndex.files["b.png"] == os.path.join(root, "sub", "b.png")
+    assert gameIndex.swfs == {"Game.swf": os.path.join(root, "Game.swf")}
+
+
+def test_removed_dir(tmp_path):
+    root = str(tmp_path)
+    _Touch(os.path.join(root, "sub", "a.png"))
+
+    gameIndex = GameIndex(root)
+    gameIndex.update()
+
+    os.remove(os.path.join(root, "sub", "a.png"))
+    os.rmdir(os.path.join(root, "sub"))
+    _Bump(root)
+
+    assert gameIndex.update()
+    assert gameIndex.files == {}
+    assert list(gameIndex.dirs) == [""]
+
+
+def test_collision_last_path_wins(tmp_path):
+    root = str(tmp_path)
+    for subDir in ("a", "b", "c"):
+        _Touch(os.path.join(root, subDir, "Shared.swf"))
+        _Touch(os.path.join(root, subDir, "Shared.png"))
+    _Touch(os.path.join(root, "a", "Unique.swf"))
+
+    gameIndex = GameIndex(root)
+    gameIndex.update()
+
+    for fileName, filesMap in (("Shared.swf", gameIndex.swfs), ("Shared.png", gameIndex.files)):
+        paths = gameIndex.collisions[fileName]
+        assert sorted(paths) == [os.path.join(root, subDir, fileName) for subDir in ("a", "b", "c")]
+        assert paths == [os.path.join(root, relDir, fileName) for relDir in gameIndex.order if relDir]
+        assert filesMap[fileName] == paths[-1]
+
+    assert "Unique.swf" not in gameIndex.collisions
+
+
+def test_swf_max_depth_matches_walk_rule(tmp_path):
+    root = str(tmp_path)
+    for relDir in ("", "a", os.path.join("a", "b"), os.path.join("a", "b", "c"), "d"):
+        name = relDir.replace(os.sep, "_") or "root"
+        _Touch(os.path.join(root, relDir, f"{name}.swf"))
+        _Touch(os.path.join(root, relDir, f"{name}.png"))
+
+    #Previous GetBrawlhallaSwfs rule, with os.sep in place of "\\"
+    expected = {}
+    for path, _, files in os.walk(root):
+        if len(path.replace(root, "").split(os.sep)) > 2: continue
+
+        for file in files:
+            if not file.endswith(".swf"): continue
+
+            expected[file] = os.path.join(path, file)
+
+    gameIndex = GameIndex(root)
+    gameIndex.update()
+
+    assert GAME_SWF_MAX_DEPTH == 1
+    assert gameIndex.swfs == expected
+    assert sorted(gameIndex.swfs) == ["a.swf", "d.swf", "root.swf"]
+    assert sorted(gameIndex.files) == ["a.png", "a_b.png", "a_b_c.png", "d.png", "root.png"]
@@ -0,0 +1,57 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+from core.utils.imports import _LazyJClass
+
+from swfbuilder import HasJVM
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#Import without JVM and game search takes about 0.15s, both of them take seconds
+IMPORT_TIME_LIMIT = 1.0
+
+
+def _Run(code: str, cwd) -> str:
+    return subprocess.run([sys.executable, "-c", code], cwd=str(cwd), env={**os.environ, "PYTHONPATH": ROOT},
+                          check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+
+
+def test_import_does_not_start_jvm(tmp_path):
+    _Run("import core, jpype; assert not jpype.isJVMStarted()", tmp_path)
+
+
+def test_star_import_exports_game_constants(tmp_path):
+    names = _Run("from core import *; print(' '.join(sorted(globals())))", tmp_path).split()
+    for name in ["BRAWLHALLA_PATH", "BRAWLHALLA_SWFS", "BRAWLHALLA_FILES", "BRAWLHALLA_VERSION", "Processor", "ModsFinder", "Swf"]:
+        assert name in names
+
+
+def test_benchmark_import_time(tmp_path):
+    code = "import time; start = time.perf_counter(); import core; print(time.perf_counter() - start)"
+    #Fresh interpreter each time, best of runs
+    importTime = min(float(_Run(code, tmp_path)) for _ in range(3))
+    print(f"\nimport core: {importTime * 1000:.2f} ms")
+
+    assert importTime < IMPORT_TIME_LIMIT
+
+
+def test_lazy_classes_equal_by_name():
+    assert _LazyJClass("java.util.ArrayList") == _LazyJClass("java.util.ArrayList")
+    assert _LazyJClass("java.util.ArrayList") != _LazyJClass("java.util.HashMap")
+
+
+@pytest.mark.skipif(not HasJVM(), reason="JVM is not installed")
+def test_lazy_class_hash_matches_resolved_class():
+    from jpype import JClass
+
+    lazyClass = _LazyJClass("java.util.ArrayList")
+    jClass = JClass("java.util.ArrayList")
+
+    assert lazyClass == jClass
+    assert hash(lazyClass) == hash(jClass)
+    assert {lazyClass: 1}[jClass] == 1
+    assert {jClass: 1}[lazyClass] == 1
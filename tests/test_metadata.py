@@ -0,0 +1,186 @@
+import pytest
+
+from core.gameswf import (GameSwf, GAME_SWF_METADATA_ID, SYMBOL_CLASS_TAG_IS_MODIFIED, SYMBOL_CLASS_TAG_INSTALLED_MODS,
+                          SYMBOL_CLASS_TAG_BACKUP_ELEMENTS, SYMBOL_CLASS_TAG_BACKUP_ACTION_SCRIPTS)
+from core.utils import gameconstants
+from core.utils.symbolclass import SymbolClass
+from core.utils.metadata import GameSwfMetadata, METADATA_MAGIC, METADATA_VERSION, SECTION_BACKUP_ELEMENTS, SECTION_BACKUP_ACTION_SCRIPTS
+
+from benchmark import Benchmark
+from swfbuilder import SymbolClassTag, BinaryDataTag, WriteSwfFile, END
+
+
+INSTALLED_MODS = ["s1a2b3c4d5e6", "s0f9e8d7c6b5"]
+BACKUP_ELEMENTS = {"DefineShapeTag": {12: 3000, 40: 3001}, "DefineSpriteTag": {7: 3002}}
+BACKUP_ACTION_SCRIPTS = {"a_Animation": "package { class a_Animation {} }", "Юникод": "// текст\n" * 50}
+
+
+def test_round_trip():
+    data = GameSwfMetadata.fromObjects(INSTALLED_MODS, BACKUP_ELEMENTS, BACKUP_ACTION_SCRIPTS).encode()
+    metadata = GameSwfMetadata(data)
+
+    assert data[:4] == METADATA_MAGIC and data[4] == METADATA_VERSION
+    assert metadata.installedMods == INSTALLED_MODS
+    assert metadata.backupElements == BACKUP_ELEMENTS
+    assert metadata.backupActionsScripts == BACKUP_ACTION_SCRIPTS
+    assert metadata.encode() == data
+
+
+def test_empty_round_trip():
+    metadata = GameSwfMetadata(GameSwfMetadata.fromObjects().encode())
+
+    assert metadata.installedMods == []
+    assert metadata.backupElements == {}
+    assert metadata.backupActionsScripts == {}
+    assert GameSwfMetadata(GameSwfMetadata().encode()).installedMods == []
+
+
+def test_untouched_sections_are_kept_encoded():
+    data = GameSwfMetadata.fromObjects(INSTALLED_MODS, BACKUP_ELEMENTS, BACKUP_ACTION_SCRIPTS).encode()
+    metadata = GameSwfMetadata(data)
+
+    metadata.installedMods.append("s000000000000")
+
+    assert set(metadata.raw) == {SECTION_BACKUP_ELEMENTS, SECTION_BACKUP_ACTION_SCRIPTS}
+    changed = GameSwfMetadata(metadata.encode())
+    assert changed.installedMods == INSTALLED_MODS + ["s000000000000"]
+    assert changed.backupElements == BACKUP_ELEMENTS
+    assert changed.backupActionsScripts == BACKUP_ACTION_SCRIPTS
+
+
+def test_changed_script_is_packed_again():
+    metadata = GameSwfMetadata(GameSwfMetadata.fromObjects(backupActionsScripts=BACKUP_ACTION_SCRIPTS).encode())
+
+    metadata.backupActionsScripts["a_Animation"] = "changed"
+
+    assert GameSwfMetadata(metadata.encode()).backupActionsScripts == {**BACKUP_ACTION_SCRIPTS, "a_Animation": "changed"}
+
+
+def test_unknown_section_is_kept():
+    #Section of newer modloader of same format version
+    metadata = GameSwfMetadata(GameSwfMetadata.fromObjects(INSTALLED_MODS).encode())
+    metadata.raw[0x7f] = b"future"
+
+    assert GameSwfMetadata(metadata.encode()).raw[0x7f] == b"future"
+
+
+def test_unsupported_metadata():
+    with pytest.raises(ValueError):
+        GameSwfMetadata(b"JUNK\x01\x00\x00")
+    with pytest.raises(ValueError):
+        GameSwfMetadata(METADATA_MAGIC + bytes([METADATA_VERSION + 1]) + b"\x00\x00")
+
+
+def test_legacy_objects_migration():
+    #Legacy metadata is json in SymbolClass: keys of element ids are strings
+    legacyElements = {elType: {str(old): new for old, new in elIdsMap.items()} for elType, elIdsMap in BACKUP_ELEMENTS.items()}
+    metadata = GameSwfMetadata(GameSwfMetadata.fromObjects(INSTALLED_MODS, legacyElements, BACKUP_ACTION_SCRIPTS).encode())
+
+    assert metadata.installedMods == INSTALLED_MODS
+    assert metadata.backupElements == BACKUP_ELEMENTS
+    assert metadata.backupActionsScripts == BACKUP_ACTION_SCRIPTS
+
+
+def _LegacySymbolClass() -> bytes:
+    return SymbolClassTag({
+        SYMBOL_CLASS_TAG_IS_MODIFIED: True,
+        SYMBOL_CLASS_TAG_INSTALLED_MODS: INSTALLED_MODS,
+        SYMBOL_CLASS_TAG_BACKUP_ELEMENTS: BACKUP_ELEMENTS,
+        SYMBOL_CLASS_TAG_BACKUP_ACTION_SCRIPTS: BACKUP_ACTION_SCRIPTS,
+        1: "a_Animation",
+    })
+
+
+@pytest.fixture
+def gameSwfs(tmp_path, monkeypatch):
+    swfs = {}
+    monkeypatch.setitem(gameconstants.__dict__, "BRAWLHALLA_SWFS", swfs)
+
+    def add(swfName, *tags):
+        swfs[swfName] = str(tmp_path / swfName)
+        WriteSwfFile(swfs[swfName], *tags, END)
+
+    return add
+
+
+def test_read_legacy_metadata(gameSwfs):
+    gameSwfs("Game.swf", _LegacySymbolClass())
+
+    metadata = GameSwf.readMetadata("Game")
+
+    assert metadata.installedMods == INSTALLED_MODS
+    assert metadata.backupElements == BACKUP_ELEMENTS
+    assert metadata.backupActionsScripts == BACKUP_ACTION_SCRIPTS
+
+
+def test_read_metadata_prefers_binary_data(gameSwfs):
+    data = GameSwfMetadata.fromObjects(["s111111111111"]).encode()
+    gameSwfs("Game.swf", _LegacySymbolClass(), BinaryDataTag(GAME_SWF_METADATA_ID, data))
+
+    assert GameSwf.readMetadata("Game.swf").installedMods == ["s111111111111"]
+
+
+def test_read_metadata_of_unmodified_swf(gameSwfs):
+    gameSwfs("Game.swf")
+
+    assert GameSwf.readMetadata("Game").installedMods == []
+
+
+def test_read_metadata_of_truncated_swf(gameSwfs, tmp_path):
+    gameSwfs("Game.swf", _LegacySymbolClass())
+    path = str(tmp_path / "Game.swf")
+    with open(path, "rb") as file:
+        data = file.read()
+    with open(path, "wb") as file:
+        file.write(data[:-20])
+
+    assert GameSwf.readMetadata("Game") is None
+
+
+def _LargeMetadata():
+    installedMods = [f"s{n:012x}" for n in range(50)]
+    backupElements = {
+        elType: {elId: 0x8000 + n * 5000 + elId for elId in range(1, 5001)}
+        for n, elType in enumerate(["DefineShapeTag", "DefineSpriteTag", "DefineEditTextTag"])
+    }
+    backupActionsScripts = {f"a_Script{n}": f"package {{ class a_Script{n} {{ /* {n} */ }} }}\n" * 100 for n in range(300)}
+    return installedMods, backupElements, backupActionsScripts
+
+
+def test_benchmark_metadata_against_legacy_symbol_class():
+    installedMods, backupElements, backupActionsScripts = _LargeMetadata()
+
+    #Legacy: every section is json in SymbolClass name, all of them are decoded on load and encoded on save
+    legacy = SymbolClass()
+    legacy.addTag(SYMBOL_CLASS_TAG_IS_MODIFIED, True)
+    legacy.addTag(SYMBOL_CLASS_TAG_INSTALLED_MODS, installedMods)
+    legacy.addTag(SYMBOL_CLASS_TAG_BACKUP_ELEMENTS, backupElements)
+    legacy.addTag(SYMBOL_CLASS_TAG_BACKUP_ACTION_SCRIPTS, backupActionsScripts)
+    legacyNames = {tag: legacy._object_to_str(tag, obj) for tag, obj in legacy.tags.items()}
+
+    def legacyLoadAndSave():
+        symbolClass = SymbolClass.fromTagToNameMap(legacyNames)
+        symbolClass.getTag(SYMBOL_CLASS_TAG_INSTALLED_MODS).append("s000000000000")
+        symbolClass.getByteArray()
+
+    data = GameSwfMetadata.fromObjects(installedMods, backupElements, backupActionsScripts).encode()
+
+    def loadAndSave():
+        metadata = GameSwfMetadata(data)
+        metadata.installedMods.append("s000000000000")
+        metadata.encode()
+
+    legacyTime = Benchmark("Legacy SymbolClass metadata load and save", legacyLoadAndSave)
+    binaryTime = Benchmark("GameSwfMetadata load and save", loadAndSave)
+
+    assert binaryTime < legacyTime
+
+
+def test_benchmark_metadata_full_decode():
+    data = GameSwfMetadata.fromObjects(*_LargeMetadata()).encode()
+
+    def decode():
+        metadata = GameSwfMetadata(data)
+        metadata.installedMods, metadata.backupElements, metadata.backupActionsScripts
+
+    Benchmark(f"GameSwfMetadata decode of all sections, {len(data)} bytes", decode)
@@ -0,0 +1,257 @@
+import os
+import time
+import zipfile
+
+import pytest
+
+import core
+from core import mod
+from core.mod import MANIFEST_RACY_NS, MOD_DATABASE_FILE, MOD_TABLE_FILES, ModBuilder, FileFlag, ModifierFlag
+from core.file import FILES_PACK
+from core.libs.sqlite import Sql
+from core.utils import gameconstants
+from core.utils.hashing import FileHash
+
+
+GAME_PATH = "C:\\Brawlhalla"
+GAME_FILES = ["a.png", "b.png", "c.mp3", "d.jpg"]
+
+
+def _Write(path, data, mtime=None):
+    """
+    mtime: default is older than MANIFEST_RACY_NS, so next build may reuse file
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(data)
+
+    if mtime is None:
+        mtime = int(time.time() * 1000000000) - 10 * MANIFEST_RACY_NS
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def modPath(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "MODS_PATH", str(tmp_path))
+    monkeypatch.setitem(gameconstants.__dict__, "BRAWLHALLA_PATH", GAME_PATH)
+    monkeypatch.setitem(gameconstants.__dict__, "BRAWLHALLA_SWFS", {"Game.swf": GAME_PATH + "\\Game.swf"})
+    monkeypatch.setitem(gameconstants.__dict__, "BRAWLHALLA_FILES", {name: GAME_PATH + "\\" + name for name in GAME_FILES})
+
+    return str(tmp_path / "Test")
+
+
+class _Calls:
+    """
+    Records calls of pack writers of mod module
+    """
+    def __init__(self, monkeypatch):
+        self.written = []
+        self.copied = []
+
+        writeMembers = mod.WriteMembers
+        copyMember = mod.CopyMember
+
+        def _writeMembers(filesZip, files, workers):
+            self.written.extend(arcName for _, arcName in files)
+            return writeMembers(filesZip, files, workers)
+
+        def _copyMember(oldZip, newZip, name):
+            self.copied.append(name)
+            return copyMember(oldZip, newZip, name)
+
+        monkeypatch.setattr(mod, "WriteMembers", _writeMembers)
+        monkeypatch.setattr(mod, "CopyMember", _copyMember)
+
+    def reset(self):
+        self.written.clear()
+        self.copied.clear()
+
+
+def _Build(modPath, force=False):
+    builder = ModBuilder(os.path.basename(modPath))
+    builder.setConfiguration("1.00", "Test", "Author")
+    return builder.build(force=force)
+
+
+def _Pack(modPath):
+    packPath = os.path.join(modPath, FILES_PACK)
+    with zipfile.ZipFile(packPath, "r") as filesZip:
+        assert filesZip.testzip() is None
+        return {name: filesZip.read(name) for name in filesZip.namelist()}
+
+
+def _IndexedHashes(modPath):
+    with Sql(os.path.join(modPath, MOD_DATABASE_FILE)) as index:
+        return {file["name"]: file["hash"] for file in index.read_iter(MOD_TABLE_FILES)}
+
+
+def _CheckIndex(modPath):
+    files = {os.path.basename(path): path for path in (os.path.join(modPath, "files", name) for name in GAME_FILES) if os.path.isfile(path)}
+    assert _IndexedHashes(modPath) == {name: FileHash(path) for name, path in files.items()}
+
+
+@pytest.fixture
+def filesMod(modPath, monkeypatch):
+    for name in GAME_FILES[:3]:
+        _Write(os.path.join(modPath, "files", name), name.encode() * 10)
+
+    calls = _Calls(monkeypatch)
+    _Build(modPath)
+    assert sorted(calls.written) == GAME_FILES[:3]
+    calls.reset()
+
+    return calls
+
+
+def test_files_unchanged(modPath, filesMod):
+    packPath = os.path.join(modPath, FILES_PACK)
+    stat = os.stat(packPath)
+
+    flags = _Build(modPath)
+
+    assert sorted(flags) == sorted((FileFlag, os.path.join(modPath, "files", name)) for name in GAME_FILES[:3])
+    assert filesMod.written == [] and filesMod.copied == []
+    assert os.stat(packPath).st_mtime_ns == stat.st_mtime_ns
+    _CheckIndex(modPath)
+
+
+def test_files_added_are_appended(modPath, filesMod):
+    packPath = os.path.join(modPath, FILES_PACK)
+    inode = os.stat(packPath).st_ino
+
+    _Write(os.path.join(modPath, "files", "d.jpg"), b"new")
+    _Build(modPath)
+
+    assert filesMod.written == ["d.jpg"]
+    assert filesMod.copied == []
+    assert os.stat(packPath).st_ino == inode
+    assert _Pack(modPath)["d.jpg"] == b"new"
+    assert sorted(_Pack(modPath)) == sorted(GAME_FILES)
+    _CheckIndex(modPath)
+
+
+def test_files_changed_rewrite_pack(modPath, filesMod):
+    packPath = os.path.join(modPath, FILES_PACK)
+    inode = os.stat(packPath).st_ino
+
+    _Write(os.path.join(modPath, "files", "a.png"), b"changed")
+    _Build(modPath)
+
+    assert filesMod.written == ["a.png"]
+    assert sorted(filesMod.copied) == ["b.png", "c.mp3"]
+    assert os.stat(packPath).st_ino != inode
+    assert _Pack(modPath) == {"a.png": b"changed", "b.png": b"b.png" * 10, "c.mp3": b"c.mp3" * 10}
+    _CheckIndex(modPath)
+
+
+def test_files_removed_rewrite_pack(modPath, filesMod):
+    os.remove(os.path.join(modPath, "files", "b.png"))
+    _Build(modPath)
+
+    assert filesMod.written == []
+    assert sorted(filesMod.copied) == ["a.png", "c.mp3"]
+    assert sorted(_Pack(modPath)) == ["a.png", "c.mp3"]
+    _CheckIndex(modPath)
+
+
+def test_files_changed_pack_is_rewritten(modPath, filesMod):
+    packPath = os.path.join(modPath, FILES_PACK)
+    with zipfile.ZipFile(packPath, "a") as filesZip:
+        filesZip.writestr("extra.png", b"extra")
+
+    _Build(modPath)
+
+    assert sorted(filesMod.written) == GAME_FILES[:3]
+    assert filesMod.copied == []
+    assert sorted(_Pack(modPath)) == GAME_FILES[:3]
+
+
+def test_files_force(modPath, filesMod):
+    _Build(modPath, force=True)
+
+    assert sorted(filesMod.written) == GAME_FILES[:3]
+    assert filesMod.copied == []
+    _CheckIndex(modPath)
+
+
+def test_files_same_size_and_mtime(modPath, filesMod):
+    #Change keeping size and mtime is not seen without force
+    path = os.path.join(modPath, "files", "a.png")
+    mtime = os.stat(path).st_mtime_ns
+    _Write(path, b"A.PNG" * 10, mtime)
+
+    _Build(modPath)
+    assert filesMod.written == []
+    assert _Pack(modPath)["a.png"] == b"a.png" * 10
+
+    _Build(modPath, force=True)
+    assert _Pack(modPath)["a.png"] == b"A.PNG" * 10
+
+
+def test_files_racy_mtime_hashed_again(modPath, monkeypatch):
+    #Sources written just before build keep their mtime if changed right after it
+    path = os.path.join(modPath, "files", "a.png")
+    mtime = int(time.time() * 1000000000)
+    _Write(path, b"a.png" * 10, mtime)
+
+    calls = _Calls(monkeypatch)
+    _Build(modPath)
+
+    _Write(path, b"A.PNG" * 10, mtime)
+    calls.reset()
+    _Build(modPath)
+
+    assert calls.written == ["a.png"]
+    assert _Pack(modPath)["a.png"] == b"A.PNG" * 10
+    _CheckIndex(modPath)
+
+
+@pytest.fixture
+def modifierMod(modPath, monkeypatch):
+    """
+    Modifier sources are scripts, .bmlmodifier writing (needs JVM) is replaced
+    """
+    _Write(os.path.join(modPath, "Game", "scripts", "a.as"), b"trace(1);")
+
+    built = []
+
+    def _buildModifier(self, swfName, elementFiles, scriptFiles):
+        built.append(swfName)
+        _Write(os.path.join(self.modPath, f"{swfName}.{mod.MODIFIER_FORMAT}"), str(len(built)).encode())
+        return {"ActionScript": [os.path.basename(path) for path in scriptFiles]}
+
+    monkeypatch.setattr(ModBuilder, "_buildModifier", _buildModifier)
+
+    assert _Build(modPath) == [(ModifierFlag, "Game")]
+    assert built == ["Game"]
+    built.clear()
+
+    return built
+
+
+def test_modifier_up_to_date(modPath, modifierMod):
+    assert _Build(modPath) == [(ModifierFlag, "Game")]
+    assert modifierMod == []
+
+
+def test_modifier_source_changed(modPath, modifierMod):
+    _Write(os.path.join(modPath, "Game", "scripts", "a.as"), b"trace(2);")
+    _Build(modPath)
+    assert modifierMod == ["Game"]
+
+
+def test_modifier_source_added(modPath, modifierMod):
+    _Write(os.path.join(modPath, "Game", "scripts", "b.as"), b"trace(1);")
+    _Build(modPath)
+    assert modifierMod == ["Game"]
+
+
+def test_modifier_output_changed(modPath, modifierMod):
+    os.remove(os.path.join(modPath, f"Game.{mod.MODIFIER_FORMAT}"))
+    _Build(modPath)
+    assert modifierMod == ["Game"]
+
+
+def test_modifier_force(modPath, modifierMod):
+    _Build(modPath, force=True)
+    assert modifierMod == ["Game"]
@@ -0,0 +1,23 @@
+from core.modifier import MODIFIER_FORMAT, SYMBOL_CLASS_TAG_IS_MODIFIER, ModifierTemplate
+
+from swfbuilder import SymbolClassTag, WriteSwfFile, END
+
+
+def _WriteModifier(path, isModifier):
+    names = {SYMBOL_CLASS_TAG_IS_MODIFIER: isModifier} if isModifier is not None else {}
+    WriteSwfFile(path, SymbolClassTag(names), END)
+
+
+def test_modifier_is_valid(tmp_path):
+    modifier = ModifierTemplate("Game.swf", modPath=str(tmp_path))
+    assert not modifier.isValid()
+
+    _WriteModifier(str(tmp_path / f"Game.{MODIFIER_FORMAT}"), True)
+    assert modifier.isValid()
+
+    _WriteModifier(str(tmp_path / f"Game.{MODIFIER_FORMAT}"), None)
+    assert not modifier.isValid()
+
+    with open(str(tmp_path / f"Game.{MODIFIER_FORMAT}"), "wb") as file:
+        file.write(b"not a swf")
+    assert not modifier.isValid()
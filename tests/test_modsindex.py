@@ -0,0 +1,82 @@
+from core.mod import ModsIndex
+from core.modifier import ModifierTemplate
+from core.file import FilesPack
+from core.processor import Processor
+
+
+def _Modifier(modHash, swfName, elIds):
+    modifier = ModifierTemplate(swfName, modHash=modHash)
+    modifier.elements = {"Shape": list(elIds)}
+    return modifier
+
+
+def _FilesPack(modHash, fileNames):
+    filesPack = FilesPack(modHash=modHash)
+    for fileName in fileNames:
+        filesPack.addFile(fileName, fileName, None)
+    return filesPack
+
+
+def test_matches():
+    modsIndex = ModsIndex()
+    modsIndex.addModifier(_Modifier("a", "Game", [1, 2]))
+    modsIndex.addFilesPack(_FilesPack("a", ["a.png"]))
+
+    assert modsIndex.findModifierMatches(_Modifier("b", "Game", [2, 3])) == ["a"]
+    assert modsIndex.findModifierMatches(_Modifier("b", "Other", [2])) == []
+    assert modsIndex.findModifierMatches(_Modifier("a", "Game", [2])) == []
+    assert modsIndex.findFilesMatches(_FilesPack("b", ["a.png", "b.png"])) == ["a"]
+
+
+def test_remove_keeps_other_claims_of_mod():
+    modsIndex = ModsIndex()
+    first = _Modifier("a", "Game", [1, 2])
+    second = _Modifier("a", "Game", [2])
+    modsIndex.addModifier(first)
+    modsIndex.addModifier(second)
+
+    modsIndex.removeModifier(first)
+
+    assert modsIndex.findModifierMatches(_Modifier("b", "Game", [2])) == ["a"]
+    assert modsIndex.findModifierMatches(_Modifier("b", "Game", [1])) == []
+
+    modsIndex.removeModifier(second)
+    assert modsIndex.elementsMap == {}
+
+
+def test_remove_queued_twice():
+    modsIndex = ModsIndex()
+    modifier = _Modifier("a", "Game", [1])
+    filesPack = _FilesPack("a", ["a.png"])
+    for _ in range(2):
+        modsIndex.addModifier(modifier)
+        modsIndex.addFilesPack(filesPack)
+
+    modsIndex.removeModifier(modifier)
+    modsIndex.removeFilesPack(filesPack)
+
+    assert modsIndex.findModifierMatches(_Modifier("b", "Game", [1])) == ["a"]
+    assert modsIndex.findFilesMatches(_FilesPack("b", ["a.png"])) == ["a"]
+
+    modsIndex.removeModifier(modifier)
+    modsIndex.removeFilesPack(filesPack)
+
+    assert modsIndex.elementsMap == {}
+    assert modsIndex.filesMap == {}
+
+
+def test_remove_not_added():
+    modsIndex = ModsIndex()
+    modsIndex.addModifier(_Modifier("a", "Game", [1]))
+
+    modsIndex.removeModifier(_Modifier("b", "Game", [1, 2]))
+    modsIndex.removeFilesPack(_FilesPack("b", ["a.png"]))
+
+    assert modsIndex.findModifierMatches(_Modifier("c", "Game", [1])) == ["a"]
+
+
+def test_unique_modifiers():
+    first = _Modifier("a", "Game", [1])
+    queued = {"Game": [first, first, _Modifier("a", "Game", [1])], "Other": [_Modifier("a", "Other", [1])]}
+
+    assert [(modifier.modHash, modifier.swfName) for modifier in Processor._uniqueModifiers(queued)] == [("a", "Game"), ("a", "Other")]
@@ -0,0 +1,150 @@
+import os
+import zlib
+import struct
+import hashlib
+
+import pytest
+
+from core.utils.swf import WriteSwf
+from core.utils.tagstream import TagsOffset, IterTags, IndexTags
+
+from benchmark import Benchmark
+from swfbuilder import BinaryDataTag, SwfTag, SwfBody, SwfFile, Uncompressed, HasJVM, SHAPE, BINARY, SHOW_FRAME, END
+
+
+def _CopyChunks(data: bytes) -> list:
+    """
+    Chunks as incremental save takes them from an unchanged file: frame header, then ranges of tags
+    """
+    original = memoryview(Uncompressed(data))
+    chunks = [original[8:TagsOffset(original)]]
+    for tagCode, tagStart, dataStart, tagEnd in IterTags(original):
+        chunks.append(original[tagStart:tagEnd])
+    return chunks
+
+
+def _Tags(data: bytes) -> list:
+    data = Uncompressed(data)
+    return [(tagCode, data[dataStart:tagEnd]) for tagCode, tagStart, dataStart, tagEnd in IterTags(data)]
+
+
+def test_write_uncompressed_swf_is_byte_identical(tmp_path):
+    path = str(tmp_path / "a.swf")
+    original = SwfFile(SwfBody(SHAPE, BINARY, SHOW_FRAME, END))
+
+    digest = WriteSwf(path, "NONE", 10, _CopyChunks(original))
+
+    with open(path, "rb") as file:
+        written = file.read()
+    assert written == original
+    assert digest == hashlib.sha256(written).digest()
+
+
+def test_write_zlib_swf_framing(tmp_path):
+    path = str(tmp_path / "a.swf")
+    body = SwfBody(SHAPE, BINARY, SHOW_FRAME, END)
+    original = SwfFile(body, b"CWS", 15)
+
+    digest = WriteSwf(path, "ZLIB", 15, _CopyChunks(original))
+
+    with open(path, "rb") as file:
+        written = file.read()
+    assert written[:4] == b"CWS\x0f"
+    #File length field counts uncompressed size with header
+    assert struct.unpack_from("<I", written, 4)[0] == 8 + len(body)
+    assert zlib.decompress(written[8:]) == body
+    assert digest == hashlib.sha256(written).digest()
+
+
+def test_write_keeps_long_tag_headers(tmp_path):
+    path = str(tmp_path / "a.swf")
+    #Short tag stored with long header must stay long, offsets of swf index depend on it
+    original = SwfFile(SwfBody(SwfTag(2, SHAPE[2:], long=True), SHOW_FRAME, END))
+
+    WriteSwf(path, "NONE", 10, _CopyChunks(original))
+
+    with open(path, "rb") as file:
+        assert file.read() == original
+
+
+def _SavedSwfs(tmp_path, original: bytes, change, saves: int=1) -> dict:
+    """
+    {incremental: file data} of same swf loaded, changed and saved both ways
+    """
+    from core.utils.swf import Swf
+
+    saved = {}
+    for incremental in (True, False):
+        path = str(tmp_path / f"{incremental}.swf")
+        with open(path, "wb") as file:
+            file.write(original)
+
+        swf = Swf(path).load()
+        for n in range(saves):
+            change(swf, n)
+            swf.save(incremental=incremental)
+        with open(path, "rb") as file:
+            saved[incremental] = (file.read(), swf.tagsIndex)
+        swf.close()
+
+    return saved
+
+
+#Sprite with one empty frame
+VALID_SPRITE = SwfTag(39, struct.pack("<HH", 9, 1) + SHOW_FRAME + END, long=True)
+
+
+def _ChangeShapeId(swf, n):
+    shape = next(element for element in swf.elementsList if swf.getElementId(element) in (5, 7))
+    swf.setElementId(shape, 7 + n)
+
+
+@pytest.mark.skipif(not HasJVM(), reason="JVM is not installed")
+@pytest.mark.parametrize("signature", [b"FWS", b"CWS"])
+def test_incremental_save_equals_full_save(tmp_path, signature):
+    original = SwfFile(SwfBody(SHAPE, BINARY, SHOW_FRAME, VALID_SPRITE, END), signature)
+
+    saved = _SavedSwfs(tmp_path, original, _ChangeShapeId)
+    incrementalData, fullData = saved[True][0], saved[False][0]
+
+    assert incrementalData[:4] == fullData[:4]
+    assert Uncompressed(incrementalData) == Uncompressed(fullData)
+    assert _Tags(incrementalData)[0] == (2, struct.pack("<H", 7) + SHAPE[4:])
+
+
+@pytest.mark.skipif(not HasJVM(), reason="JVM is not installed")
+def test_second_incremental_save_index(tmp_path):
+    #Changed tag moves copied tags of second save to other positions
+    original = SwfFile(SwfBody(SHAPE, BINARY, SHOW_FRAME, VALID_SPRITE, END))
+
+    saved = _SavedSwfs(tmp_path, original, _ChangeShapeId, saves=2)
+    data, index = saved[True]
+
+    assert Uncompressed(data) == Uncompressed(saved[False][0])
+    indices, codes, ids, offsets, lengths, count = IndexTags(memoryview(Uncompressed(data)))
+    assert (list(index.indices), list(index.ids), list(index.offsets), list(index.lengths), index.count) == \
+        (list(indices), list(ids), list(offsets), list(lengths), count)
+
+
+@pytest.mark.skipif(not HasJVM(), reason="JVM is not installed")
+@pytest.mark.parametrize("signature", [b"FWS", b"CWS"])
+def test_benchmark_incremental_save(tmp_path, signature):
+    from core.utils.swf import Swf
+
+    #Large swf: thousands of shapes and a big binary, one shape is changed
+    shapes = [SwfTag(2, struct.pack("<H", 10 + n) + b"\x00" * 5) for n in range(5000)]
+    original = SwfFile(SwfBody(SHAPE, *shapes, BinaryDataTag(6, os.urandom(16 * 1024 * 1024)), SHOW_FRAME, END), signature)
+    path = str(tmp_path / "large.swf")
+    with open(path, "wb") as file:
+        file.write(original)
+
+    swf = Swf(path).load()
+    _ChangeShapeId(swf, 0)
+
+    times = {
+        incremental: Benchmark(f"{signature.decode()} save, incremental={incremental}", lambda: swf.save(incremental=incremental), 3)
+        for incremental in (True, False)
+    }
+    swf.close()
+
+    assert times[True] < times[False]
@@ -0,0 +1,39 @@
+import os
+
+from core.utils import swfindex
+from core.utils.swfindex import SwfIndex, ReadSwfIndex, WriteSwfIndex
+
+
+def _Index() -> SwfIndex:
+    index = SwfIndex(count=3)
+    index.append(0, 2, 5, 13, 9)
+    return index
+
+
+def test_touched_file_keeps_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(swfindex, "SWF_INDEX_PATH", str(tmp_path / "swfindex"))
+    swfPath = str(tmp_path / "a.swf")
+    with open(swfPath, "wb") as file:
+        file.write(b"swf content")
+
+    WriteSwfIndex(swfPath, _Index())
+    stat = os.stat(swfPath)
+    os.utime(swfPath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    index = ReadSwfIndex(swfPath)
+    assert index is not None and list(index.ids) == [5] and index.count == 3
+
+
+def test_changed_file_drops_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(swfindex, "SWF_INDEX_PATH", str(tmp_path / "swfindex"))
+    swfPath = str(tmp_path / "a.swf")
+    with open(swfPath, "wb") as file:
+        file.write(b"swf content")
+
+    WriteSwfIndex(swfPath, _Index())
+    stat = os.stat(swfPath)
+    with open(swfPath, "wb") as file:
+        file.write(b"swf CONTENT")
+    os.utime(swfPath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert ReadSwfIndex(swfPath) is None
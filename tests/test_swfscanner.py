@@ -0,0 +1,62 @@
+import struct
+
+import pytest
+
+from core.utils.exceptions import TagsTruncated
+from core.utils.swfscanner import SwfScanner
+from core.modifier import MODIFIER_FORMAT, SYMBOL_CLASS_TAG_IS_MODIFIER, ModifierTemplate
+
+from swfbuilder import SwfTag, SwfBody, SwfFile, SymbolClassTag, BinaryDataTag, SHAPE, SPRITE, SHOW_FRAME, END
+
+
+@pytest.mark.parametrize("signature", [b"FWS", b"CWS"])
+def test_scan(tmp_path, signature):
+    path = str(tmp_path / "a.swf")
+    with open(path, "wb") as file:
+        file.write(SwfFile(SwfBody(SHAPE, SHOW_FRAME, SPRITE, SymbolClassTag({1: "a_Shape"}), BinaryDataTag(3, b"data"), END), signature))
+
+    scanner = SwfScanner(path).scan()
+
+    assert list(scanner.ids) == [5, 9]
+    assert list(scanner.indices) == [0, 2]
+    assert scanner.tagsCount == 6
+    assert scanner.symbolClass == {1: "a_Shape"}
+    assert scanner.binaryData == {3: b"data"}
+
+
+def test_scan_without_end_tag(tmp_path):
+    path = str(tmp_path / "a.swf")
+    with open(path, "wb") as file:
+        file.write(SwfFile(SwfBody(SHAPE, SHOW_FRAME)))
+
+    assert SwfScanner(path).scan().tagsCount == 2
+
+
+#Bodies cut inside a tag
+TRUNCATED = {
+    "tag header": SwfBody(SHAPE, b"\x40"),
+    "long tag header": SwfBody(SHAPE, SPRITE[:4]),
+    "element id": SwfBody(SwfTag(2, b"\x05\x00")[:3]),
+    "tag data": SwfBody(SPRITE[:50]),
+    "symbol class": SwfBody(SwfTag(76, struct.pack("<HH", 2, 1) + b"a_Shape\x00", long=True), END),
+    "symbol class name": SwfBody(SwfTag(76, struct.pack("<HH", 1, 1) + b"a_Shape", long=True), END),
+}
+
+
+@pytest.mark.parametrize("signature", [b"FWS", b"CWS"])
+@pytest.mark.parametrize("body", list(TRUNCATED.values()), ids=list(TRUNCATED))
+def test_truncated_swf(tmp_path, signature, body):
+    path = str(tmp_path / "a.swf")
+    with open(path, "wb") as file:
+        file.write(SwfFile(body, signature))
+
+    with pytest.raises(TagsTruncated):
+        SwfScanner(path).scan()
+
+
+def test_truncated_modifier_is_not_valid(tmp_path):
+    data = SwfFile(SwfBody(SymbolClassTag({SYMBOL_CLASS_TAG_IS_MODIFIER: True}), END))
+    with open(str(tmp_path / f"Game.{MODIFIER_FORMAT}"), "wb") as file:
+        file.write(data[:-6])
+
+    assert not ModifierTemplate("Game", modPath=str(tmp_path)).isValid()
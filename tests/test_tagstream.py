@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import pytest
+
+from core.utils.exceptions import TagsTruncated
+from core.utils.tagstream import TagsOffset, IterTags, IndexTags
+from core.utils.swf import Swf
+
+from swfbuilder import SwfTag, SwfBody, SwfFile, SHAPE, SPRITE, SHOW_FRAME, END
+
+
+def _Swf(*tags) -> memoryview:
+    return memoryview(SwfFile(SwfBody(*tags)))
+
+
+def test_tags_offset():
+    assert TagsOffset(_Swf()) == 13
+    #Rect with 15 bits per field takes 9 bytes
+    assert TagsOffset(b"FWS\x0a\x00\x00\x00\x00\x78") == 8 + 9 + 4
+
+
+def test_short_and_long_headers():
+    data = _Swf(SHAPE, SPRITE, SwfTag(1, b"", long=True), END)
+    tags = list(IterTags(data))
+
+    assert [tagCode for tagCode, _, _, _ in tags] == [2, 39, 1, 0]
+    #Short header: 2 bytes, long header: 6 bytes
+    assert [dataStart - tagStart for _, tagStart, dataStart, _ in tags] == [2, 6, 6, 2]
+    assert [tagEnd - dataStart for _, _, dataStart, tagEnd in tags] == [7, 102, 0, 0]
+    assert tags[-1][3] == len(data)
+
+
+def test_iteration_stops_at_end_tag():
+    data = _Swf(SHAPE, END, b"\xff" * 10)
+    assert [tagCode for tagCode, _, _, _ in IterTags(data)] == [2, 0]
+
+
+def test_index_tags():
+    data = _Swf(SHAPE, SHOW_FRAME, SPRITE, END)
+    indices, codes, ids, offsets, lengths, count = IndexTags(data)
+
+    assert list(indices) == [0, 2]
+    assert list(codes) == [2, 39]
+    assert list(ids) == [5, 9]
+    assert list(offsets) == [13, 13 + len(SHAPE) + len(SHOW_FRAME)]
+    assert list(lengths) == [len(SHAPE), len(SPRITE)]
+    assert count == 4
+
+
+@pytest.mark.parametrize("cut", [
+    1,                          #Half of End tag header
+    len(END) + 1,               #Data of sprite
+    len(END) + len(SPRITE) - 4, #Length of long header
+])
+def test_truncated_input(cut):
+    data = _Swf(SHAPE, SPRITE, END)[:-cut]
+    with pytest.raises(TagsTruncated):
+        list(IterTags(data))
+
+
+def _LoadedSwf(hasEndTag: bool, data) -> Swf:
+    swf = Swf.__new__(Swf)
+    swf.init("test.swf")
+    swf.swf = SimpleNamespace(hasEndTag=hasEndTag, uncompressedData=bytes(data))
+    return swf
+
+
+def test_tags_index_requires_exact_count():
+    data = _Swf(SHAPE, SPRITE, END)
+
+    #FFDec tag list has no EndTag
+    assert _LoadedSwf(True, data)._readTagsIndex(2).count == 3
+    assert _LoadedSwf(True, data)._readTagsIndex(3) is None
+    assert _LoadedSwf(False, data)._readTagsIndex(2) is None
+
+    #EndTag is expected but missing in file
+    assert _LoadedSwf(True, _Swf(SHAPE, SPRITE))._readTagsIndex(2) is None
+    assert _LoadedSwf(False, _Swf(SHAPE, SPRITE))._readTagsIndex(2).count == 2
+
+
+def test_tags_index_of_truncated_file():
+    data = _Swf(SHAPE, SPRITE, END)[:-10]
+    assert _LoadedSwf(True, data)._readTagsIndex(2) is None
@@ -0,0 +1,50 @@
+import os
+
+from core.utils.workerpool import TaskDoneFlag, TaskFailedFlag, RunTasks
+
+
+def _Count(n):
+    for i in range(n):
+        yield "count", i
+
+
+def _Fail():
+    yield "started",
+    raise ValueError("bad task")
+
+
+def _Crash():
+    yield "started",
+    os._exit(1)
+
+
+def _Run(tasks):
+    messages = {}
+    for key, message in RunTasks(_Dispatch, tasks, 2):
+        messages.setdefault(key, []).append(message)
+    return messages
+
+
+def _Dispatch(name, *args):
+    yield from {"count": _Count, "fail": _Fail, "crash": _Crash}[name](*args)
+
+
+def test_messages_are_yielded_in_task_order():
+    messages = _Run([("a", ("count", 3)), ("b", ("count", 2))])
+
+    assert messages["a"] == [("count", 0), ("count", 1), ("count", 2), (TaskDoneFlag,)]
+    assert messages["b"] == [("count", 0), ("count", 1), (TaskDoneFlag,)]
+
+
+def test_failed_task():
+    messages = _Run([("a", ("fail",)), ("b", ("count", 1))])
+
+    assert messages["a"] == [("started",), (TaskFailedFlag, "ValueError: bad task")]
+    assert messages["b"][-1] == (TaskDoneFlag,)
+
+
+def test_dead_worker_fails_task():
+    messages = _Run([("a", ("crash",)), ("b", ("count", 1))])
+
+    assert messages["a"][-1][0] is TaskFailedFlag
+    assert messages["b"][-1] == (TaskDoneFlag,)
@@ -0,0 +1,81 @@
+import os
+import zipfile
+
+import pytest
+
+from core.utils import zippack
+from core.utils.hashing import FileHash
+from core.utils.zippack import WriteMember, WriteMembers, CopyMember
+
+
+@pytest.fixture
+def members(tmp_path):
+    paths = []
+    for n, (name, content) in enumerate([
+        ("a.txt", b"text " * 5000),
+        ("b.mp3", os.urandom(3000)),
+        ("c.bin", b""),
+        ("d.txt", b"line\n" * 100),
+    ]):
+        path = str(tmp_path / name)
+        with open(path, "wb") as file:
+            file.write(content)
+        paths.append((path, f"files/{n}/{name}"))
+    return paths
+
+
+@pytest.fixture(params=[True, False], ids=["raw", "fallback"])
+def rawWrite(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(zippack, "RAW_WRITE_VERSIONS", ((0, 0), (0, 0)))
+    return request.param
+
+
+def _Check(zipPath, members):
+    with zipfile.ZipFile(zipPath) as filesZip:
+        assert filesZip.testzip() is None
+        assert filesZip.namelist() == [arcName for _, arcName in members]
+        for path, arcName in members:
+            with open(path, "rb") as file:
+                assert filesZip.read(arcName) == file.read()
+            expected = zipfile.ZIP_STORED if path.endswith(".mp3") else zipfile.ZIP_DEFLATED
+            assert filesZip.getinfo(arcName).compress_type == expected
+
+
+def test_write_members(tmp_path, members, rawWrite):
+    zipPath = str(tmp_path / "pack.zip")
+
+    with zipfile.ZipFile(zipPath, "w") as filesZip:
+        hashes = list(WriteMembers(filesZip, members, workers=3))
+
+    assert hashes == [(path, FileHash(path)) for path, _ in members]
+    _Check(zipPath, members)
+
+
+def test_copy_member(tmp_path, members, rawWrite):
+    srcPath, dstPath = str(tmp_path / "src.zip"), str(tmp_path / "dst.zip")
+
+    with zipfile.ZipFile(srcPath, "w") as srcZip:
+        list(WriteMembers(srcZip, members))
+
+    with zipfile.ZipFile(srcPath) as srcZip, zipfile.ZipFile(dstPath, "w") as dstZip:
+        WriteMember(dstZip, *members[0])
+        for _, arcName in members[1:]:
+            CopyMember(srcZip, dstZip, arcName)
+
+    _Check(dstPath, members)
+
+
+def test_raw_write_with_open_handle(tmp_path, members):
+    with zipfile.ZipFile(str(tmp_path / "probe.zip"), "w") as probeZip:
+        if not zippack._CanWriteRaw(probeZip):
+            pytest.skip("Raw write isn't supported on this python")
+
+    srcPath = str(tmp_path / "src.zip")
+    with zipfile.ZipFile(srcPath, "w") as srcZip:
+        list(WriteMembers(srcZip, members))
+
+    with zipfile.ZipFile(srcPath) as srcZip, zipfile.ZipFile(str(tmp_path / "dst.zip"), "w") as dstZip:
+        with dstZip.open("open.txt", "w"):
+            with pytest.raises(ValueError):
+                CopyMember(srcZip, dstZip, members[0][1])